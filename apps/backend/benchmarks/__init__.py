@@ -0,0 +1,5 @@
+"""
+Reproducible performance benchmarks for the Internavi backend
+
+Run from apps/backend:  python -m benchmarks.run --scale 7k
+"""
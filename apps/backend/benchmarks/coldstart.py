@@ -0,0 +1,156 @@
+"""
+Cold-start timing harness
+
+    python -m benchmarks.coldstart --database-url sqlite:////tmp/internavi-bench-7k-42.db
+    python -m benchmarks.coldstart --runs 10 --probes schools,quiz --env VERCEL=1
+
+Each run starts a fresh interpreter, as a serverless cold start does: it imports
+main.py, runs the startup event and serves one probe request in-process (through
+httpx.ASGITransport, so no server or socket is involved), then the same request again.
+Reported per probe, as the median over the runs (milliseconds):
+- interpreter: process spawn until the probe code starts
+- import: `import main`
+- startup: the startup event
+- first_response / second_response: the probe request, cold then warm
+- total: process spawn until the first response, without the harness's own imports
+The database must already hold data (e.g. seeded by benchmarks.run). Results use the
+benchmarks result format, so --baseline flags regressions like the scenario runs do.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+
+# name -> (method, path, JSON body)
+PROBES = {
+    "health": ("GET", "/health", None),
+    "schools": ("GET", "/api/schools?page_size=20", None),
+    "quiz": ("POST", "/api/quiz-match", {
+        "study_level": "undergraduate",
+        "preferred_location": "CA",
+        "budget_range": "medium",
+        "program_interest": "any",
+        "admission_preference": "any",
+    }),
+}
+TIMINGS = ("interpreter", "import", "startup", "first_response", "second_response", "total")
+
+
+def probe(name: str, spawned_at: float) -> dict:
+    """Runs in the fresh interpreter: time the import, the startup event and the first requests"""
+    started_at = time.time()
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    # Imported after main so its own imports are not counted as main's
+    import asyncio
+    import httpx
+
+    async def serve() -> dict:
+        starting = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            ready = time.perf_counter()
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://coldstart") as client:
+                method, path, body = PROBES[name]
+                response = await client.request(method, path, json=body)
+                first = time.perf_counter()
+                await client.request(method, path, json=body)
+                second = time.perf_counter()
+        return {
+            "status": response.status_code,
+            "interpreter": (started_at - spawned_at) * 1000,
+            "import": (imported - started) * 1000,
+            "startup": (ready - starting) * 1000,
+            "first_response": (first - ready) * 1000,
+            "second_response": (second - first) * 1000,
+            "total": (started_at - spawned_at) * 1000 + (imported - started + first - starting) * 1000,
+        }
+
+    return asyncio.run(serve())
+
+
+def cold_start(name: str, env: dict) -> dict:
+    """One probe in a new process"""
+    spawned_at = time.time()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.coldstart", "--probe", name, "--spawned-at", repr(spawned_at)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300,
+    )
+    if result.returncode:
+        raise RuntimeError(f"Probe {name} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API cold starts (import, startup, first response)")
+    parser.add_argument("--database-url", help="Database the API reads (default: the benchmarks.run 7k SQLite file)")
+    parser.add_argument("--probes", default=",".join(PROBES), help=f"Comma-separated subset of: {', '.join(PROBES)}")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per probe")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the API process, e.g. VERCEL=1 or SNAPSHOT_MODE=true")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/coldstart-<time>.json)")
+    parser.add_argument("--baseline", type=Path, help="Earlier result file to compare against")
+    parser.add_argument("--thresholds", type=Path, default=BENCHMARKS_DIR / "thresholds.json")
+    parser.add_argument("--probe", choices=PROBES, help=argparse.SUPPRESS)
+    parser.add_argument("--spawned-at", type=float, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.spawned_at)))
+        return 0
+
+    from benchmarks.results import build_meta, check_results, load_json, write_results
+
+    names = [name.strip() for name in args.probes.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PROBES]
+    if unknown:
+        print(f"Unknown probes: {', '.join(unknown)}")
+        return 2
+    database_url = args.database_url or os.environ.get("DATABASE_URL") or (
+        f"sqlite:///{tempfile.gettempdir()}/internavi-bench-7k-42.db"
+    )
+    env = {**os.environ, "DATABASE_URL": database_url}
+    env.update(setting.split("=", 1) for setting in args.env)
+
+    metrics = {}
+    print(f"{'probe':<10}" + "".join(f"{timing:>17}" for timing in TIMINGS) + f"  (ms, median of {args.runs})")
+    for name in names:
+        runs = [cold_start(name, env) for _ in range(args.runs)]
+        statuses = sorted({run["status"] for run in runs})
+        if statuses != [200]:
+            print(f"  warning: {name} answered with status {statuses}")
+        medians = {timing: round(statistics.median(run[timing] for run in runs), 1) for timing in TIMINGS}
+        print(f"{name:<10}" + "".join(f"{medians[timing]:>17.1f}" for timing in TIMINGS))
+        for timing, value in medians.items():
+            metrics[f"coldstart.{name}.{timing}.p50_ms"] = value
+
+    dialect = database_url.split(":", 1)[0].split("+", 1)[0]
+    results = {"meta": build_meta("coldstart", None, dialect, BACKEND_DIR), "metrics": metrics}
+    results["meta"]["env"] = args.env
+    output = args.output or BENCHMARKS_DIR / "results" / f"coldstart-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    write_results(output, results["meta"], metrics)
+    print(f"Results written to {output}")
+
+    baseline = load_json(args.baseline) if args.baseline else None
+    failures = check_results(results, load_json(args.thresholds), baseline)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Seeded synthetic College Scorecard dataset
+
+Records are generated in fixed blocks of BLOCK_SIZE, each from its own seeded
+generator, so any range of records (e.g. one API page) can be rebuilt on demand
+and the same seed always yields the same dataset at any scale.
+Field distributions roughly follow the real Scorecard: mostly small certificate
+schools, admissions and SAT data only for four-year schools, tuition by ownership.
+"""
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterator
+
+import numpy as np
+from sqlalchemy import delete, insert
+from sqlmodel import Session
+
+from dataset import bump_dataset_version
+from models import Program, School, SchoolNeighbor, SchoolProgram
+from neighbors import rebuild_neighbors
+from programs import write_school_programs
+from scorecard import map_page, map_page_programs
+
+SCALES = {"7k": 7_000, "100k": 100_000, "1m": 1_000_000}
+BLOCK_SIZE = 1_000
+FIRST_UNIT_ID = 100_000
+
+# state: (institution weight, latitude, longitude, first zip3, last zip3)
+STATES = {
+    "AL": (80, 32.8, -86.8, 350, 369), "AK": (8, 61.4, -150.0, 995, 999),
+    "AZ": (110, 34.2, -111.7, 850, 865), "AR": (90, 34.9, -92.4, 716, 729),
+    "CA": (700, 36.8, -119.4, 900, 961), "CO": (90, 39.0, -105.5, 800, 816),
+    "CT": (80, 41.6, -72.7, 60, 69), "DE": (20, 39.0, -75.5, 197, 199),
+    "DC": (20, 38.9, -77.0, 200, 205), "FL": (380, 28.6, -82.4, 320, 349),
+    "GA": (180, 32.7, -83.4, 300, 319), "HI": (20, 20.8, -156.3, 967, 968),
+    "ID": (40, 44.1, -114.6, 832, 838), "IL": (260, 40.0, -89.2, 600, 629),
+    "IN": (120, 39.9, -86.3, 460, 479), "IA": (80, 42.0, -93.5, 500, 528),
+    "KS": (80, 38.5, -98.4, 660, 679), "KY": (90, 37.5, -85.3, 400, 427),
+    "LA": (120, 31.1, -92.0, 700, 714), "ME": (40, 45.4, -69.2, 39, 49),
+    "MD": (90, 39.0, -76.8, 206, 219), "MA": (170, 42.3, -71.8, 10, 27),
+    "MI": (180, 44.3, -85.4, 480, 499), "MN": (120, 46.3, -94.3, 550, 567),
+    "MS": (60, 32.7, -89.7, 386, 397), "MO": (150, 38.4, -92.5, 630, 658),
+    "MT": (30, 47.0, -109.6, 590, 599), "NE": (50, 41.5, -99.8, 680, 693),
+    "NV": (40, 39.3, -116.6, 889, 898), "NH": (30, 43.7, -71.6, 30, 38),
+    "NJ": (160, 40.2, -74.7, 70, 89), "NM": (40, 34.4, -106.1, 870, 884),
+    "NY": (450, 42.9, -75.5, 100, 149), "NC": (180, 35.6, -79.4, 270, 289),
+    "ND": (25, 47.5, -100.5, 580, 588), "OH": (300, 40.3, -82.8, 430, 459),
+    "OK": (100, 35.6, -97.5, 730, 749), "OR": (70, 43.9, -120.6, 970, 979),
+    "PA": (360, 40.9, -77.8, 150, 196), "PR": (120, 18.2, -66.5, 6, 9),
+    "RI": (20, 41.7, -71.5, 28, 29), "SC": (90, 33.9, -80.9, 290, 299),
+    "SD": (25, 44.4, -100.2, 570, 577), "TN": (150, 35.9, -86.4, 370, 385),
+    "TX": (420, 31.5, -99.3, 750, 799), "UT": (60, 39.3, -111.7, 840, 847),
+    "VT": (25, 44.1, -72.7, 50, 59), "VA": (160, 37.5, -78.9, 220, 246),
+    "WA": (110, 47.4, -120.5, 980, 994), "WV": (50, 38.6, -80.6, 247, 268),
+    "WI": (110, 44.6, -89.9, 530, 549), "WY": (15, 43.0, -107.6, 820, 831),
+}
+_STATE_CODES = list(STATES)
+_STATE_TABLE = np.array([STATES[code] for code in _STATE_CODES], dtype=float)
+_STATE_P = _STATE_TABLE[:, 0] / _STATE_TABLE[:, 0].sum()
+
+CITIES = [
+    "Springfield", "Franklin", "Greenville", "Bristol", "Clinton", "Fairview", "Salem",
+    "Madison", "Georgetown", "Arlington", "Ashland", "Burlington", "Manchester", "Oxford",
+    "Jackson", "Milton", "Newport", "Auburn", "Dayton", "Lexington", "Riverside", "Hudson",
+    "Kingston", "Marion", "Mount Vernon", "Oakland", "Princeton", "Richmond", "Columbia",
+    "Lakewood", "Monroe", "Dover", "Troy", "Cleveland", "Florence", "Lincoln", "Jamestown",
+]
+_NAME_WORDS = [
+    "Saint Mary", "Westfield", "Pinecrest", "Lakeshore", "Northern", "Southern", "Eastern",
+    "Western", "Central", "Valley", "Summit", "Harbor", "Heritage", "Liberty", "Pacific",
+    "Atlantic", "Cedar", "Maple", "Riverbend", "Highland", "Grace", "Trinity", "Union",
+]
+
+# ownership: 1 public, 2 private nonprofit, 3 private for-profit
+_OWNERSHIP_P = [0.30, 0.26, 0.44]
+# predominant degree: 1 certificate, 2 associate, 3 bachelor's, 4 graduate
+_DEGREE_P = {1: [0.25, 0.35, 0.35, 0.05], 2: [0.15, 0.10, 0.60, 0.15], 3: [0.70, 0.15, 0.12, 0.03]}
+# Median in-state tuition by ownership
+_TUITION_MEDIAN = {1: 6_500, 2: 30_000, 3: 15_000}
+_LOCALE_CODES = np.array([11, 12, 13, 21, 22, 23, 31, 32, 33, 41, 42, 43])
+_LOCALE_P = np.array([16, 12, 12, 18, 7, 5, 7, 5, 3, 5, 6, 4], dtype=float)
+_LOCALE_P /= _LOCALE_P.sum()
+
+
+# 4-digit CIP programs: (code, title). Certificate schools draw from the first group only
+_CAREER_PROGRAMS = [
+    ("1204", "Cosmetology and Related Personal Grooming Services."), ("1205", "Culinary, Entertainment, and Personal Services."),
+    ("4702", "Heating, Air Conditioning, Ventilation and Refrigeration Maintenance Technology/Technician."),
+    ("4706", "Vehicle Maintenance and Repair Technologies."), ("4805", "Precision Metal Working."),
+    ("5107", "Health and Medical Administrative Services."), ("5108", "Allied Health and Medical Assisting Services."),
+    ("5109", "Allied Health Diagnostic, Intervention, and Treatment Professions."),
+    ("5139", "Practical Nursing, Vocational Nursing and Nursing Assistants."),
+]
+_ACADEMIC_PROGRAMS = [
+    ("0901", "Communication and Media Studies."), ("1101", "Computer and Information Sciences, General."),
+    ("1107", "Computer Science."), ("1110", "Computer/Information Technology Administration and Management."),
+    ("1301", "Education, General."), ("1312", "Teacher Education and Professional Development, Specific Levels and Methods."),
+    ("1408", "Civil Engineering."), ("1409", "Computer Engineering."), ("1410", "Electrical, Electronics and Communications Engineering."),
+    ("1419", "Mechanical Engineering."), ("1501", "Architectural Engineering Technologies/Technicians."),
+    ("1601", "Linguistic, Comparative, and Related Language Studies and Services."), ("2301", "English Language and Literature, General."),
+    ("2401", "Liberal Arts and Sciences, General Studies and Humanities."), ("2601", "Biology, General."),
+    ("2613", "Ecology, Evolution, Systematics, and Population Biology."), ("2701", "Mathematics."),
+    ("3101", "Parks, Recreation and Leisure Studies."), ("3801", "Philosophy."), ("4005", "Chemistry."),
+    ("4008", "Physics."), ("4201", "Psychology, General."), ("4301", "Criminal Justice and Corrections."),
+    ("4401", "Human Services, General."), ("4506", "Economics."), ("4510", "Political Science and Government."),
+    ("4511", "Sociology."), ("5001", "Arts, Entertainment, and Media Management."), ("5007", "Fine and Studio Arts."),
+    ("5009", "Music."), ("5138", "Registered Nursing, Nursing Administration, Nursing Research and Clinical Nursing."),
+    ("5120", "Pharmacy, Pharmaceutical Sciences, and Administration."), ("5201", "Business/Commerce, General."),
+    ("5202", "Business Administration, Management and Operations."), ("5203", "Accounting and Related Services."),
+    ("5208", "Finance and Financial Management Services."), ("5214", "Marketing."), ("5401", "History."),
+]
+_ALL_PROGRAMS = _CAREER_PROGRAMS + _ACADEMIC_PROGRAMS
+# Programs per school by predominant degree: (min, max)
+_PROGRAM_COUNTS = {1: (1, 4), 2: (4, 16), 3: (8, 35), 4: (12, 45)}
+
+
+def _programs(rng: np.random.Generator, degree: int) -> list:
+    """latest.programs.cip_4_digit: one entry per program and credential level, as the API lists them"""
+    low, high = _PROGRAM_COUNTS[degree]
+    choices = _CAREER_PROGRAMS if degree == 1 else _ALL_PROGRAMS
+    count = min(int(rng.integers(low, high + 1)), len(choices))
+    programs = []
+    for index in sorted(rng.choice(len(choices), size=count, replace=False).tolist()):
+        code, title = choices[index]
+        levels = [degree] if degree < 4 else [3, 5]
+        programs += [{"code": code, "title": title, "credential": {"level": level}} for level in levels]
+    return programs
+
+
+def _maybe(values: np.ndarray, present: np.ndarray) -> list:
+    """Python values with None where absent (as the API returns them)"""
+    return [value if keep else None for value, keep in zip(values.tolist(), present.tolist())]
+
+
+def _school_name(rng: np.random.Generator, city: str, ownership: int, degree: int) -> str:
+    """Plausible institution name; common names repeat, as they do in the real data"""
+    word = _NAME_WORDS[rng.integers(len(_NAME_WORDS))]
+    if degree == 1:
+        kinds = ["Beauty Academy", "Institute of Technology", "Career College", "School of Nursing"]
+        return f"{city} {kinds[rng.integers(len(kinds))]}"
+    if degree == 2:
+        return f"{word} {city} Community College"
+    if ownership == 1:
+        return f"{city} State University" if rng.random() < 0.5 else f"University of {word} {city}"
+    kinds = ["College", "University", "College of Arts and Sciences", "Institute"]
+    return f"{word} {kinds[rng.integers(len(kinds))]}"
+
+
+@lru_cache(maxsize=16)
+def _block(seed: int, block: int) -> list:
+    """
+    All records of one block, as raw API payloads with flat dotted keys
+    Cached because consecutive API pages fall in the same block; callers must not mutate them
+    """
+    rng = np.random.default_rng([seed, block])
+    start = block * BLOCK_SIZE
+    n = BLOCK_SIZE
+
+    state_idx = rng.choice(len(_STATE_CODES), size=n, p=_STATE_P)
+    ownership = rng.choice([1, 2, 3], size=n, p=_OWNERSHIP_P)
+    degree = np.empty(n, dtype=int)
+    for owner, p in _DEGREE_P.items():
+        mask = ownership == owner
+        degree[mask] = rng.choice([1, 2, 3, 4], size=int(mask.sum()), p=p)
+    four_year = degree >= 3
+    locale = rng.choice(_LOCALE_CODES, size=n, p=_LOCALE_P)
+
+    median = np.vectorize(_TUITION_MEDIAN.get)(ownership)
+    tuition_in = np.round(median * rng.lognormal(0.0, 0.45, n), -1)
+    tuition_out = np.where(ownership == 1, np.round(tuition_in * rng.uniform(1.8, 3.2, n), -1), tuition_in)
+    size = np.maximum(10, rng.lognormal(np.where(four_year, 7.6, 5.6), 1.1)).astype(int)
+    undergrad = np.maximum(10, (size * rng.uniform(1.0, 1.5, n))).astype(int)
+
+    admission_rate = np.round(rng.beta(5.0, 1.8, n), 4)
+    selective = rng.random(n) < 0.12
+    admission_rate[selective] = np.round(rng.uniform(0.03, 0.4, int(selective.sum())), 4)
+    sat = np.clip(np.round(1450 - 600 * admission_rate + rng.normal(0, 70, n)), 800, 1580).astype(int)
+    act = np.clip(np.round(sat / 44 + rng.normal(0, 1.2, n)), 12, 36).astype(int)
+    completion = np.round(np.clip(rng.beta(4.0, 3.0, n) + (1 - admission_rate) * 0.25, 0, 1), 4)
+    earnings = np.round(42_000 * rng.lognormal(0.0, 0.3, n) * np.where(four_year, 1.15, 0.85), -2)
+
+    state_rows = _STATE_TABLE[state_idx]
+    lat = np.round(state_rows[:, 1] + rng.normal(0, 1.2, n), 5)
+    lon = np.round(state_rows[:, 2] + rng.normal(0, 1.6, n), 5)
+    zip3 = rng.integers(state_rows[:, 3], state_rows[:, 4] + 1)
+    zips = zip3 * 100 + rng.integers(0, 100, n)
+
+    # Missing data: admissions for four-year schools only, outcomes mostly present
+    has_admissions = four_year & (rng.random(n) < 0.85)
+    has_sat = has_admissions & (rng.random(n) < 0.55)
+    has_completion = four_year & (rng.random(n) < 0.9)
+    has_earnings = rng.random(n) < 0.88
+    has_tuition = rng.random(n) < 0.97
+    has_locale = rng.random(n) < 0.98
+    has_url = rng.random(n) < 0.95
+
+    cities = rng.integers(len(CITIES), size=n)
+    columns = {
+        "school.state": [_STATE_CODES[i] for i in state_idx.tolist()],
+        "school.city": [CITIES[i] for i in cities.tolist()],
+        "school.zip": [f"{z:05d}" for z in zips.tolist()],
+        "school.ownership": ownership.tolist(),
+        "school.degrees_awarded.predominant": degree.tolist(),
+        "school.locale": _maybe(locale, has_locale),
+        "latest.admissions.admission_rate.overall": _maybe(admission_rate, has_admissions),
+        "latest.admissions.sat_scores.average.overall": _maybe(sat, has_sat),
+        "latest.admissions.act_scores.midpoint.cumulative": _maybe(act, has_sat),
+        "latest.cost.tuition.in_state": _maybe(tuition_in, has_tuition),
+        "latest.cost.tuition.out_of_state": _maybe(tuition_out, has_tuition),
+        "latest.student.size": size.tolist(),
+        "latest.student.enrollment.undergrad_12_month": undergrad.tolist(),
+        "latest.completion.completion_rate_4yr_150nt": _maybe(completion, has_completion),
+        "latest.earnings.10_yrs_after_entry.median": _maybe(earnings, has_earnings),
+        "location.lat": lat.tolist(),
+        "location.lon": lon.tolist(),
+    }
+
+    # Programs come from their own generator so the other fields do not depend on them
+    program_rng = np.random.default_rng([seed, block, 1])
+    records = []
+    for i in range(n):
+        index = start + i
+        record = {key: values[i] for key, values in columns.items()}
+        unit_id = FIRST_UNIT_ID + index
+        record["id"] = unit_id
+        record["school.ope6_id"] = f"{unit_id % 1_000_000:06d}"
+        record["school.name"] = _school_name(
+            rng, record["school.city"], record["school.ownership"], record["school.degrees_awarded.predominant"]
+        )
+        record["school.school_url"] = f"www.school{unit_id}.edu" if has_url[i] else None
+        record["latest.programs.cip_4_digit"] = _programs(program_rng, int(degree[i]))
+        records.append(record)
+    return records
+
+
+def api_records(start: int, stop: int, seed: int = 42) -> list:
+    """Raw API payloads for records [start, stop) of the dataset"""
+    if stop <= start:
+        return []
+    records = []
+    for block in range(start // BLOCK_SIZE, (stop - 1) // BLOCK_SIZE + 1):
+        block_start = block * BLOCK_SIZE
+        records += _block(seed, block)[max(start - block_start, 0):stop - block_start]
+    return records
+
+
+def iter_api_records(n: int, seed: int = 42, chunk_size: int = 10 * BLOCK_SIZE) -> Iterator[list]:
+    """The first n API payloads, in chunks, without holding the whole dataset in memory"""
+    for start in range(0, n, chunk_size):
+        yield api_records(start, min(start + chunk_size, n), seed)
+
+
+def iter_school_rows(n: int, seed: int = 42, chunk_size: int = 10 * BLOCK_SIZE) -> Iterator[tuple]:
+    """
+    The same dataset as (School column dicts, unit_id -> programs), mapped exactly as
+    ingestion maps it
+    """
+    for records in iter_api_records(n, seed, chunk_size):
+        yield map_page(records), map_page_programs(records)
+
+
+def seed_database(engine, n: int, seed: int = 42) -> int:
+    """
+    Replace the school, program and similar-school tables with the first n generated
+    schools; returns the row count
+    """
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.exec(delete(SchoolNeighbor))
+        session.exec(delete(SchoolProgram))
+        session.exec(delete(Program))
+        session.exec(delete(School))
+        for rows, programs in iter_school_rows(n, seed):
+            session.execute(insert(School), [{**row, "created_at": now, "updated_at": now} for row in rows])
+            write_school_programs(session, programs)
+        rebuild_neighbors(session)
+        bump_dataset_version(session)
+        session.commit()
+    return n
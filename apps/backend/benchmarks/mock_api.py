@@ -0,0 +1,72 @@
+"""
+Local stand-in for the College Scorecard API
+
+Serves the synthetic dataset with the real API's paging contract
+(page, per_page, metadata.total). Pages are generated on request, so even the
+1M-record scale needs no memory up front.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.generator import api_records
+
+
+class MockScorecardAPI:
+    """
+    Threaded HTTP server for the first `total` generated records
+    latency adds a fixed delay per request to mimic the network round trip.
+    Use as a context manager; base_url is the value for COLLEGE_SCORECARD_BASE_URL.
+    """
+
+    def __init__(self, total: int, seed: int = 42, latency: float = 0.0, port: int = 0):
+        self.total = total
+        self.seed = seed
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/schools"
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                page = int(query.get("page", ["0"])[0])
+                per_page = int(query.get("per_page", ["20"])[0])
+                api.requests += 1
+                if api.latency:
+                    time.sleep(api.latency)
+                start = min(page * per_page, api.total)
+                stop = min(start + per_page, api.total)
+                body = json.dumps({
+                    "metadata": {"total": api.total, "page": page, "per_page": per_page},
+                    "results": api_records(start, stop, api.seed),
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
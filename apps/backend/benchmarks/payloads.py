@@ -0,0 +1,117 @@
+"""
+Response encoding benchmark
+
+    python -m benchmarks.payloads --database-url sqlite:////tmp/internavi-bench-7k-42.db
+    python -m benchmarks.payloads --runs 500 --output benchmarks/results/payloads.json
+
+Builds real response bodies in-process from an already seeded database (a page of
+/api/schools at page_size=100, with the default and with all fields, and a
+/api/quiz-match result), then reports per payload (milliseconds are medians):
+- encode.jsonable_encoder: FastAPI's generic path (jsonable_encoder, then JSONResponse)
+- encode.dumps: serialization.dumps (orjson when installed)
+- compress.<encoding>: compressing the encoded body as CompressionMiddleware does
+- bytes.<encoding>: bytes on the wire, identity and per supported encoding
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+
+QUIZ_ANSWERS = {
+    "study_level": "undergraduate",
+    "preferred_location": "any",
+    "budget_range": "medium",
+    "program_interest": "any",
+    "admission_preference": "any",
+}
+
+
+def build_payloads() -> dict:
+    """Response content (before encoding) of each benchmarked endpoint"""
+    from sqlmodel import Session
+
+    from database import DatabaseSession, get_engine
+    from filters import SchoolFilters
+    from models import LIST_FIELDS, School
+    from routers import QuizMatchRequest, list_schools, match_schools
+
+    def page(session, fields: tuple) -> dict:
+        filters = SchoolFilters(
+            state=None, school_type=None, locale=None, min_tuition=None, max_tuition=None,
+            near=None, radius=25.0, program=None,
+        )
+        return list_schools(session, filters, "name", "asc", 1, 100, None, True, fields)
+
+    with Session(get_engine()) as session:
+        return {
+            "schools_100": page(session, LIST_FIELDS),
+            "schools_100_all_fields": page(session, tuple(School.__table__.columns.keys())),
+            "quiz_match": asyncio.run(match_schools(DatabaseSession(session), QuizMatchRequest(**QUIZ_ANSWERS))),
+        }
+
+
+def median_ms(fn, runs: int) -> float:
+    return round(statistics.median(timeit.repeat(fn, number=1, repeat=runs)) * 1000, 3)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure response encoding time and bytes on the wire")
+    parser.add_argument("--database-url", help="Seeded database (default: the benchmarks.run 7k SQLite file)")
+    parser.add_argument("--runs", type=int, default=200, help="Timed repetitions per measurement")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/payloads-<time>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_url = args.database_url or os.environ.get("DATABASE_URL") or (
+        f"sqlite:///{tempfile.gettempdir()}/internavi-bench-7k-42.db"
+    )
+    os.environ["DATABASE_URL"] = database_url
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    import serialization
+    from benchmarks.results import build_meta, write_results
+    from compression import ENCODINGS, compress
+
+    metrics = {}
+    print(f"dumps uses {'orjson' if serialization.orjson is not None else 'json (orjson not installed)'}; "
+          f"encodings: {', '.join(ENCODINGS)}")
+    for name, content in build_payloads().items():
+        body = serialization.dumps(content)
+        prefix = f"payloads.{name}"
+        metrics[f"{prefix}.encode.jsonable_encoder.p50_ms"] = median_ms(
+            lambda: JSONResponse(content=jsonable_encoder(content)).body, args.runs
+        )
+        metrics[f"{prefix}.encode.dumps.p50_ms"] = median_ms(lambda: serialization.dumps(content), args.runs)
+        metrics[f"{prefix}.bytes.identity"] = len(body)
+        for coding in ENCODINGS:
+            metrics[f"{prefix}.compress.{coding}.p50_ms"] = median_ms(lambda: compress(body, coding), args.runs)
+            metrics[f"{prefix}.bytes.{coding}"] = len(compress(body, coding))
+
+        print(f"{name}:")
+        for metric, value in metrics.items():
+            if metric.startswith(prefix + "."):
+                print(f"  {metric[len(prefix) + 1:]:<34}{value:>12}")
+
+    dialect = database_url.split(":", 1)[0].split("+", 1)[0]
+    meta = build_meta("payloads", None, dialect, BACKEND_DIR)
+    meta["encoder"] = "orjson" if serialization.orjson is not None else "json"
+    output = args.output or BENCHMARKS_DIR / "results" / f"payloads-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    write_results(output, meta, metrics)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
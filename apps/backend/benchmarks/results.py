@@ -0,0 +1,101 @@
+"""
+Benchmark result files and regression checks
+
+A result file is JSON: {"meta": {...}, "metrics": {"scenario.metric": value}}.
+check_results compares a run against absolute budgets for its scale and, when a
+baseline file is given, against the baseline with a per-metric tolerance.
+"""
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Optional
+
+
+def git_revision(cwd: Path) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_meta(scale: str, seed: int, database_dialect: str, cwd: Path) -> dict:
+    return {
+        "scale": scale,
+        "seed": seed,
+        "database": database_dialect,
+        "revision": git_revision(cwd),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_results(path: Path, meta: dict, metrics: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": meta, "metrics": metrics}, indent=2, sort_keys=True) + "\n")
+
+
+def load_json(path: Path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def direction(metric: str) -> Optional[str]:
+    """'lower' or 'higher' is better, or None for informational metrics"""
+    if metric.endswith("_per_s"):
+        return "higher"
+    if metric.endswith("_ms") or metric.endswith("_s"):
+        return "lower"
+    return None
+
+
+def _tolerance(metric: str, thresholds: dict) -> float:
+    """Allowed regression in percent: the first matching pattern wins, else the default"""
+    for pattern, percent in thresholds.get("max_regression_pct", {}).items():
+        if pattern != "default" and fnmatch(metric, pattern):
+            return percent
+    return thresholds.get("max_regression_pct", {}).get("default", 25)
+
+
+def check_results(results: dict, thresholds: dict, baseline: Optional[dict] = None) -> list:
+    """
+    Failure messages for a run: exceeded budgets, then regressions against the baseline
+    Only metrics matching a "compare" pattern are checked against the baseline, and
+    timings must also move by more than min_delta_ms, so timer noise on fast
+    endpoints does not fail a run.
+    """
+    failures = []
+    metrics = results["metrics"]
+    scale = results["meta"]["scale"]
+
+    for pattern, limit in thresholds.get("budgets", {}).get(scale, {}).items():
+        for metric, value in metrics.items():
+            if fnmatch(metric, pattern) and isinstance(value, (int, float)) and value > limit:
+                failures.append(f"{metric} = {value} exceeds budget {limit}")
+
+    if baseline is None:
+        return failures
+    if baseline["meta"].get("scale") != scale:
+        return failures + [f"baseline scale {baseline['meta'].get('scale')} does not match run scale {scale}"]
+
+    patterns = thresholds.get("compare", ["*"])
+    min_delta_ms = thresholds.get("min_delta_ms", 0)
+    for metric, value in metrics.items():
+        better = direction(metric)
+        previous = baseline["metrics"].get(metric)
+        if better is None or not isinstance(previous, (int, float)) or not previous:
+            continue
+        if not any(fnmatch(metric, pattern) for pattern in patterns):
+            continue
+        delta_ms = abs(value - previous) * (1 if metric.endswith("_ms") else 1000)
+        if better == "lower" and delta_ms < min_delta_ms:
+            continue
+        change = (value - previous) / previous * 100
+        regression = change if better == "lower" else -change
+        if regression > _tolerance(metric, thresholds):
+            failures.append(f"{metric}: {previous} -> {value} ({change:+.1f}%)")
+    return failures
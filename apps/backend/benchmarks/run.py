@@ -0,0 +1,179 @@
+"""
+Benchmark runner
+
+    python -m benchmarks.run --scale 7k
+    python -m benchmarks.run --scale 100k --baseline benchmarks/results/100k-main.json
+
+Seeds the database (a scratch SQLite file unless --database-url is given) with the
+synthetic dataset, starts the API with uvicorn, runs the scenarios and writes a
+JSON result file. Exits with status 1 when a budget or baseline threshold fails.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARKS_DIR.parent
+
+
+def parse_args(argv=None):
+    from benchmarks.generator import SCALES
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Run the Internavi backend benchmarks")
+    parser.add_argument("--scale", choices=SCALES, default="7k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--database-url", help="Database to seed and serve (default: scratch SQLite file)")
+    parser.add_argument("--reseed", action="store_true", help="Reseed even if the row count already matches")
+    parser.add_argument("--url", help="Benchmark an already running API instead of starting one")
+    parser.add_argument("--concurrency", default="1,8,32", help="Quiz-match client counts")
+    parser.add_argument("--quiz-requests", type=int, default=300, help="Quiz-match requests per concurrency level")
+    parser.add_argument("--ingest-records", type=int, help="Records served by the mock API (default: the scale)")
+    parser.add_argument("--ingest-database-url", help="Empty database for the ingestion scenario")
+    parser.add_argument("--no-ingest-baseline", action="store_true",
+                        help="Skip the row-by-row ingestion baseline (slow at the larger scales)")
+    parser.add_argument("--mapping-records", type=int, default=100_000, help="API records mapped by the mapping scenario")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Mock API delay per request, in seconds")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/<scale>-<time>.json)")
+    parser.add_argument("--baseline", type=Path, help="Earlier result file to compare against")
+    parser.add_argument("--thresholds", type=Path, default=BENCHMARKS_DIR / "thresholds.json")
+    return parser.parse_args(argv)
+
+
+def prepare_database(n: int, seed: int, reseed: bool) -> str:
+    """Create the schema and seed n schools unless the table already holds n rows"""
+    from sqlmodel import Session, func, select
+
+    from benchmarks.generator import seed_database
+    from database import engine, init_db
+    from models import School
+
+    init_db()
+    with Session(engine) as session:
+        count = session.exec(select(func.count()).select_from(School)).one()
+    if reseed or count != n:
+        print(f"Seeding {n:,} schools into {engine.dialect.name} (seed {seed})...")
+        started = time.perf_counter()
+        seed_database(engine, n, seed)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+    return engine.dialect.name
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str) -> tuple:
+    """Start uvicorn on a free port; returns (process, base URL)"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": database_url},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health").status_code == 200:
+                return process, base_url
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not become healthy")
+
+
+async def run_scenarios(base_url: str, names: list, total: int, seed: int, options: dict) -> dict:
+    from benchmarks.scenarios import QUIZ_OPTIONS, SCENARIOS, BenchContext
+
+    metrics = {}
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        ctx = BenchContext(client, total, seed, options)
+        # Warm up connections, the dataset version and the quiz snapshot outside the measurements
+        await client.get("/api/schools", params={"page_size": 1, "include_total": "false"})
+        await client.post("/api/quiz-match", json=dict.fromkeys(QUIZ_OPTIONS, "any"))
+        for name in names:
+            print(f"Running {name}...")
+            started = time.perf_counter()
+            for metric, value in (await SCENARIOS[name](ctx)).items():
+                metrics[f"{name}.{metric}"] = value
+            print(f"  {name} done in {time.perf_counter() - started:.1f}s")
+    return metrics
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_url = args.database_url or os.environ.get("DATABASE_URL") or (
+        f"sqlite:///{tempfile.gettempdir()}/internavi-bench-{args.scale}-{args.seed}.db"
+    )
+    # database.py reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = database_url
+
+    from benchmarks.generator import SCALES
+    from benchmarks.results import build_meta, check_results, load_json, write_results
+    from benchmarks.scenarios import SCENARIOS
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}")
+        return 2
+
+    total = SCALES[args.scale]
+    dialect = prepare_database(total, args.seed, args.reseed)
+    options = {
+        "concurrency": [int(c) for c in args.concurrency.split(",")],
+        "quiz_requests": args.quiz_requests,
+        "ingest_records": args.ingest_records,
+        "ingest_database_url": args.ingest_database_url,
+        "ingest_baseline": not args.no_ingest_baseline,
+        "api_latency": args.api_latency,
+        "mapping_records": args.mapping_records,
+    }
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(database_url)
+    try:
+        metrics = asyncio.run(run_scenarios(base_url, names, total, args.seed, options))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    results = {"meta": build_meta(args.scale, args.seed, dialect, BACKEND_DIR), "metrics": metrics}
+    output = args.output or BENCHMARKS_DIR / "results" / (
+        f"{args.scale}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    )
+    write_results(output, results["meta"], metrics)
+    print(f"Results written to {output}")
+
+    baseline = load_json(args.baseline) if args.baseline else None
+    failures = check_results(results, load_json(args.thresholds), baseline)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        return 1
+    print("All thresholds passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,463 @@
+"""
+Benchmark scenarios
+
+Each scenario is an async function taking a BenchContext and returning a flat dict
+of metrics. Metric names carry their direction: *_ms and *_s are lower-is-better,
+*_per_s is higher-is-better; everything else is informational.
+"""
+import asyncio
+import itertools
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import numpy as np
+
+from models import SORTABLE_FIELDS
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PAGE_SIZE = 50
+
+QUIZ_OPTIONS = {
+    "study_level": ["high school", "undergraduate", "graduate"],
+    "preferred_location": ["any", "urban", "suburban", "rural", "CA", "NY", "TX", "FL", "IL"],
+    "budget_range": ["low", "medium", "high"],
+    "program_interest": ["Computer Science", "Business", "Engineering", "Nursing", "Biology",
+                         "Psychology", "Education", "Art", "any"],
+    "admission_preference": ["any", "selective", "moderate", "open"],
+}
+
+LIST_FILTERS = [
+    {},
+    {"state": "CA"},
+    {"school_type": "1"},
+    {"locale": "City"},
+    {"min_tuition": 5000, "max_tuition": 20000},
+    {"state": "NY", "max_tuition": 15000},
+    {"school_type": "2", "locale": "Suburban"},
+    {"program": "nursing"},
+]
+
+
+class BenchContext:
+    """What a scenario needs: an HTTP client for the API under test and the run settings"""
+
+    def __init__(self, client: httpx.AsyncClient, total: int, seed: int, options: dict):
+        self.client = client
+        self.total = total
+        self.seed = seed
+        self.options = options
+
+
+def summarize(latencies: list, prefix: str, wall_seconds: Optional[float] = None) -> dict:
+    """Latency percentiles (and throughput when the wall time is known) under one prefix"""
+    if not latencies:
+        return {f"{prefix}.count": 0}
+    values = np.array(latencies) * 1000
+    metrics = {
+        f"{prefix}.count": len(values),
+        f"{prefix}.mean_ms": round(float(values.mean()), 3),
+        f"{prefix}.p50_ms": round(float(np.percentile(values, 50)), 3),
+        f"{prefix}.p95_ms": round(float(np.percentile(values, 95)), 3),
+        f"{prefix}.p99_ms": round(float(np.percentile(values, 99)), 3),
+        f"{prefix}.max_ms": round(float(values.max()), 3),
+    }
+    if wall_seconds:
+        metrics[f"{prefix}.throughput_per_s"] = round(len(values) / wall_seconds, 2)
+    return metrics
+
+
+async def _timed_get(client: httpx.AsyncClient, url: str, params: dict) -> tuple:
+    started = time.perf_counter()
+    response = await client.get(url, params=params)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed, response.json()
+
+
+async def deep_pagination(ctx: BenchContext) -> dict:
+    """
+    Offset vs cursor paging at increasing depth
+    Offset pages are requested directly; cursor pages follow next_cursor from the
+    offset page just before the same depth, so both read identical rows.
+    """
+    metrics = {}
+    pages = max(1, math.ceil(ctx.total / PAGE_SIZE))
+    depths = {"first": 1, "10pct": max(1, pages // 10), "50pct": max(1, pages // 2), "last": pages}
+    samples = ctx.options.get("pagination_samples", 10)
+
+    for sort_by, sort_order in (("name", "asc"), ("tuition_in_state", "desc")):
+        base = {"sort_by": sort_by, "sort_order": sort_order, "page_size": PAGE_SIZE, "include_total": "false"}
+        for label, depth in depths.items():
+            # Distinct pages per sample, so none is served from the response cache
+            page_numbers = sorted({min(pages, max(1, depth - i)) for i in range(samples)})
+            offset_latencies, cursor_latencies = [], []
+            for page in page_numbers:
+                elapsed, body = await _timed_get(ctx.client, "/api/schools", {**base, "page": page})
+                offset_latencies.append(elapsed)
+                cursor = body.get("next_cursor")
+                if cursor:
+                    elapsed, _ = await _timed_get(ctx.client, "/api/schools", {**base, "cursor": cursor})
+                    cursor_latencies.append(elapsed)
+            prefix = f"{sort_by}_{sort_order}.{label}"
+            metrics.update(summarize(offset_latencies, f"{prefix}.offset"))
+            metrics.update(summarize(cursor_latencies, f"{prefix}.cursor"))
+    return metrics
+
+
+async def filter_sort(ctx: BenchContext) -> dict:
+    """Every filter preset with every sortable field in both directions, cold and then cached"""
+    combinations = [
+        {**filters, "sort_by": sort_by, "sort_order": order, "page_size": PAGE_SIZE}
+        for filters in LIST_FILTERS
+        for sort_by in SORTABLE_FIELDS
+        for order in ("asc", "desc")
+    ]
+    metrics = {"combinations": len(combinations)}
+    for label in ("cold", "cached"):
+        latencies = []
+        slowest = (0.0, None)
+        for params in combinations:
+            elapsed, _ = await _timed_get(ctx.client, "/api/schools", params)
+            latencies.append(elapsed)
+            slowest = max(slowest, (elapsed, params), key=lambda item: item[0])
+        metrics.update(summarize(latencies, label))
+        metrics[f"{label}.slowest"] = str(slowest[1])
+    return metrics
+
+
+def quiz_answers(rng: random.Random) -> dict:
+    return {field: rng.choice(options) for field, options in QUIZ_OPTIONS.items()}
+
+
+async def quiz_match(ctx: BenchContext) -> dict:
+    """
+    POST /api/quiz-match from N concurrent clients
+    Answers are drawn from the quiz form's options, so repeats hit the response cache
+    the way real traffic would; the hit ratio is reported alongside the latencies.
+    """
+    metrics = {}
+    requests = ctx.options.get("quiz_requests", 300)
+    for concurrency in ctx.options.get("concurrency", (1, 8, 32)):
+        rng = random.Random(f"{ctx.seed}-{concurrency}")
+        bodies = [quiz_answers(rng) for _ in range(requests)]
+        before = (await ctx.client.get("/api/cache-stats")).json()["responses"]
+        latencies = []
+
+        async def worker(queue: list):
+            while queue:
+                body = queue.pop()
+                started = time.perf_counter()
+                response = await ctx.client.post("/api/quiz-match", json=body)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code not in (200, 404):
+                    response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(bodies) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        after = (await ctx.client.get("/api/cache-stats")).json()["responses"]
+
+        metrics.update(summarize(latencies, f"c{concurrency}", wall))
+        hits = after["hits"] - before["hits"]
+        metrics[f"c{concurrency}.cache_hit_ratio"] = round(hits / max(1, len(latencies)), 3)
+    return metrics
+
+
+async def health_under_load(ctx: BenchContext) -> dict:
+    """
+    /health latency sampled while concurrent clients POST /api/quiz-match
+    Matching runs off the event loop, so the liveness probe should stay fast however
+    busy the quiz endpoint is. Quiz requests the concurrency limiter turns away (503)
+    are counted, not failed.
+    """
+    concurrency = max(ctx.options.get("concurrency", (32,)))
+    interval = ctx.options.get("health_interval", 0.01)
+    rng = random.Random(f"{ctx.seed}-health")
+    bodies = [quiz_answers(rng) for _ in range(ctx.options.get("quiz_requests", 300))]
+    quiz_latencies, health_latencies = [], []
+    rejected = 0
+    loaded = asyncio.Event()
+
+    async def worker(queue: list):
+        nonlocal rejected
+        while queue:
+            body = queue.pop()
+            started = time.perf_counter()
+            response = await ctx.client.post("/api/quiz-match", json=body)
+            quiz_latencies.append(time.perf_counter() - started)
+            if response.status_code == 503:
+                rejected += 1
+            elif response.status_code not in (200, 404):
+                response.raise_for_status()
+
+    async def sampler():
+        while not loaded.is_set():
+            started = time.perf_counter()
+            response = await ctx.client.get("/health")
+            health_latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            await asyncio.sleep(interval)
+
+    sampling = asyncio.create_task(sampler())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(bodies) for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    loaded.set()
+    await sampling
+
+    metrics = {"concurrency": concurrency}
+    metrics.update(summarize(quiz_latencies, "quiz", wall))
+    metrics["quiz.rejected"] = rejected
+    metrics.update(summarize(health_latencies, "health"))
+    return metrics
+
+
+async def mapping(ctx: BenchContext) -> dict:
+    """
+    API record mapping throughput: scorecard.map_page against one School instance per
+    record (map_college_scorecard_to_school), on the same generated records
+    Record generation is outside the timings. Needs no API server or database.
+    """
+    from benchmarks.generator import iter_api_records
+    from scorecard import map_college_scorecard_to_school, map_page
+
+    records = ctx.options.get("mapping_records", 100_000)
+
+    def run() -> dict:
+        seconds = {"map_page": 0.0, "map_college_scorecard_to_school": 0.0}
+        for chunk in iter_api_records(records, ctx.seed):
+            started = time.perf_counter()
+            map_page(chunk)
+            seconds["map_page"] += time.perf_counter() - started
+            started = time.perf_counter()
+            for record in chunk:
+                map_college_scorecard_to_school(record)
+            seconds["map_college_scorecard_to_school"] += time.perf_counter() - started
+        metrics = {"records": records}
+        for name, elapsed in seconds.items():
+            metrics[f"{name}.wall_s"] = round(elapsed, 3)
+            metrics[f"{name}.records_per_s"] = round(records / elapsed, 1)
+        metrics["map_page.speedup"] = round(seconds["map_college_scorecard_to_school"] / seconds["map_page"], 2)
+        return metrics
+
+    return await asyncio.to_thread(run)
+
+
+def _count_schools(database_url: str) -> int:
+    from sqlalchemy import create_engine, text
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT count(*) FROM school")).scalar_one()
+    finally:
+        engine.dispose()
+
+
+def _run_ingest(database_url: str, base_url: str, options: dict) -> tuple:
+    """Run ingest_data.py; returns (wall seconds, seconds spent fetching and writing pages)"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "COLLEGE_SCORECARD_BASE_URL": base_url,
+        "COLLEGE_SCORECARD_API_KEY": "benchmark",
+        "INGEST_PER_PAGE": str(options.get("ingest_per_page", 100)),
+        "INGEST_CONCURRENCY": str(options.get("ingest_concurrency", 4)),
+        "INGEST_RATE_LIMIT": str(options.get("ingest_rate_limit", 1000)),
+    }
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "ingest_data.py"], cwd=BACKEND_DIR, env=env, check=True,
+        stdout=subprocess.PIPE, text=True
+    )
+    wall = time.perf_counter() - started
+    pages = re.search(r"Pages fetched and written in ([\d.]+)s", completed.stdout)
+    return wall, float(pages.group(1))
+
+
+def _run_row_by_row_ingest(database_url: str, base_url: str, options: dict) -> float:
+    """
+    The ingestion path before batched upserts, as a baseline: pages fetched one at a
+    time, then per record a SELECT by unit_id and a session.add, committing every 50
+    """
+    from sqlalchemy import create_engine
+    from sqlmodel import Session, SQLModel, select
+
+    from models import School
+    from scorecard import map_college_scorecard_to_school
+
+    per_page = options.get("ingest_per_page", 100)
+    engine = create_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    started = time.perf_counter()
+    try:
+        with httpx.Client(timeout=30.0) as client, Session(engine) as session:
+            page, inserted = 0, 0
+            while True:
+                response = client.get(base_url, params={"api_key": "benchmark", "page": page, "per_page": per_page})
+                results = response.json().get("results", [])
+                if not results:
+                    break
+                for record in results:
+                    school = map_college_scorecard_to_school(record)
+                    if school.unit_id and session.exec(
+                        select(School).where(School.unit_id == school.unit_id)
+                    ).first():
+                        continue
+                    session.add(school)
+                    inserted += 1
+                    if inserted % 50 == 0:
+                        session.commit()
+                session.commit()
+                page += 1
+        return time.perf_counter() - started
+    finally:
+        engine.dispose()
+
+
+def _drop_tables(database_url: str):
+    from sqlalchemy import create_engine
+    from sqlmodel import SQLModel
+
+    engine = create_engine(database_url)
+    try:
+        SQLModel.metadata.drop_all(engine)
+    finally:
+        engine.dispose()
+
+
+async def ingestion(ctx: BenchContext) -> dict:
+    """
+    Full ingest_data.py run against the mock API, into an empty database and then again
+    The second run exercises the unchanged-row path of the upsert. Unless
+    ingest_baseline is off, the row-by-row path it replaced first ingests the same
+    payload twice into the same database (then emptied), reported under baseline.
+    Uses a scratch SQLite file unless ingest_database_url points at an empty database.
+    """
+    from benchmarks.mock_api import MockScorecardAPI
+
+    records = ctx.options.get("ingest_records") or ctx.total
+    database_url = ctx.options.get("ingest_database_url")
+    scratch = None
+    if not database_url:
+        scratch = tempfile.NamedTemporaryFile(prefix="internavi-ingest-", suffix=".db", delete=False)
+        scratch.close()
+        os.unlink(scratch.name)
+        database_url = f"sqlite:///{scratch.name}"
+
+    metrics = {"records": records}
+    try:
+        with MockScorecardAPI(records, ctx.seed, latency=ctx.options.get("api_latency", 0.0)) as api:
+            baseline = {}
+            if ctx.options.get("ingest_baseline", True):
+                for label in ("initial", "repeat"):
+                    seconds = await asyncio.to_thread(_run_row_by_row_ingest, database_url, api.base_url, ctx.options)
+                    baseline[label] = seconds
+                    metrics[f"baseline.{label}.wall_s"] = round(seconds, 3)
+                    metrics[f"baseline.{label}.records_per_s"] = round(records / seconds, 1)
+                metrics["baseline.rows"] = _count_schools(database_url)
+                await asyncio.to_thread(_drop_tables, database_url)
+            requests_before = api.requests
+            for label in ("initial", "repeat"):
+                seconds, page_seconds = await asyncio.to_thread(_run_ingest, database_url, api.base_url, ctx.options)
+                metrics[f"{label}.wall_s"] = round(seconds, 3)
+                metrics[f"{label}.records_per_s"] = round(records / seconds, 1)
+                # The baseline only fetches and writes pages, so compare it with that part of the run
+                metrics[f"{label}.pages.wall_s"] = round(page_seconds, 3)
+                metrics[f"{label}.pages.records_per_s"] = round(records / page_seconds, 1)
+                if label in baseline:
+                    metrics[f"{label}.speedup"] = round(baseline[label] / page_seconds, 2)
+            metrics["api_requests"] = api.requests - requests_before
+        metrics["rows"] = _count_schools(database_url)
+    finally:
+        if scratch is not None and os.path.exists(scratch.name):
+            os.unlink(scratch.name)
+    return metrics
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def query_plans(ctx: BenchContext) -> dict:
+    """
+    PostgreSQL only: EXPLAIN every /api/schools filter/sort query, first page and keyset page
+    Counts plans with a sequential scan of school or a full sort, which on a large table
+    means a missing or unusable index. Skipped on other databases.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.dialects import postgresql
+    from sqlmodel import Session, select
+
+    from database import engine
+    from filters import SchoolFilters, resolve_sort_field
+    from models import School
+    from pagination import keyset_segments, order_clauses
+
+    if engine.dialect.name != "postgresql":
+        return {"skipped": f"query plans need PostgreSQL, not {engine.dialect.name}"}
+
+    def explain(session: Session, query) -> dict:
+        sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        return session.exec(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()[0]["Plan"]
+
+    def run() -> dict:
+        seq_scans, sorts, checked = [], [], 0
+        with Session(engine) as session:
+            session.exec(text("ANALYZE school"))
+            for filter_values, sort_by, descending in itertools.product(
+                LIST_FILTERS, SORTABLE_FIELDS, (False, True)
+            ):
+                filters = SchoolFilters(**{
+                    "state": None, "school_type": None, "locale": None,
+                    "min_tuition": None, "max_tuition": None, "near": None, "radius": None, "program": None,
+                    **filter_values,
+                })
+                filters.resolve(session)
+                sort_field = resolve_sort_field(sort_by)
+                query = filters.apply(select(School)).order_by(*order_clauses(sort_field, School.id, descending))
+                queries = [query.limit(PAGE_SIZE + 1)]
+                # A keyset page from the middle of the non-NULL range
+                middle = session.exec(query.offset(ctx.total // 2).limit(1)).first()
+                if middle is not None:
+                    value = getattr(middle, sort_by)
+                    for segment in keyset_segments(sort_field, School.id, descending, value, middle.id):
+                        queries.append(query.where(segment).limit(PAGE_SIZE + 1))
+                for query in queries:
+                    checked += 1
+                    nodes = list(_plan_nodes(explain(session, query)))
+                    label = f"{filter_values} {sort_by} {'desc' if descending else 'asc'}"
+                    if any(n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "school" for n in nodes):
+                        seq_scans.append(label)
+                    if any(n["Node Type"] == "Sort" for n in nodes):
+                        sorts.append(label)
+        return {
+            "plans_checked": checked,
+            "seq_scan_plans": len(seq_scans),
+            "full_sort_plans": len(sorts),
+            "seq_scan_examples": "; ".join(seq_scans[:5]),
+            "full_sort_examples": "; ".join(sorts[:5]),
+        }
+
+    return await asyncio.to_thread(run)
+
+
+SCENARIOS = {
+    "deep_pagination": deep_pagination,
+    "filter_sort": filter_sort,
+    "quiz_match": quiz_match,
+    "health_under_load": health_under_load,
+    "ingestion": ingestion,
+    "mapping": mapping,
+    "query_plans": query_plans,
+}
@@ -0,0 +1,169 @@
+"""
+In-process caches for read endpoints
+
+Entries are keyed by the dataset version, so a new ingestion run makes old entries
+unreachable and they age out through LRU eviction. Concurrent misses on the same
+response key are coalesced into one computation (concurrency.py).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+from concurrency import ConcurrencyLimiter, SingleFlight
+from database import DatabaseSession, open_session
+from serialization import dumps
+
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+COMPRESSED_CACHE_MAX_BYTES = int(os.getenv("COMPRESSED_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and, optionally, total size in bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None, sizeof: Callable[[Any], int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if it is missing"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries past the bounds"""
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Never cache a single value larger than the whole cache
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= self.sizeof(previous)
+            self._entries[key] = value
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.size_bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= self.sizeof(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Totals for /api/schools keyed by (dataset version, SchoolFilters.signature())
+count_cache = LRUCache(COUNT_CACHE_MAX_ENTRIES)
+
+# Encoded JSON bodies keyed by (endpoint, dataset version, normalized parameters)
+response_cache = LRUCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, sizeof=len)
+
+# Compressed response bodies keyed by (ETag, content coding); see compression.py
+compressed_cache = LRUCache(RESPONSE_CACHE_MAX_ENTRIES, COMPRESSED_CACHE_MAX_BYTES, sizeof=len)
+
+# Response builds in flight, shared by identical concurrent requests
+response_flights = SingleFlight()
+
+# Conditional requests answered with 304 before any work was done
+not_modified_count = 0
+
+
+def make_etag(key: Hashable) -> str:
+    """Strong ETag for a response fully determined by its cache key"""
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:32] + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def _build(build: Callable[[DatabaseSession], Awaitable[Any]]) -> Any:
+    # Coalesced requests all await this build, so it must not use the session of the request
+    # that started it: that one is closed when its request finishes or is cancelled
+    async with open_session() as session:
+        return await build(session)
+
+
+async def _build_body(key: Hashable, build: Callable[[DatabaseSession], Awaitable[Any]],
+                      limiter: Optional[ConcurrencyLimiter]) -> bytes:
+    if limiter is None:
+        content = await _build(build)
+    else:
+        async with limiter.slot():
+            content = await _build(build)
+    body = dumps(content)
+    response_cache.set(key, body)
+    return body
+
+
+async def cached_json_response(request: Request, key: Hashable, build: Callable[[DatabaseSession], Awaitable[Any]],
+                               limiter: Optional[ConcurrencyLimiter] = None) -> Response:
+    """
+    Serve a JSON response from the response cache, building and storing it on a miss
+    build(session) gets a database.DatabaseSession of its own, independent of the request's
+    session, since every coalesced request shares the build. The key must include the dataset version. Clients presenting a matching
+    If-None-Match get a 304 without a body, before anything is computed.
+    Identical misses in flight share one build; with a limiter, each build holds
+    one of its slots, and a saturated limiter answers all of them with 503.
+    """
+    global not_modified_count
+    etag = make_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        not_modified_count += 1
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(key)
+    if body is None:
+        body = await response_flights.do(key, lambda: _build_body(key, build, limiter))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for the count, response and compressed body caches, and coalesced response builds"""
+    return {
+        "responses": {
+            **response_cache.stats(),
+            "not_modified": not_modified_count,
+            "coalesced": response_flights.coalesced,
+            "in_flight": len(response_flights),
+        },
+        "compressed": compressed_cache.stats(),
+        "counts": count_cache.stats(),
+    }
@@ -0,0 +1,467 @@
+"""
+Memory-mapped columnar snapshot of the School table, for serving the API read-only
+
+After every ingestion run, ingest_data.py writes the School table (rows in id order)
+to a versioned directory under SNAPSHOT_DIR, one .npy file per array:
+- float columns as float64 (NULL -> NaN), integer columns as int64 plus a validity mask
+- state, school_type, locale and degree_type as int32 codes, their labels in manifest.json
+- other text as a string table: the UTF-8 bytes of every value plus int64 offsets
+- derived arrays: four_year, the program index postings, the row order of every
+  sortable field (as the database sorts it) and the similar-school lists
+A snapshot is written under a temporary name and renamed, then the CURRENT file is
+replaced to point at it, so a reader never sees a partial one.
+
+With SNAPSHOT_MODE=true the API maps the current snapshot (np.load(mmap_mode="r")) and
+serves every read from it, without a database connection. Nothing is copied into the
+process: the arrays are views of the OS page cache, shared by all worker processes,
+and text is decoded only for the rows a response returns. CURRENT is re-read at most
+every DATASET_VERSION_TTL seconds, so a new snapshot is picked up without a restart.
+
+Usage: python columnar.py  (write a snapshot of the current database)
+"""
+import bisect
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import DateTime, Float, Integer
+from sqlmodel import Session, select
+
+from dataset import DATASET_VERSION_TTL_SECONDS
+from models import SORTABLE_FIELDS, DatasetVersion, School, SchoolNeighbor
+from pagination import decode_cursor, order_clauses
+from programs import ProgramIndex, load_catalog
+from snapshot import SchoolSnapshot, factorize, four_year_mask
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+# Snapshots kept on disk; older ones are deleted after a new one is published
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2"))
+
+# Bumped whenever the file layout changes
+FORMAT_VERSION = 1
+
+# Every School column, id first
+COLUMNS = tuple(School.__table__.columns.keys())
+# Text columns with few distinct values, stored as codes
+CATEGORY_FIELDS = ("state", "school_type", "locale", "degree_type")
+
+
+def _kind(name: str) -> str:
+    if name in CATEGORY_FIELDS:
+        return "category"
+    column_type = School.__table__.columns[name].type
+    column_type = getattr(column_type, "impl", column_type)  # The type a TypeDecorator stores
+    for type_class, kind in ((Integer, "int"), (Float, "float"), (DateTime, "datetime")):
+        if isinstance(column_type, type_class):
+            return kind
+    return "text"
+
+
+def _save(directory: str, name: str, array: np.ndarray):
+    np.save(os.path.join(directory, f"{name}.npy"), array)
+
+
+def _save_strings(directory: str, name: str, values: list):
+    """String table: the UTF-8 bytes of every value back to back, and where each one starts"""
+    encoded = [value.encode() if value is not None else b"" for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _save(directory, f"{name}.offsets", offsets)
+    _save(directory, name, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+def _write_column(directory: str, name: str, values: list) -> dict:
+    """Write the files of one column; returns its manifest entry"""
+    kind = _kind(name)
+    entry = {"kind": kind}
+    if kind == "float":
+        _save(directory, name, np.array(values, dtype=np.float64))
+        return entry
+    if kind == "category":
+        codes, labels = factorize(values)
+        _save(directory, name, codes)
+        entry["labels"] = labels
+        return entry
+
+    valid = np.array([value is not None for value in values], dtype=bool)
+    entry["nullable"] = not valid.all()
+    if entry["nullable"]:
+        _save(directory, f"{name}.valid", valid)
+    if kind == "int":
+        _save(directory, name, np.array([0 if value is None else value for value in values], dtype=np.int64))
+    elif kind == "datetime":
+        _save_strings(directory, name, [value.isoformat() if value is not None else None for value in values])
+    else:
+        _save_strings(directory, name, values)
+    return entry
+
+
+def _positions(ids: np.ndarray, wanted) -> np.ndarray:
+    """Row positions of the wanted ids in the sorted ids array (-1 where missing)"""
+    wanted = np.asarray(wanted, dtype=np.int64)
+    if not len(ids):
+        return np.full(len(wanted), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(ids, wanted), len(ids) - 1)
+    return np.where(ids[positions] == wanted, positions, -1)
+
+
+def _write_derived(directory: str, session: Session, ids: np.ndarray, degree_types: list, programs_offered: list) -> dict:
+    """Write the arrays the API derives from the columns; returns their manifest entries"""
+    _save(directory, "four_year", four_year_mask(degree_types))
+
+    index = ProgramIndex.build(programs_offered, {})
+    program_codes = sorted(index.postings)
+    postings = [index.postings[code] for code in program_codes]
+    offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    np.cumsum([len(positions) for positions in postings], out=offsets[1:])
+    _save(directory, "programs.offsets", offsets)
+    _save(directory, "programs", np.concatenate(postings) if postings else np.empty(0, dtype=np.int32))
+
+    # Sort orders come from the database itself, so paging matches its collation exactly
+    # (bulk reads go through the connection, skipping the ORM result layer)
+    connection = session.connection()
+    for field in SORTABLE_FIELDS:
+        ordered = connection.execute(
+            select(School.id).order_by(*order_clauses(getattr(School, field), School.id, False))
+        ).scalars().all()
+        positions = _positions(ids, ordered)
+        if len(positions) != len(ids) or (positions < 0).any():
+            raise RuntimeError("The school table changed while the snapshot was written; write it again")
+        _save(directory, f"order.{field}", positions.astype(np.int32))
+
+    neighbors = connection.execute(
+        select(SchoolNeighbor.school_id, SchoolNeighbor.neighbor_id, SchoolNeighbor.distance)
+        .order_by(SchoolNeighbor.school_id, SchoolNeighbor.rank)
+    ).all()
+    school_ids, neighbor_ids, distances = (list(column) for column in zip(*neighbors)) if neighbors else ([], [], [])
+    school_positions = _positions(ids, school_ids)
+    neighbor_positions = _positions(ids, neighbor_ids)
+    known = (school_positions >= 0) & (neighbor_positions >= 0)
+    counts = np.bincount(school_positions[known], minlength=len(ids))
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    _save(directory, "neighbors.offsets", offsets)
+    _save(directory, "neighbors", neighbor_positions[known].astype(np.int32))
+    _save(directory, "neighbors.distances", np.array(distances, dtype=np.float64)[known])
+
+    return {
+        "catalog": load_catalog(session),
+        "program_codes": program_codes,
+        "orders": list(SORTABLE_FIELDS),
+    }
+
+
+def _sort_key(value, row_id: int) -> tuple:
+    """Position of a (sort value, id) pair in ascending database order: NULLs last, then id"""
+    return (1, 0, row_id) if value is None else (0, value, row_id)
+
+
+def _read_manifest(path: str) -> dict:
+    with open(os.path.join(path, "manifest.json")) as f:
+        return json.load(f)
+
+
+def current_snapshot_path(directory: str = SNAPSHOT_DIR) -> Optional[str]:
+    """Directory of the snapshot CURRENT points at, or None if none was written yet"""
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def _prune(directory: str, keep: int):
+    """Delete all but the newest keep snapshots (processes still mapping one keep reading it)"""
+    snapshots = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_dir() and entry.name.startswith("v")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in snapshots[max(keep, 1):]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def write_snapshot(session: Session, directory: str = SNAPSHOT_DIR, force: bool = False) -> Optional[str]:
+    """
+    Write a snapshot of the current dataset version and make it the current one
+    Returns its directory, or None when the current snapshot already holds this version
+    """
+    dataset = session.get(DatasetVersion, 1)
+    version = dataset.version if dataset else 0
+    dataset_updated_at = dataset.updated_at.isoformat() if dataset else None
+    current = current_snapshot_path(directory)
+    if not force and current and os.path.isdir(current):
+        manifest = _read_manifest(current)
+        if (manifest["version"], manifest["dataset_updated_at"]) == (version, dataset_updated_at):
+            return None
+
+    rows = session.connection().execute(
+        select(*(getattr(School, name) for name in COLUMNS)).order_by(School.id)
+    ).all()
+    columns = dict(zip(COLUMNS, (list(column) for column in zip(*rows)))) if rows else {name: [] for name in COLUMNS}
+    name = f"v{version}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}"
+    os.makedirs(directory, exist_ok=True)
+    staging = os.path.join(directory, f".{name}.tmp")
+    os.makedirs(staging)
+    try:
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "dataset_updated_at": dataset_updated_at,
+            "rows": len(rows),
+            "columns": {column: _write_column(staging, column, values) for column, values in columns.items()},
+            **_write_derived(
+                staging, session, np.array(columns["id"], dtype=np.int64),
+                columns["degree_type"], columns["programs_offered"]
+            ),
+        }
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+        os.rename(staging, os.path.join(directory, name))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(directory, f".CURRENT.{os.getpid()}.tmp")
+    with open(pointer, "w") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(directory, "CURRENT"))
+    _prune(directory, SNAPSHOT_KEEP)
+    return os.path.join(directory, name)
+
+
+class FloatColumn:
+    """float64 values, NaN for NULL"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def values(self, positions) -> list:
+        return [None if value != value else value for value in self.data[positions].tolist()]
+
+
+class IntColumn:
+    """int64 values and, when the column has NULLs, their validity mask"""
+
+    def __init__(self, data: np.ndarray, valid: Optional[np.ndarray]):
+        self.data = data
+        self.valid = valid
+
+    def values(self, positions) -> list:
+        values = self.data[positions].tolist()
+        if self.valid is None:
+            return values
+        return [value if known else None for value, known in zip(values, self.valid[positions].tolist())]
+
+
+class CategoryColumn:
+    """int32 codes into a list of labels"""
+
+    def __init__(self, codes: np.ndarray, labels: list):
+        self.codes = codes
+        self.labels = labels
+
+    def values(self, positions) -> list:
+        labels = self.labels
+        return [labels[code] for code in self.codes[positions].tolist()]
+
+
+class TextColumn:
+    """
+    String table, decoded one value at a time: behaves as a read-only sequence of
+    str (None for NULL), so it can stand in for a list of names or ZIP codes
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, valid: Optional[np.ndarray]):
+        self.data = data
+        self.offsets = offsets
+        self.valid = valid
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def _decode(self, raw: bytes):
+        return raw.decode()
+
+    def __getitem__(self, position):
+        if self.valid is not None and not self.valid[position]:
+            return None
+        return self._decode(self.data[self.offsets[position]:self.offsets[position + 1]].tobytes())
+
+    def __iter__(self):
+        blob = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        valid = self.valid.tolist() if self.valid is not None else [True] * len(self)
+        for start, stop, known in zip(offsets, offsets[1:], valid):
+            yield self._decode(blob[start:stop]) if known else None
+
+    def values(self, positions) -> list:
+        return [self[position] for position in np.asarray(positions).tolist()]
+
+
+class DatetimeColumn(TextColumn):
+    """ISO 8601 timestamps in a string table"""
+
+    def _decode(self, raw: bytes):
+        return datetime.fromisoformat(raw.decode())
+
+
+class MappedDataset:
+    """A snapshot directory mapped read-only: School rows, the SchoolSnapshot and the derived arrays"""
+
+    def __init__(self, path: str):
+        manifest = _read_manifest(path)
+        if manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Snapshot {path} has format {manifest['format']}, expected {FORMAT_VERSION}")
+        self.path = path
+        self.version = manifest["version"]
+        self.size = manifest["rows"]
+        self.columns = {name: self._column(name, entry) for name, entry in manifest["columns"].items()}
+        self.ids = self.columns["id"].data
+        self.orders = {field: self._map(f"order.{field}") for field in manifest["orders"]}
+        self.neighbor_offsets = self._map("neighbors.offsets")
+        self.neighbor_positions = self._map("neighbors")
+        self.neighbor_distances = self._map("neighbors.distances")
+
+        offsets, positions = self._map("programs.offsets"), self._map("programs")
+        postings = {
+            code: positions[offsets[index]:offsets[index + 1]]
+            for index, code in enumerate(manifest["program_codes"])
+        }
+        columns = self.columns
+        self.snapshot = SchoolSnapshot.from_columns(
+            ids=self.ids,
+            names=columns["name"],
+            school_type_codes=columns["school_type"].codes,
+            school_type_labels=columns["school_type"].labels,
+            four_year=self._map("four_year"),
+            state_codes=columns["state"].codes,
+            state_labels=columns["state"].labels,
+            locale_codes=columns["locale"].codes,
+            locale_labels=columns["locale"].labels,
+            tuition_in_state=columns["tuition_in_state"].data,
+            admission_rate=columns["admission_rate"].data,
+            completion_rate=columns["completion_rate"].data,
+            earnings_after_10yrs=columns["earnings_after_10yrs"].data,
+            programs=ProgramIndex(self.size, postings, manifest["catalog"]),
+            zips=columns["zip"],
+            latitude=columns["latitude"].data,
+            longitude=columns["longitude"].data,
+        )
+
+    def _map(self, name: str) -> np.ndarray:
+        # A plain ndarray view of the np.memmap, which is slower to operate on
+        return np.asarray(np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r"))
+
+    def _column(self, name: str, entry: dict):
+        kind = entry["kind"]
+        if kind == "float":
+            return FloatColumn(self._map(name))
+        if kind == "category":
+            return CategoryColumn(self._map(name), entry["labels"])
+        valid = self._map(f"{name}.valid") if entry["nullable"] else None
+        if kind == "int":
+            return IntColumn(self._map(name), valid)
+        column = DatetimeColumn if kind == "datetime" else TextColumn
+        return column(self._map(name), self._map(f"{name}.offsets"), valid)
+
+    def positions_of(self, ids) -> np.ndarray:
+        """Row positions of the given school ids, in their order; unknown ids are left out"""
+        positions = _positions(self.ids, list(ids))
+        return positions[positions >= 0]
+
+    def rows(self, positions, fields: tuple) -> list:
+        """Tuples of the given fields for the rows at positions, like the rows of a column select"""
+        positions = np.asarray(positions, dtype=np.intp)
+        return list(zip(*(self.columns[name].values(positions) for name in fields)))
+
+    def schools(self, positions) -> list:
+        """School objects for the rows at positions"""
+        return [School(**dict(zip(COLUMNS, row))) for row in self.rows(positions, COLUMNS)]
+
+    def _start_after(self, sort_by: str, descending: bool, value, row_id: int) -> int:
+        """Index in the (sort_by, descending) order of the first row after a cursor's (value, id)"""
+        order = self.orders[sort_by]
+        found = self.positions_of([row_id])
+        if len(found):
+            index = int(np.flatnonzero(order == found[0])[0])
+            return len(order) - index if descending else index + 1
+        # The cursor's row is gone: binary search its key (text compares by code point here)
+        column = self.columns[sort_by]
+        below = bisect.bisect_left(
+            range(len(order)), _sort_key(value, row_id),
+            key=lambda index: _sort_key(column.values([order[index]])[0], int(self.ids[order[index]])),
+        )
+        return len(order) - below if descending else below
+
+    def page_rows(
+        self, filters, sort_by: str, descending: bool, page: int, page_size: int,
+        cursor: Optional[str], include_total: bool, fields: tuple
+    ) -> tuple:
+        """
+        (total, rows) of one /api/schools page: the given fields of up to page_size + 1
+        filtered rows in (sort value, id) order, from the page or after the cursor
+        filters must be resolved
+        """
+        mask = filters.mask(self.snapshot)
+        order = self.orders[sort_by]
+        # A reversed view: the database's descending order is exactly the ascending one backwards
+        if descending:
+            order = order[::-1]
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_by, descending)
+            order = order[self._start_after(sort_by, descending, value, last_id):]
+            start = 0
+        else:
+            start = (page - 1) * page_size
+        matching = order[mask[order]]
+        total = int(np.count_nonzero(mask)) if include_total else None
+        return total, self.rows(matching[start:start + page_size + 1], fields)
+
+    def ordered_positions(self, filters, sort_by: str, descending: bool) -> np.ndarray:
+        """Positions of every filtered row in (sort value, id) order; filters must be resolved"""
+        order = self.orders[sort_by]
+        if descending:
+            order = order[::-1]
+        return order[filters.mask(self.snapshot)[order]]
+
+    def similar(self, school_id: int, limit: int) -> Optional[list]:
+        """(neighbor id, distance) pairs of a school, most similar first; None if it does not exist"""
+        found = self.positions_of([school_id])
+        if not len(found):
+            return None
+        start = int(self.neighbor_offsets[found[0]])
+        stop = min(int(self.neighbor_offsets[found[0] + 1]), start + limit)
+        neighbor_ids = self.ids[self.neighbor_positions[start:stop]].tolist()
+        return list(zip(neighbor_ids, self.neighbor_distances[start:stop].tolist()))
+
+
+_dataset: Optional[MappedDataset] = None
+_checked_at = 0.0
+
+
+def get_mapped_dataset() -> MappedDataset:
+    """The current snapshot, mapped; CURRENT is re-read at most every DATASET_VERSION_TTL seconds"""
+    global _dataset, _checked_at
+    now = time.monotonic()
+    if _dataset is None or now - _checked_at > DATASET_VERSION_TTL_SECONDS:
+        path = current_snapshot_path()
+        if path is None and _dataset is None:
+            raise RuntimeError(f"No snapshot in {SNAPSHOT_DIR}; run ingest_data.py or python columnar.py first")
+        if path is not None and (_dataset is None or _dataset.path != path):
+            _dataset = MappedDataset(path)
+        _checked_at = now
+    return _dataset
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    started = time.monotonic()
+    with Session(engine) as session:
+        path = write_snapshot(session, force=True)
+    print(f"Wrote snapshot {path} in {time.monotonic() - started:.1f}s")
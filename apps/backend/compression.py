@@ -0,0 +1,186 @@
+"""
+Negotiated response compression
+
+CompressionMiddleware compresses response bodies with brotli or gzip, whichever
+the client's Accept-Encoding prefers (brotli on a tie, when the brotli package is
+installed). Bodies smaller than COMPRESS_MIN_BYTES are sent as they are, since the
+framing overhead outweighs the savings, and responses that already carry a
+Content-Encoding (the gzipped export) pass through untouched. Streamed bodies are
+compressed chunk by chunk, flushed so clients keep receiving bytes.
+
+Cached responses are fully determined by their ETag, so their compressed bodies are
+kept in an LRU cache keyed by (ETag, encoding) and a cache hit is not compressed again.
+The ETag of a compressed body is sent in its weak form (W/"..."), which
+If-None-Match accepts like the strong one.
+"""
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from cache import compressed_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Supported encodings, in order of preference when the client rates them equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> dict:
+    """Quality value per content coding of an Accept-Encoding header (a malformed q counts as 0)"""
+    qualities = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def negotiate_encoding(accept_encoding: Optional[str], encodings: tuple = ENCODINGS) -> Optional[str]:
+    """The supported encoding the client rates highest, or None for an uncompressed body"""
+    qualities = accepted_encodings(accept_encoding)
+    best, best_quality = None, 0.0
+    for coding in encodings:
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """Compress a whole body"""
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return zlib.compress(body, GZIP_LEVEL, wbits=31)
+
+
+class _StreamCompressor:
+    """Incremental compressor whose output can be sent after every chunk"""
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.coding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies in the encoding negotiated per request"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        await self.app(scope, receive, _CompressingSend(send, coding, self.minimum_size))
+
+
+class _CompressingSend:
+    """The send callable of one response: holds back its start until the first body chunk"""
+
+    def __init__(self, send, coding: Optional[str], minimum_size: int):
+        self.send = send
+        self.coding = coding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.passthrough:
+            await self.send(message)
+            return
+        if self.compressor is not None:
+            await self._send_compressed_chunk(message)
+            return
+
+        start = self.start
+        start["headers"] = list(start.get("headers", []))
+        headers = MutableHeaders(raw=start["headers"])
+        body = message.get("body", b"")
+        streaming = message.get("more_body", False)
+        if (
+            "content-encoding" in headers
+            or start["status"] < 200 or start["status"] in (204, 304)
+            or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            or (not streaming and len(body) < self.minimum_size)
+        ):
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+        if self.coding is None:
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers["Content-Encoding"] = self.coding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if streaming:
+            del headers["Content-Length"]
+            self.compressor = _StreamCompressor(self.coding)
+            await self.send(start)
+            await self._send_compressed_chunk(message)
+            return
+
+        compressed = compressed_cache.get((etag, self.coding)) if etag else None
+        if compressed is None:
+            compressed = compress(body, self.coding)
+            if etag:
+                compressed_cache.set((etag, self.coding), compressed)
+        headers["Content-Length"] = str(len(compressed))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": compressed})
+
+    async def _send_compressed_chunk(self, message):
+        data = self.compressor.chunk(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        if not more_body:
+            data += self.compressor.finish()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
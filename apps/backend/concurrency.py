@@ -0,0 +1,148 @@
+"""
+Request coalescing and load shedding for expensive endpoints
+
+SingleFlight runs one computation per key at a time: identical requests arriving
+while it is in flight await the same result instead of repeating the work.
+ConcurrencyLimiter bounds the computations an endpoint runs at once. Requests
+beyond the limit wait in a bounded FIFO queue; when the queue is full, or a request
+has waited QUEUE_TIMEOUT seconds, it is shed with 503 and a Retry-After header
+rather than adding to latency that would otherwise grow without bound.
+
+Both are per process and assume a single event loop, like the API server runs.
+"""
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from typing import Any, Awaitable, Callable, Hashable
+
+from fastapi import HTTPException
+
+# Defaults for every endpoint limiter
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "10"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers with the same key"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn(), or the call of fn already running for key"""
+        task = self._calls.get(key)
+        if task is None:
+            # A task of its own, so a caller that goes away does not cancel the others
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, in case every caller went away
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class ConcurrencyLimiter:
+    """At most max_concurrency holders of a slot at once, and at most max_queue waiting for one"""
+
+    def __init__(self, name: str, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT, retry_after: int = RETRY_AFTER_SECONDS):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self._waiters = deque()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the block, or raise 503 when saturated"""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise self._busy()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # Handed a slot just as we gave up: pass it on
+            else:
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise self._busy() from None
+            raise
+
+    def _release(self):
+        # The slot passes straight to the longest waiter, so active only drops when nobody waits
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.admitted += 1
+                return
+        self.active -= 1
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"Too many concurrent {self.name} requests, retry shortly",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+
+_limiters = {}
+
+
+def get_limiter(name: str) -> ConcurrencyLimiter:
+    """The limiter of an endpoint, created with the default bounds on first use"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = ConcurrencyLimiter(name)
+    return limiter
+
+
+def limiter_stats() -> dict:
+    """Queue depth and shed counters per endpoint limiter"""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
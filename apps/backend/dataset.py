@@ -0,0 +1,51 @@
+"""
+Dataset version tracking
+
+The school data only changes when ingest_data.py commits. Each commit bumps a
+version number, and every in-process cache (snapshot, totals, responses) is keyed
+by it, so caches are invalidated without a TTL on the data itself.
+
+In snapshot mode (SNAPSHOT_MODE=true) the API never reads the database: the version
+is the one of the snapshot file it serves (columnar.py).
+"""
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlmodel import Session
+
+from models import DatasetVersion
+
+# Seconds an API process trusts its last read of the dataset version
+DATASET_VERSION_TTL_SECONDS = float(os.getenv("DATASET_VERSION_TTL", "30"))
+
+# Serve the API read-only from the memory-mapped snapshot files (columnar.py)
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "false").lower() == "true"
+
+_version = None
+_checked_at = 0.0
+
+
+def get_dataset_version(session: Session) -> int:
+    """Current dataset version, re-read from the database at most every DATASET_VERSION_TTL seconds"""
+    global _version, _checked_at
+    if SNAPSHOT_MODE:
+        from columnar import get_mapped_dataset
+        return get_mapped_dataset().version
+    now = time.monotonic()
+    if _version is None or now - _checked_at > DATASET_VERSION_TTL_SECONDS:
+        row = session.get(DatasetVersion, 1)
+        _version = row.version if row else 0
+        _checked_at = now
+    return _version
+
+
+def bump_dataset_version(session: Session) -> int:
+    """Increment the dataset version inside the caller's transaction (the caller commits)"""
+    row = session.get(DatasetVersion, 1)
+    if row is None:
+        row = DatasetVersion(id=1, version=0)
+    row.version += 1
+    row.updated_at = datetime.now(timezone.utc)
+    session.add(row)
+    return row.version
@@ -0,0 +1,92 @@
+"""
+Streaming CSV / NDJSON export of the filtered school list
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE and
+encoded batch by batch, so an export of the whole dataset runs in constant memory
+and the header line goes out before the query has returned anything. When the
+client accepts gzip, each encoded batch is compressed on the fly. In snapshot mode
+the batches are read from the mapped snapshot file in the same order.
+"""
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlmodel import select
+
+from columnar import get_mapped_dataset
+from compression import negotiate_encoding
+from database import open_session
+from dataset import SNAPSHOT_MODE
+from models import School
+from pagination import order_clauses
+from serialization import dumps
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Every School column, id first
+EXPORT_FIELDS = tuple(School.__table__.columns.keys())
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip (an explicit q=0 refuses it)"""
+    return negotiate_encoding(accept_encoding, ("gzip",)) == "gzip"
+
+
+def _encode_csv(fields: tuple, rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(fields: tuple, rows) -> bytes:
+    # serialization.dumps, so values are written exactly as /api/schools writes them
+    return b"".join(dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+def _csv_header(fields: tuple) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(fields)
+    return buffer.getvalue().encode()
+
+
+async def export_lines(filters, sort_field, descending: bool, fields: tuple, fmt: str) -> AsyncIterator[bytes]:
+    """
+    Encoded export body, one UTF-8 chunk per batch of rows; filters must be resolved
+    Uses a session of its own, since the response body outlives the request's dependencies
+    """
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+    if fmt == "csv":
+        yield _csv_header(fields)
+    if SNAPSHOT_MODE:
+        dataset = get_mapped_dataset()
+        positions = dataset.ordered_positions(filters, sort_field.key, descending)
+        for start in range(0, len(positions), EXPORT_BATCH_SIZE):
+            yield encode(fields, dataset.rows(positions[start:start + EXPORT_BATCH_SIZE], fields))
+        return
+    query = filters.apply(select(*(getattr(School, name) for name in fields)))
+    query = query.order_by(*order_clauses(sort_field, School.id, descending))
+    async with open_session() as session:
+        async for rows in session.stream(query, EXPORT_BATCH_SIZE):
+            yield encode(fields, rows)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Gzip a stream of chunks as they arrive (one compressed block per chunk)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        # Flush per chunk so the client keeps receiving bytes during long exports
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield data
+    yield compressor.flush()
@@ -0,0 +1,83 @@
+"""
+Facet counts for the School Explorer filters
+
+Counts come from one pass over the school snapshot: each active filter is evaluated
+once as a boolean row mask, and every facet counts the rows passing all the other
+filters (a facet ignores its own filter, so the dropdown shows what picking another
+option would give). Label facets count with one bincount over the factorized codes,
+numeric facets with one searchsorted over fixed bucket edges.
+"""
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from snapshot import SchoolSnapshot, get_school_snapshot_async
+
+# Lower bucket edges; each bucket runs up to the next edge, the last one is open-ended
+TUITION_BUCKET_EDGES = (0, 5_000, 10_000, 20_000, 30_000, 40_000, 50_000)
+ADMISSION_RATE_BUCKET_EDGES = (0.0, 0.1, 0.25, 0.5, 0.75)
+
+
+def _combine(masks: dict, size: int, exclude: str = None) -> np.ndarray:
+    """AND of all filter masks except the one for the excluded facet"""
+    combined = np.ones(size, dtype=bool)
+    for name, mask in masks.items():
+        if name != exclude:
+            combined &= mask
+    return combined
+
+
+def label_counts(codes: np.ndarray, labels: list, mask: np.ndarray) -> list:
+    """[{"value", "count"}] per non-empty label of the masked rows, most frequent first"""
+    counts = np.bincount(codes[mask], minlength=len(labels))
+    return sorted(
+        ({"value": label, "count": int(count)} for label, count in zip(labels, counts) if label and count),
+        key=lambda item: (-item["count"], item["value"]),
+    )
+
+
+def bucket_counts(values: np.ndarray, edges: tuple, mask: np.ndarray) -> list:
+    """[{"min", "max", "count"}] per bucket of the masked, known values (max exclusive, None = no bound)"""
+    selected = values[mask]
+    selected = selected[~np.isnan(selected)]
+    buckets = np.searchsorted(edges, selected, side="right") - 1
+    # Values below the first edge (negative tuition) count in the first bucket
+    counts = np.bincount(np.maximum(buckets, 0), minlength=len(edges))
+    bounds = list(edges[1:]) + [None]
+    return [
+        {"min": low, "max": high, "count": int(count)}
+        for low, high, count in zip(edges, bounds, counts)
+    ]
+
+
+def compute_facets(snapshot: SchoolSnapshot, filters) -> dict:
+    """Total and per-facet counts for the filters; filters must be resolved"""
+    size = len(snapshot)
+    masks = filters.masks(snapshot)
+    return {
+        "total": int(_combine(masks, size).sum()),
+        "facets": {
+            "state": label_counts(
+                snapshot.state_codes, snapshot.state_labels, _combine(masks, size, "state")
+            ),
+            "school_type": label_counts(
+                snapshot.school_type_codes, snapshot.school_type_labels, _combine(masks, size, "school_type")
+            ),
+            "locale": label_counts(
+                snapshot.locale_codes, snapshot.locale_labels, _combine(masks, size, "locale")
+            ),
+            "tuition_in_state": bucket_counts(
+                snapshot.tuition_in_state, TUITION_BUCKET_EDGES, _combine(masks, size, "tuition_in_state")
+            ),
+            # No admission-rate filter exists, so these buckets follow every filter
+            "admission_rate": bucket_counts(
+                snapshot.admission_rate, ADMISSION_RATE_BUCKET_EDGES, _combine(masks, size)
+            ),
+        },
+    }
+
+
+async def compute_facets_async(db, filters) -> dict:
+    """compute_facets for the API routes, given a database.DatabaseSession; counts in the threadpool"""
+    await filters.resolve_async(db)
+    snapshot = await get_school_snapshot_async(db)
+    return await run_in_threadpool(compute_facets, snapshot, filters)
@@ -0,0 +1,198 @@
+"""
+Shared filter and sort builders for the school list endpoints
+"""
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException, Query
+from sqlalchemy import false
+from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
+
+import geo
+from models import LIST_FIELDS, School, SchoolProgram, SORTABLE_FIELDS
+from snapshot import get_school_snapshot, get_school_snapshot_async
+
+# Default and maximum radius (miles) of near= queries
+DEFAULT_RADIUS_MILES = 25.0
+MAX_RADIUS_MILES = 500.0
+
+
+def resolve_sort_field(sort_by: str):
+    """Map sort_by to its column, rejecting anything outside the indexed allow-list"""
+    if sort_by not in SORTABLE_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sort by '{sort_by}'. Allowed values: {', '.join(SORTABLE_FIELDS)}"
+        )
+    return getattr(School, sort_by)
+
+
+def resolve_fields(fields: Optional[str]) -> tuple:
+    """
+    Parse a comma-separated fields= value into School column names (id always first)
+    Defaults to the compact LIST_FIELDS projection; rejects unknown columns.
+    """
+    if not fields:
+        return LIST_FIELDS
+    columns = School.__table__.columns.keys()
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed values: {', '.join(columns)}"
+        )
+    return tuple(dict.fromkeys(["id", *requested]))
+
+
+class SchoolFilters:
+    """
+    Filter query parameters for /api/schools, usable as a FastAPI dependency
+    Builds the WHERE conditions once and a normalized signature for cache keys
+    near= and program= need resolve(session) before conditions() or mask()
+    """
+
+    def __init__(
+        self,
+        state: Optional[str] = Query(None, description="Filter by state (e.g., 'CA', 'NY')"),
+        school_type: Optional[str] = Query(None, description="Filter by school type (Public, Private)"),
+        locale: Optional[str] = Query(None, description="Filter by locale (City, Suburban, Rural, Town)"),
+        min_tuition: Optional[float] = Query(None, description="Minimum tuition (in-state)"),
+        max_tuition: Optional[float] = Query(None, description="Maximum tuition (in-state)"),
+        near: Optional[str] = Query(None, description="Only schools near this ZIP code (e.g., '94305')"),
+        radius: Optional[float] = Query(
+            DEFAULT_RADIUS_MILES, gt=0, le=MAX_RADIUS_MILES, description="Radius in miles around near="
+        ),
+        program: Optional[str] = Query(
+            None, max_length=100,
+            description="Only schools offering a matching program (e.g., 'nursing', 'Computer Science', '11.07')"
+        ),
+    ):
+        self.state = state.upper() if state else None
+        self.school_type = school_type or None
+        self.locale = locale or None
+        self.min_tuition = min_tuition
+        self.max_tuition = max_tuition
+        self.near = None
+        if near:
+            self.near = geo.normalize_zip(near)
+            if self.near is None:
+                raise HTTPException(status_code=400, detail="near must be a 5-digit ZIP code")
+        self.radius = radius or DEFAULT_RADIUS_MILES
+        self.origin = None
+        self.program = " ".join(program.split()) if program and program.strip() else None
+        self.program_codes = None
+        self.resolved = False
+
+    def resolve(self, session) -> None:
+        """
+        Resolve near= to coordinates and program= to CIP codes
+        Unknown ZIP codes are rejected; a program matching no code matches no school.
+        """
+        if self.resolved:
+            return
+        self._resolve_against(get_school_snapshot(session) if self.near or self.program else None)
+
+    async def resolve_async(self, db) -> None:
+        """
+        resolve() for the API routes, given a database.DatabaseSession
+        The lookups (and building the geo index) run in the threadpool.
+        """
+        if self.resolved:
+            return
+        if not (self.near or self.program):
+            self.resolved = True
+            return
+        snapshot = await get_school_snapshot_async(db)
+        await run_in_threadpool(self._resolve_against, snapshot)
+
+    def _resolve_against(self, snapshot) -> None:
+        if self.near:
+            self.origin = geo.get_geo_index(snapshot).locate(self.near)
+            if self.origin is None:
+                raise HTTPException(status_code=400, detail=f"Unknown ZIP code '{self.near}'")
+        if self.program:
+            self.program_codes = snapshot.programs.match(self.program).codes
+        self.resolved = True
+
+    def _check_resolved(self):
+        if (self.near or self.program) and not self.resolved:
+            raise RuntimeError("SchoolFilters.resolve() must run before filtering on near= or program=")
+
+    def conditions(self) -> list:
+        """WHERE conditions for the active filters"""
+        conditions = []
+        if self.state:
+            conditions.append(School.state == self.state)
+        if self.school_type:
+            conditions.append(School.school_type == self.school_type)
+        if self.locale:
+            conditions.append(School.locale == self.locale)
+        if self.min_tuition is not None:
+            conditions.append(School.tuition_in_state >= self.min_tuition)
+        if self.max_tuition is not None:
+            conditions.append(School.tuition_in_state <= self.max_tuition)
+        self._check_resolved()
+        if self.origin:
+            conditions.append(geo.within_radius_condition(self.origin, self.radius))
+        if self.program:
+            if self.program_codes:
+                conditions.append(School.id.in_(
+                    select(SchoolProgram.school_id).where(SchoolProgram.cip_code.in_(self.program_codes))
+                ))
+            else:
+                conditions.append(false())
+        return conditions
+
+    def masks(self, snapshot) -> dict:
+        """
+        One boolean row mask per active filter over a SchoolSnapshot, keyed by the facet it
+        constrains (state, school_type, locale, tuition_in_state, near, program)
+        """
+        masks = {}
+        if self.state:
+            masks["state"] = snapshot.state_mask(lambda label: label == self.state)
+        if self.school_type:
+            masks["school_type"] = snapshot.school_type_mask(lambda label: label == self.school_type)
+        if self.locale:
+            masks["locale"] = snapshot.locale_mask(lambda label: label == self.locale)
+        # NaN (unknown tuition) fails both comparisons, as NULL does in SQL
+        if self.min_tuition is not None or self.max_tuition is not None:
+            tuition = np.ones(len(snapshot), dtype=bool)
+            if self.min_tuition is not None:
+                tuition &= snapshot.tuition_in_state >= self.min_tuition
+            if self.max_tuition is not None:
+                tuition &= snapshot.tuition_in_state <= self.max_tuition
+            masks["tuition_in_state"] = tuition
+        self._check_resolved()
+        if self.origin:
+            masks["near"] = geo.get_geo_index(snapshot).mask(self.origin, self.radius)
+        if self.program:
+            masks["program"] = snapshot.programs.match(self.program).mask()
+        return masks
+
+    def mask(self, snapshot) -> np.ndarray:
+        """The same filters evaluated over a SchoolSnapshot, as a boolean row mask"""
+        mask = np.ones(len(snapshot), dtype=bool)
+        for filter_mask in self.masks(snapshot).values():
+            mask &= filter_mask
+        return mask
+
+    def apply(self, query):
+        """Add the filter conditions to a select()"""
+        conditions = self.conditions()
+        return query.where(*conditions) if conditions else query
+
+    def signature(self) -> tuple:
+        """Hashable, normalized representation of the active filters"""
+        return (
+            ("state", self.state),
+            ("school_type", self.school_type),
+            ("locale", self.locale),
+            ("min_tuition", self.min_tuition),
+            ("max_tuition", self.max_tuition),
+            ("near", self.near),
+            ("radius", self.radius if self.near else None),
+            ("program", self.program.lower() if self.program else None),
+        )
@@ -0,0 +1,169 @@
+"""
+Distance queries over school coordinates: ZIP code lookup and radius search
+
+Distances use an equirectangular projection centered on the origin: one cosine per
+query, then plain arithmetic per school, so the same formula runs in Python, NumPy
+and SQL (SQLite has no trigonometry). Within a few hundred miles it stays within
+about 1% of the great-circle distance. Bounding boxes do not wrap around the
+antimeridian.
+
+ZIP codes are located from the schools themselves: the mean coordinates of the
+schools sharing the 5-digit ZIP, falling back to the 3-digit prefix.
+"""
+import math
+import re
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import and_
+
+from models import School
+from snapshot import SchoolSnapshot, get_school_snapshot
+
+MILES_PER_DEGREE = 69.09
+# Grid cell size of the in-process index; ~35 miles of latitude
+GRID_CELL_DEGREES = 0.5
+# Keeps the longitude span of a bounding box finite near the poles
+MIN_COS_LATITUDE = 0.01
+
+ZIP_PATTERN = re.compile(r"^(\d{5})(?:-?\d{4})?$")
+
+
+def normalize_zip(zip_code: Optional[str]) -> Optional[str]:
+    """The 5-digit ZIP of "12345" or "12345-6789", or None if it is not a US ZIP code"""
+    match = ZIP_PATTERN.match((zip_code or "").strip())
+    return match.group(1) if match else None
+
+
+def _cos_latitude(latitude: float) -> float:
+    return max(math.cos(math.radians(latitude)), MIN_COS_LATITUDE)
+
+
+def distance_miles(origin: tuple, latitude, longitude):
+    """Distance from origin (latitude, longitude) in miles; works on floats and arrays"""
+    origin_lat, origin_lon = origin
+    dy = (latitude - origin_lat) * MILES_PER_DEGREE
+    dx = (longitude - origin_lon) * (MILES_PER_DEGREE * _cos_latitude(origin_lat))
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def bounding_box(origin: tuple, radius: float) -> tuple:
+    """(min latitude, max latitude, min longitude, max longitude) enclosing the radius"""
+    origin_lat, origin_lon = origin
+    dlat = radius / MILES_PER_DEGREE
+    dlon = radius / (MILES_PER_DEGREE * _cos_latitude(origin_lat))
+    return origin_lat - dlat, origin_lat + dlat, origin_lon - dlon, origin_lon + dlon
+
+
+def within_radius_condition(origin: tuple, radius: float):
+    """
+    SQL condition for schools within radius miles of origin
+    The bounding box lets the database use ix_school_latitude_longitude; the distance
+    test then only runs on the rows inside it.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(origin, radius)
+    dy = (School.latitude - origin[0]) * MILES_PER_DEGREE
+    dx = (School.longitude - origin[1]) * (MILES_PER_DEGREE * _cos_latitude(origin[0]))
+    return and_(
+        School.latitude.between(min_lat, max_lat),
+        School.longitude.between(min_lon, max_lon),
+        dx * dx + dy * dy <= radius * radius,
+    )
+
+
+class GeoIndex:
+    """
+    Uniform latitude/longitude grid over the snapshot rows that have coordinates,
+    plus the ZIP code centroids. A radius query reads only the grid cells overlapping
+    its bounding box: one contiguous slice of the sorted cell keys per row of cells.
+    """
+
+    def __init__(self, snapshot: SchoolSnapshot, cell_degrees: float = GRID_CELL_DEGREES):
+        self.size = len(snapshot)
+        self.latitude = snapshot.latitude
+        self.longitude = snapshot.longitude
+        self.cell_degrees = cell_degrees
+        self.columns = int(math.ceil(360 / cell_degrees)) + 1
+
+        known = np.flatnonzero(~np.isnan(self.latitude) & ~np.isnan(self.longitude))
+        keys = self._cell_keys(self.latitude[known], self.longitude[known])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.positions = known[order]
+
+        self.zip_centroids = self._centroids(snapshot.zips, known, 5)
+        self.zip3_centroids = self._centroids(snapshot.zips, known, 3)
+
+    def _cells(self, values, offset: float) -> np.ndarray:
+        return np.floor((np.asarray(values) + offset) / self.cell_degrees).astype(np.int64)
+
+    def _cell_keys(self, latitude, longitude) -> np.ndarray:
+        return self._cells(latitude, 90) * self.columns + self._cells(longitude, 180)
+
+    def _centroids(self, zips: list, known: np.ndarray, digits: int) -> dict:
+        """Mean coordinates of the schools per ZIP prefix of the given length"""
+        prefixes = [zips[position][:digits] if zips[position] else "" for position in known]
+        codes, labels = {}, []
+        for prefix in prefixes:
+            if prefix not in codes:
+                codes[prefix] = len(labels)
+                labels.append(prefix)
+        groups = np.array([codes[prefix] for prefix in prefixes], dtype=np.int64)
+        counts = np.bincount(groups, minlength=len(labels))
+        latitude = np.bincount(groups, self.latitude[known], minlength=len(labels)) / np.maximum(counts, 1)
+        longitude = np.bincount(groups, self.longitude[known], minlength=len(labels)) / np.maximum(counts, 1)
+        return {
+            label: (float(latitude[code]), float(longitude[code]))
+            for label, code in codes.items()
+            if len(label) == digits and label.isdigit()
+        }
+
+    def locate(self, zip_code: str) -> Optional[tuple]:
+        """(latitude, longitude) of a ZIP code, or None when no school is near it"""
+        zip5 = normalize_zip(zip_code)
+        if zip5 is None:
+            return None
+        return self.zip_centroids.get(zip5) or self.zip3_centroids.get(zip5[:3])
+
+    def candidates(self, origin: tuple, radius: float) -> np.ndarray:
+        """Row positions in the grid cells overlapping the bounding box (unordered)"""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(origin, radius)
+        first_lon, last_lon = self._cells([min_lon, max_lon], 180)
+        rows = np.arange(self._cells(min_lat, 90), self._cells(max_lat, 90) + 1) * self.columns
+        starts = np.searchsorted(self.keys, rows + first_lon, side="left")
+        stops = np.searchsorted(self.keys, rows + last_lon, side="right")
+        slices = [self.positions[start:stop] for start, stop in zip(starts, stops)]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def within(self, origin: tuple, radius: float) -> tuple:
+        """(row positions, distances in miles) of the rows within radius of origin"""
+        positions = self.candidates(origin, radius)
+        distances = distance_miles(origin, self.latitude[positions], self.longitude[positions])
+        inside = distances <= radius
+        return positions[inside], distances[inside]
+
+    def mask(self, origin: tuple, radius: float) -> np.ndarray:
+        """Boolean mask over the snapshot rows within radius of origin"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.within(origin, radius)[0]] = True
+        return mask
+
+
+_index: Optional[GeoIndex] = None
+_index_snapshot: Optional[SchoolSnapshot] = None
+
+
+def get_geo_index(snapshot: SchoolSnapshot) -> GeoIndex:
+    """Return the index for this snapshot, rebuilding it when the snapshot is replaced"""
+    global _index, _index_snapshot
+    if _index is None or _index_snapshot is not snapshot:
+        _index = GeoIndex(snapshot)
+        _index_snapshot = snapshot
+    return _index
+
+
+def locate_zip(session, zip_code: Optional[str]) -> Optional[tuple]:
+    """(latitude, longitude) of a ZIP code from the current dataset, or None"""
+    if not normalize_zip(zip_code):
+        return None
+    return get_geo_index(get_school_snapshot(session)).locate(zip_code)
@@ -3,142 +3,66 @@ Data ingestion script for College Scorecard API
 Fetches school data and inserts into PostgreSQL database
 """
 import os
+import math
+import time
+import uuid
 import httpx
 import asyncio
+import argparse
+from datetime import datetime, timezone
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlmodel import Session, select
+from columnar import write_snapshot
 from database import engine, init_db
-from models import School
+from dataset import bump_dataset_version
+from models import IngestRun, School, SchoolNeighbor
+from neighbors import rebuild_neighbors
+from programs import write_school_programs
+from scorecard import map_page, map_page_programs
 from dotenv import load_dotenv
 
 load_dotenv()
 
 COLLEGE_SCORECARD_API_KEY = os.getenv("COLLEGE_SCORECARD_API_KEY")
-COLLEGE_SCORECARD_BASE_URL = "https://api.data.gov/ed/collegescorecard/v1/schools"
-
-
-def safe_float(value):
-    """Safely convert value to float, returning None if conversion fails"""
-    if value is None:
-        return None
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return None
-
-
-def safe_int(value):
-    """Safely convert value to int, returning None if conversion fails"""
-    if value is None:
-        return None
-    try:
-        return int(value)
-    except (ValueError, TypeError):
-        return None
-
-
-def get_nested_value(data: dict, *keys):
-    """Helper to get nested dictionary values, trying both flat and nested structures"""
-    # Try flat key first (e.g., "school.name")
-    flat_key = ".".join(keys)
-    if flat_key in data:
-        return data[flat_key]
-    
-    # Try nested structure (e.g., data["school"]["name"])
-    current = data
-    for key in keys:
-        if isinstance(current, dict) and key in current:
-            current = current[key]
-        else:
-            return None
-    return current
+COLLEGE_SCORECARD_BASE_URL = os.getenv(
+    "COLLEGE_SCORECARD_BASE_URL",
+    "https://api.data.gov/ed/collegescorecard/v1/schools"
+)
 
+# Pipeline tuning
+INGEST_PER_PAGE = int(os.getenv("INGEST_PER_PAGE", "100"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))  # Page fetches in flight
+INGEST_RATE_LIMIT = float(os.getenv("INGEST_RATE_LIMIT", "2"))  # Requests per second
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))  # Fetched pages waiting for the writer
 
-def map_college_scorecard_to_school(api_data: dict) -> School:
-    """
-    Map College Scorecard API response to School model
-    Handles both flat keys (like "school.name") and nested structures
-    """
-    # Extract basic information
-    name = get_nested_value(api_data, "school", "name") or get_nested_value(api_data, "school.name") or "Unknown"
-    city = get_nested_value(api_data, "school", "city") or get_nested_value(api_data, "school.city")
-    state = get_nested_value(api_data, "school", "state") or get_nested_value(api_data, "school.state")
-    zip_code = get_nested_value(api_data, "school", "zip") or get_nested_value(api_data, "school.zip")
-    if zip_code is not None:
-        zip_code = str(zip_code)
-    website = get_nested_value(api_data, "school", "school_url") or get_nested_value(api_data, "school.school_url")
-    
-    # School characteristics
-    school_type = get_nested_value(api_data, "school", "ownership") or get_nested_value(api_data, "school.ownership")
-    degree_type = get_nested_value(api_data, "school", "degrees_awarded", "predominant") or get_nested_value(api_data, "school.degrees_awarded.predominant")
-    if degree_type is not None:
-        degree_type = str(degree_type)
-    
-    locale_code = get_nested_value(api_data, "school", "locale") or get_nested_value(api_data, "school.locale")
-    locale = None
-    if locale_code is not None:
-        locale_map = {11: "City", 12: "City", 13: "City", 21: "Suburban", 22: "Suburban", 23: "Suburban", 31: "Rural", 32: "Rural", 33: "Rural", 41: "Town", 42: "Town", 43: "Town"}
-        locale = locale_map.get(locale_code)
-    
-    # Admissions (convert to appropriate types)
-    admission_rate = safe_float(get_nested_value(api_data, "latest", "admissions", "admission_rate", "overall") or get_nested_value(api_data, "latest.admissions.admission_rate.overall"))
-    sat_avg = safe_int(get_nested_value(api_data, "latest", "admissions", "sat_scores", "average", "overall") or get_nested_value(api_data, "latest.admissions.sat_scores.average.overall"))
-    act_avg = safe_int(get_nested_value(api_data, "latest", "admissions", "act_scores", "midpoint", "cumulative") or get_nested_value(api_data, "latest.admissions.act_scores.midpoint.cumulative"))
-    
-    # Cost (convert to float)
-    tuition_in_state = safe_float(get_nested_value(api_data, "latest", "cost", "tuition", "in_state") or get_nested_value(api_data, "latest.cost.tuition.in_state"))
-    tuition_out_of_state = safe_float(get_nested_value(api_data, "latest", "cost", "tuition", "out_of_state") or get_nested_value(api_data, "latest.cost.tuition.out_of_state"))
-    
-    # Student body (convert to int)
-    student_size = safe_int(get_nested_value(api_data, "latest", "student", "size") or get_nested_value(api_data, "latest.student.size"))
-    undergrad_size = safe_int(get_nested_value(api_data, "latest", "student", "enrollment", "undergrad_12_month") or get_nested_value(api_data, "latest.student.enrollment.undergrad_12_month"))
-    
-    # Outcomes (convert to float)
-    completion_rate = safe_float(get_nested_value(api_data, "latest", "completion", "completion_rate_4yr_150nt") or get_nested_value(api_data, "latest.completion.completion_rate_4yr_150nt"))
-    # Try different possible field names for earnings
-    earnings_after_10yrs = safe_float(
-        get_nested_value(api_data, "latest", "earnings", "10_yrs_after_entry", "median") or
-        get_nested_value(api_data, "latest.earnings.10_yrs_after_entry.median") or
-        get_nested_value(api_data, "latest", "earnings", "_10_yrs_after_entry", "median")
-    )
-    
-    # Programs (simplified - could be expanded)
-    programs_offered = None
+
+class TokenBucket:
+    """Async token-bucket rate limiter: `rate` requests per second with bursts up to `capacity`"""
     
-    # Metadata
-    unit_id = api_data.get("id") or get_nested_value(api_data, "id")
-    if unit_id is not None:
-        unit_id = str(unit_id)
-    ope_id = get_nested_value(api_data, "school", "ope6_id") or get_nested_value(api_data, "school.ope6_id")
-    if ope_id is not None:
-        ope_id = str(ope_id)
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
     
-    return School(
-        name=name,
-        city=city,
-        state=state,
-        zip=zip_code,
-        website=website,
-        school_type=school_type,
-        degree_type=degree_type,
-        locale=locale,
-        admission_rate=admission_rate,
-        sat_avg=sat_avg,
-        act_avg=act_avg,
-        tuition_in_state=tuition_in_state,
-        tuition_out_of_state=tuition_out_of_state,
-        student_size=student_size,
-        undergrad_size=undergrad_size,
-        completion_rate=completion_rate,
-        earnings_after_10yrs=earnings_after_10yrs,
-        programs_offered=programs_offered,
-        unit_id=unit_id,
-        ope_id=ope_id
-    )
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
 
 
-async def fetch_schools_from_api(api_key: str, page: int = 0, per_page: int = 100, max_retries: int = 3):
+async def fetch_schools_from_api(client: httpx.AsyncClient, api_key: str, page: int = 0, per_page: int = 100, max_retries: int = 3):
     """
     Fetch schools from College Scorecard API with retry logic
+    Uses the caller's pooled client so connections are reused across pages
     """
     # Field list - using verified field names from College Scorecard API
     # Some fields may cause 500 errors, so we try without fields first if needed
@@ -148,6 +72,8 @@ async def fetch_schools_from_api(api_key: str, page: int = 0, per_page: int = 10
         "school.city",
         "school.state",
         "school.zip",
+        "location.lat",
+        "location.lon",
         "school.school_url",
         "school.ownership",
         "school.degrees_awarded.predominant",
@@ -160,78 +86,261 @@ async def fetch_schools_from_api(api_key: str, page: int = 0, per_page: int = 10
         "latest.student.size",
         "latest.student.enrollment.undergrad_12_month",
         "latest.completion.completion_rate_4yr_150nt",
+        "latest.programs.cip_4_digit",
         "school.ope6_id"
         # "latest.earnings.10_yrs_after_entry.median" - commented out, may cause API errors
     ]
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        for attempt in range(max_retries):
-            try:
-                # Try with fields first
-                params = {
+    for attempt in range(max_retries):
+        try:
+            # Try with fields first
+            params = {
+                "api_key": api_key,
+                "page": page,
+                "per_page": per_page,
+                "fields": ",".join(fields)
+            }
+            
+            response = await client.get(COLLEGE_SCORECARD_BASE_URL, params=params)
+            
+            if response.status_code == 200:
+                return response.json()
+            
+            # If 500 error and not last attempt, try without fields parameter
+            if response.status_code == 500 and attempt < max_retries - 1:
+                print(f"API returned 500 error, retrying without fields parameter (attempt {attempt + 1}/{max_retries})...")
+                params_no_fields = {
                     "api_key": api_key,
                     "page": page,
-                    "per_page": per_page,
-                    "fields": ",".join(fields)
+                    "per_page": per_page
                 }
-                
-                response = await client.get(COLLEGE_SCORECARD_BASE_URL, params=params)
+                response = await client.get(COLLEGE_SCORECARD_BASE_URL, params=params_no_fields)
                 
                 if response.status_code == 200:
+                    print("Successfully fetched data without fields parameter")
                     return response.json()
+            
+            # Better error handling to see what the API is returning
+            error_text = response.text
+            print(f"API Error {response.status_code}: {error_text[:500]}")
+            try:
+                error_json = response.json()
+                print(f"Error details: {error_json}")
+            except:
+                pass
+            
+            # If it's a client error (4xx), don't retry
+            if 400 <= response.status_code < 500:
+                response.raise_for_status()
+            
+            # For server errors, wait before retrying
+            if attempt < max_retries - 1:
+                wait_time = 2 ** attempt  # Exponential backoff
+                print(f"Retrying in {wait_time} seconds...")
+                await asyncio.sleep(wait_time)
+            else:
+                response.raise_for_status()
                 
-                # If 500 error and not last attempt, try without fields parameter
-                if response.status_code == 500 and attempt < max_retries - 1:
-                    print(f"API returned 500 error, retrying without fields parameter (attempt {attempt + 1}/{max_retries})...")
-                    params_no_fields = {
-                        "api_key": api_key,
-                        "page": page,
-                        "per_page": per_page
-                    }
-                    response = await client.get(COLLEGE_SCORECARD_BASE_URL, params=params_no_fields)
-                    
-                    if response.status_code == 200:
-                        print("Successfully fetched data without fields parameter")
-                        return response.json()
-                
-                # Better error handling to see what the API is returning
-                error_text = response.text
-                print(f"API Error {response.status_code}: {error_text[:500]}")
-                try:
-                    error_json = response.json()
-                    print(f"Error details: {error_json}")
-                except:
-                    pass
-                
-                # If it's a client error (4xx), don't retry
-                if 400 <= response.status_code < 500:
-                    response.raise_for_status()
-                
-                # For server errors, wait before retrying
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    print(f"Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    response.raise_for_status()
-                    
-            except httpx.HTTPError as e:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    print(f"HTTP error occurred: {e}. Retrying in {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                else:
-                    raise
-        
-        raise Exception("Failed to fetch data after all retry attempts")
-
-
-async def ingest_schools():
+        except httpx.HTTPError as e:
+            if attempt < max_retries - 1:
+                wait_time = 2 ** attempt
+                print(f"HTTP error occurred: {e}. Retrying in {wait_time} seconds...")
+                await asyncio.sleep(wait_time)
+            else:
+                raise
+    
+    raise Exception("Failed to fetch data after all retry attempts")
+
+
+# Columns written by the upsert; any difference in these marks a school as updated
+UPSERT_COLUMNS = [
+    column.name for column in School.__table__.columns
+    if column.name not in ("id", "unit_id", "created_at", "updated_at")
+]
+
+
+def _upsert_statement(dialect: str):
+    """INSERT ... ON CONFLICT (unit_id) DO UPDATE that only touches rows whose values differ"""
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = School.__table__
+    statement = insert(table)
+    excluded = statement.excluded
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.unit_id],
+        set_={**{name: excluded[name] for name in UPSERT_COLUMNS}, "updated_at": excluded.updated_at},
+        where=or_(*(table.c[name].is_distinct_from(excluded[name]) for name in UPSERT_COLUMNS))
+    ).returning(table.c.unit_id)
+
+
+def upsert_schools(session: Session, rows: list, delta: bool = True) -> tuple:
+    """
+    Write a batch of school value dicts with one INSERT ... ON CONFLICT (unit_id) DO UPDATE
+    Existing rows are only rewritten (and updated_at bumped) when a value actually differs.
+    In delta mode, schools whose stored content_hash matches are not sent at all.
+    Returns (inserted/updated/unchanged counts, unit_ids written); the caller commits.
+    """
+    if not rows:
+        return {"inserted": 0, "updated": 0, "unchanged": 0}, set()
+    
+    unit_ids = [row["unit_id"] for row in rows]
+    hashes = dict(session.exec(
+        select(School.unit_id, School.content_hash).where(School.unit_id.in_(unit_ids))
+    ).all())
+    if delta:
+        rows = [row for row in rows if row["unit_id"] not in hashes or hashes[row["unit_id"]] != row["content_hash"]]
+    
+    written = set()
+    if rows:
+        now = datetime.now(timezone.utc)
+        statement = _upsert_statement(session.get_bind().dialect.name)
+        # executemany form: compiled once, sent as multi-row batches. Rows skipped by the WHERE clause are not returned
+        parameters = [{**row, "created_at": now, "updated_at": now} for row in rows]
+        written = set(session.execute(statement, parameters).scalars().all())
+    counts = {
+        "inserted": len(written - hashes.keys()),
+        "updated": len(written & hashes.keys()),
+        "unchanged": len(unit_ids) - len(written),
+    }
+    return counts, written
+
+
+def _format_pages(pages) -> str:
+    """Compact page ranges, e.g. {0, 1, 2, 5, 7, 8} -> 0-2,5,7-8"""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def _parse_pages(text: str) -> set:
+    """Inverse of _format_pages"""
+    pages = set()
+    for part in filter(None, (text or "").split(",")):
+        first, _, last = part.partition("-")
+        pages.update(range(int(first), int(last or first) + 1))
+    return pages
+
+
+def open_run(per_page: int, resume: bool) -> tuple:
+    """
+    The latest unfinished run with the same page size when resuming, otherwise a new run
+    Returns (run id, pages already written, schools changed so far)
+    """
+    with Session(engine) as session:
+        run = None
+        if resume:
+            run = session.exec(
+                select(IngestRun)
+                .where(IngestRun.finished_at.is_(None), IngestRun.per_page == per_page)
+                .order_by(IngestRun.started_at.desc())
+            ).first()
+        if run is None:
+            run = IngestRun(id=uuid.uuid4().hex, per_page=per_page)
+            session.add(run)
+            session.commit()
+        return run.id, _parse_pages(run.completed_pages), run.changed_schools
+
+
+def record_page(session: Session, run_id: str, page: int, changed: int):
+    """Mark a page written, inside the transaction that wrote it"""
+    run = session.get(IngestRun, run_id)
+    run.completed_pages = _format_pages(_parse_pages(run.completed_pages) | {page})
+    run.changed_schools += changed
+    run.updated_at = datetime.now(timezone.utc)
+    session.add(run)
+
+
+def finish_run(run_id: str, page_count, complete: bool):
+    """Store the page count and, once every page is written, close the run"""
+    with Session(engine) as session:
+        run = session.get(IngestRun, run_id)
+        run.page_count = page_count
+        run.updated_at = datetime.now(timezone.utc)
+        if complete:
+            run.finished_at = run.updated_at
+        session.add(run)
+        session.commit()
+
+
+def write_page(results: list, run_id: str = None, page: int = None, delta: bool = True) -> dict:
+    """
+    Map one page of API results and upsert it in a single batch
+    Runs in a worker thread so database writes overlap with page fetches. The page is
+    checkpointed in the same transaction. In delta mode, program links are only diffed
+    for the schools that were written (their codes are part of the content hash).
+    """
+    rows = {}
+    skipped = 0
+    for row in map_page(results):
+        if not row["unit_id"]:
+            print(f"Skipping school without unit_id: {row['name']}")
+            skipped += 1
+            continue
+        # The same unit_id twice in one statement is an error in PostgreSQL; keep the last
+        rows[row["unit_id"]] = row
+    
+    with Session(engine) as session:
+        counts, written = upsert_schools(session, list(rows.values()), delta)
+        programs = map_page_programs(results)
+        if delta:
+            programs = {unit_id: codes for unit_id, codes in programs.items() if unit_id in written}
+        counts["program_links"] = write_school_programs(session, programs)
+        if counts["inserted"] or counts["updated"] or counts["program_links"]:
+            bump_dataset_version(session)
+        if run_id is not None:
+            record_page(session, run_id, page, counts["inserted"] + counts["updated"])
+        session.commit()
+    counts["skipped"] = skipped
+    return counts
+
+
+def write_neighbors(force: bool):
+    """
+    Recompute the similar-school lists after a run that changed school data, or when
+    they were never computed; returns the rows written, or None if nothing was done
+    """
+    with Session(engine) as session:
+        if not force and session.exec(select(SchoolNeighbor.school_id).limit(1)).first() is not None:
+            return None
+        written = rebuild_neighbors(session)
+        bump_dataset_version(session)
+        session.commit()
+    return written
+
+
+def write_snapshot_files():
+    """Write the columnar snapshot served in snapshot mode, unless it already holds this dataset version"""
+    with Session(engine) as session:
+        return write_snapshot(session)
+
+
+async def ingest_schools(
+    api_key: str = None,
+    per_page: int = INGEST_PER_PAGE,
+    concurrency: int = INGEST_CONCURRENCY,
+    rate_limit: float = INGEST_RATE_LIMIT,
+    queue_size: int = INGEST_QUEUE_SIZE,
+    resume: bool = True,
+    delta: bool = True
+):
     """
     Main ingestion function
     Fetches schools from API and inserts into database
+    
+    Producer/consumer pipeline: up to `concurrency` page fetches run at once on one
+    pooled client, throttled by a token bucket, and hand their results to a single
+    writer through a bounded queue so network and database work overlap.
+    
+    Every written page is checkpointed in an ingest_run row. With resume, a run that
+    ended with failed pages (or was killed) continues where it stopped: pages it already
+    wrote are not fetched again, except page 0, which carries the page count. With delta,
+    schools whose content hash is unchanged cost no database write.
     """
-    if not COLLEGE_SCORECARD_API_KEY:
+    api_key = api_key or COLLEGE_SCORECARD_API_KEY
+    if not api_key:
         print("ERROR: COLLEGE_SCORECARD_API_KEY not set in environment variables")
         print("Please set it in .env file or as an environment variable")
         return
@@ -239,61 +348,143 @@ async def ingest_schools():
     print("Initializing database...")
     init_db()
     
-    print("Starting data ingestion...")
+    run_id, completed, changed_before = open_run(per_page, resume)
+    if completed:
+        print(f"Resuming run {run_id}: {len(completed)} pages already written")
+    else:
+        print(f"Starting data ingestion (run {run_id}, {'delta' if delta else 'full'} mode)...")
+    started_at = time.monotonic()
     
-    page = 0
-    per_page = 100
-    total_inserted = 0
+    bucket = TokenBucket(rate_limit, capacity=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=queue_size)
+    failed_pages = []
+    summary = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "program_links": 0}
     
-    with Session(engine) as session:
+    async def writer():
         while True:
+            item = await queue.get()
+            if item is None:
+                return
+            page, results = item
+            try:
+                counts = await asyncio.to_thread(write_page, results, run_id, page, delta)
+                for name, count in counts.items():
+                    summary[name] += count
+                print(
+                    f"Page {page}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged"
+                )
+            except Exception as e:
+                print(f"Error writing page {page}: {e}")
+                failed_pages.append(page)
+    
+    async def fetch_page(client: httpx.AsyncClient, page: int):
+        """Fetch one page and queue its results; returns them, or None on failure"""
+        if page in completed:
+            return True  # Written by an earlier attempt of this run, so not empty
+        async with semaphore:
+            await bucket.acquire()
             try:
                 print(f"Fetching page {page}...")
-                data = await fetch_schools_from_api(COLLEGE_SCORECARD_API_KEY, page, per_page)
-                
+                data = await fetch_schools_from_api(client, api_key, page, per_page)
                 results = data.get("results", [])
-                if not results:
-                    print("No more results from API")
-                    break
-                
-                for api_school in results:
-                    try:
-                        school = map_college_scorecard_to_school(api_school)
-                        
-                        # Check if school already exists by unit_id
-                        if school.unit_id:
-                            existing = session.exec(
-                                select(School).where(School.unit_id == school.unit_id)
-                            ).first()
-                            if existing:
-                                print(f"Skipping duplicate: {school.name}")
-                                continue
-                        
-                        session.add(school)
-                        total_inserted += 1
-                        
-                        if total_inserted % 50 == 0:
-                            session.commit()
-                            print(f"Inserted {total_inserted} schools...")
-                    
-                    except Exception as e:
-                        print(f"Error processing school: {e}")
-                        continue
-                
-                session.commit()
-                page += 1
-                
-                # Rate limiting - be respectful to the API
-                await asyncio.sleep(0.5)
-                
             except Exception as e:
                 print(f"Error fetching page {page}: {e}")
-                break
+                failed_pages.append(page)
+                return None
+            if results:
+                # Blocks while the writer is behind, holding the slot so fetching slows down too
+                await queue.put((page, results))
+            return results
+    
+    page_count = None
+    # Pages the run is waiting on, which an unexpected error leaves unwritten
+    in_flight = [0]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30.0, limits=limits) as client:
+        writer_task = asyncio.create_task(writer())
+        try:
+            # The first page tells us how many pages there are
+            await bucket.acquire()
+            print("Fetching page 0...")
+            first = await fetch_schools_from_api(client, api_key, 0, per_page)
+            results = first.get("results", [])
+            if results and 0 not in completed:
+                await queue.put((0, results))
+            total = (first.get("metadata") or {}).get("total")
+            
+            if not results:
+                print("No more results from API")
+                page_count = 0
+            elif total is not None:
+                page_count = math.ceil(total / per_page)
+                in_flight = list(range(1, page_count))
+                await asyncio.gather(*(fetch_page(client, page) for page in in_flight))
+            else:
+                # No metadata: fetch windows of pages until one comes back empty
+                page = 1
+                while True:
+                    in_flight = list(range(page, page + concurrency))
+                    pages = await asyncio.gather(*(fetch_page(client, p) for p in in_flight))
+                    # Stop at the first empty page; a failed page (None) does not end the run
+                    if any(results == [] for results in pages):
+                        page_count = page + next(i for i, results in enumerate(pages) if results == [])
+                        break
+                    if all(results is None for results in pages):
+                        print("Every page of the window failed; stopping (resume to continue)")
+                        break
+                    page += concurrency
+        except Exception as e:
+            if in_flight == [0]:
+                print(f"Error fetching the first page (page 0): {e}")
+            else:
+                print(f"Error in the batch of pages {in_flight[0]}-{in_flight[-1]}: {e}")
+            failed_pages.extend([p for p in in_flight if p not in completed and p not in failed_pages])
+        finally:
+            await queue.put(None)
+            await writer_task
     
-    print(f"Data ingestion complete! Inserted {total_inserted} schools.")
+    print(f"Pages fetched and written in {time.monotonic() - started_at:.3f}s")
+    complete = page_count is not None and not failed_pages
+    await asyncio.to_thread(finish_run, run_id, page_count, complete)
+    
+    # Changes written before a resume count too: that attempt may have died before this step
+    changed = summary["inserted"] or summary["updated"] or changed_before
+    neighbors_started_at = time.monotonic()
+    written = await asyncio.to_thread(write_neighbors, bool(changed))
+    if written is not None:
+        print(f"Computed {written} similar-school rows in {time.monotonic() - neighbors_started_at:.1f}s")
+    snapshot_started_at = time.monotonic()
+    snapshot_path = await asyncio.to_thread(write_snapshot_files)
+    if snapshot_path is not None:
+        print(f"Wrote snapshot {snapshot_path} in {time.monotonic() - snapshot_started_at:.1f}s")
+    
+    elapsed = time.monotonic() - started_at
+    print(f"Data ingestion complete in {elapsed:.1f}s!")
+    print(
+        f"Inserted {summary['inserted']}, updated {summary['updated']}, "
+        f"unchanged {summary['unchanged']}, skipped {summary['skipped']} schools; "
+        f"{summary['program_links']} program links changed."
+    )
+    if failed_pages:
+        print(f"Failed pages: {sorted(failed_pages)}")
+    if not complete:
+        print(f"Run {run_id} is incomplete; run ingest_data.py again to resume it")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest College Scorecard data into the database")
+    parser.add_argument("--restart", action="store_true",
+                        help="Start a new run instead of resuming the last unfinished one")
+    parser.add_argument("--full", action="store_true",
+                        help="Send every school to the database and compare all columns there "
+                             "(default: skip schools whose content hash is unchanged)")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
     # Run ingestion
-    asyncio.run(ingest_schools())
+    args = parse_args()
+    asyncio.run(ingest_schools(resume=not args.restart, delta=not args.full))
 
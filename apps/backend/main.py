@@ -1,14 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db, engine
+from fastapi.responses import PlainTextResponse
+from database import get_engine, init_db
 from models import School  # Import models to register them with SQLModel
 from sqlalchemy.exc import OperationalError
 from sqlalchemy import text
 import logging
+import os
+from cache import cache_stats
+from columnar import get_mapped_dataset
+from compression import CompressionMiddleware
+from concurrency import limiter_stats
+from dataset import SNAPSHOT_MODE
+from metrics import MetricsMiddleware, render_metrics
 from routers import router
 
 logger = logging.getLogger(__name__)
 
+# Test the connection and create/migrate the schema at startup. Off on Vercel (which sets
+# VERCEL=1): every cold instance would repeat those round trips before its first request,
+# so run `python migrations.py` once per deploy instead and let the engine connect lazily
+DB_INIT_ON_STARTUP = os.getenv(
+    "DB_INIT_ON_STARTUP", "false" if os.getenv("VERCEL") else "true"
+).lower() == "true"
+
 app = FastAPI(
     title="Internavi API",
     description="Backend API for Internavi Student Section",
@@ -18,9 +33,16 @@ app = FastAPI(
 # Initialize database on startup (gracefully handle connection errors)
 @app.on_event("startup")
 async def startup_event():
+    if SNAPSHOT_MODE:
+        # Read-only: never touch the database; map the snapshot now so a missing one fails fast
+        dataset = get_mapped_dataset()
+        logger.info(f"Serving snapshot {dataset.path} (dataset version {dataset.version}, {dataset.size} schools)")
+        return
+    if not DB_INIT_ON_STARTUP:
+        return
     try:
         # Test connection first
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             conn.execute(text("SELECT 1"))
         init_db()
         logger.info("Database initialized successfully")
@@ -40,6 +62,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli as negotiated per request; inside the metrics, so latency includes compressing
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency and SQL statement metrics (outermost, so CORS handling is included)
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/")
 async def root():
     return {"message": "Internavi API is running"}
@@ -48,6 +76,11 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format metrics"""
+    return render_metrics(cache_stats(), limiter_stats())
+
 # Include API routers
 app.include_router(router)
 
@@ -0,0 +1,256 @@
+"""
+Request-level performance instrumentation
+
+SQLAlchemy cursor events attribute every statement (count, DB time, rows) to the
+request being served, through a context variable that follows the request into the
+threadpool and into AsyncSession greenlets. MetricsMiddleware records one latency
+observation per route template and renders everything in the Prometheus text format.
+
+Statements slower than SLOW_QUERY_MS are logged as structured JSON. Full statement
+logging (the old echo=True) is replaced by SQL_LOG_SAMPLE_RATE: the fraction of
+requests whose statements are all logged, so one sampled request gives a full trace.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+slow_query_logger = logging.getLogger("internavi.slow_query")
+sql_logger = logging.getLogger("internavi.sql")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0"))
+MAX_LOGGED_STATEMENT = 2000  # Characters
+
+# Like echo=True, sampled statements go to stdout unless logging is configured elsewhere
+if SQL_LOG_SAMPLE_RATE > 0 and not sql_logger.handlers:
+    sql_logger.addHandler(logging.StreamHandler())
+    sql_logger.setLevel(logging.INFO)
+
+# Latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cache and limiter stats() fields that only ever increase
+CACHE_COUNTER_FIELDS = {"hits", "misses", "evictions", "not_modified", "coalesced"}
+LIMITER_COUNTER_FIELDS = {"admitted", "shed", "timed_out"}
+
+
+class RequestStats:
+    """SQL work done while serving one request"""
+
+    __slots__ = ("route", "statements", "db_seconds", "rows", "sampled")
+
+    def __init__(self, route: str = "", sampled: bool = False):
+        self.route = route
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.sampled = sampled
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class RouteMetrics:
+    """Cumulative counters and latency histogram for one (method, route) pair"""
+
+    __slots__ = ("requests", "errors", "latency_buckets", "latency_sum", "statements", "db_seconds", "rows")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+    def observe(self, seconds: float, status: int, stats: RequestStats):
+        self.requests += 1
+        if status >= 500:
+            self.errors += 1
+        self.latency_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+                break
+        self.statements += stats.statements
+        self.db_seconds += stats.db_seconds
+        self.rows += stats.rows
+
+
+_routes = {}
+_routes_lock = threading.Lock()
+slow_query_count = 0
+
+
+def _log_statement(target: logging.Logger, level: int, stats: Optional[RequestStats], statement: str,
+                   parameters, seconds: float, rows: int):
+    record = {
+        "route": stats.route if stats else None,
+        "duration_ms": round(seconds * 1000, 3),
+        "rows": rows,
+        "statement": " ".join(statement.split())[:MAX_LOGGED_STATEMENT],
+        "parameters": len(parameters) if isinstance(parameters, (list, tuple)) else None,
+    }
+    target.log(level, json.dumps(record))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global slow_query_count
+    seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+    # Drivers that buffer results (psycopg2, asyncpg) report the rows of a SELECT;
+    # SQLite reports -1 until the rows are fetched, so those are not counted
+    rows = max(cursor.rowcount, 0)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+        stats.rows += rows
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        slow_query_count += 1
+        _log_statement(slow_query_logger, logging.WARNING, stats, statement, parameters, seconds, rows)
+    elif (stats.sampled if stats is not None else random.random() < SQL_LOG_SAMPLE_RATE):
+        _log_statement(sql_logger, logging.INFO, stats, statement, parameters, seconds, rows)
+
+
+def instrument_engine(engine):
+    """Attach the statement listeners to an Engine (pass async_engine.sync_engine for async engines)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_label(scope) -> str:
+    """Route template (e.g. /api/schools) rather than the raw path, to bound label cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and SQL work, plus a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # The raw path labels log records until routing resolves the route template
+        sampled = SQL_LOG_SAMPLE_RATE > 0 and random.random() < SQL_LOG_SAMPLE_RATE
+        stats = RequestStats(route=scope["path"], sampled=sampled)
+        token = _current_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = f"db;dur={stats.db_seconds * 1000:.1f};desc=\"{stats.statements} queries\""
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_stats.reset(token)
+            stats.route = _route_label(scope)
+            key = (scope["method"], stats.route)
+            with _routes_lock:
+                metrics = _routes.get(key)
+                if metrics is None:
+                    metrics = _routes[key] = RouteMetrics()
+                metrics.observe(elapsed, status, stats)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _stats_lines(prefix: str, label: str, stats_by_name: dict, counter_fields: set) -> list:
+    """One metric per numeric stats() field, labelled by the owner's name"""
+    # One group per field, as the text format requires all samples of a metric together
+    fields = {}
+    for owner, stats in stats_by_name.items():
+        for field, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                fields.setdefault(field, []).append((owner, value))
+    lines = []
+    for field, samples in fields.items():
+        if field in counter_fields:
+            name, kind = f"{prefix}_{field}_total", "counter"
+        else:
+            name, kind = f"{prefix}_{field}", "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        for owner, value in samples:
+            lines.append(f"{name}{_labels(**{label: owner})} {value}")
+    return lines
+
+
+def render_metrics(extra_stats: Optional[dict] = None, limiter_stats: Optional[dict] = None) -> str:
+    """
+    Prometheus text exposition of the route metrics
+    extra_stats maps a cache name to its stats() dict, exported as internavi_cache_* series;
+    limiter_stats maps an endpoint to its limiter's stats(), as internavi_limiter_* series
+    """
+    with _routes_lock:
+        routes = [
+            (_labels(method=method, route=route), method, route, list(m.latency_buckets), m.latency_sum,
+             m.requests, m.errors, m.statements, m.db_seconds, m.rows)
+            for (method, route), m in sorted(_routes.items())
+        ]
+
+    lines = [
+        "# HELP internavi_http_request_duration_seconds Request latency by route",
+        "# TYPE internavi_http_request_duration_seconds histogram",
+    ]
+    for labels, method, route, buckets, latency_sum, requests, *_ in routes:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            bucket_labels = _labels(method=method, route=route, le=bound)
+            lines.append(f"internavi_http_request_duration_seconds_bucket{bucket_labels} {cumulative}")
+        bucket_labels = _labels(method=method, route=route, le="+Inf")
+        lines.append(f"internavi_http_request_duration_seconds_bucket{bucket_labels} {requests}")
+        lines.append(f"internavi_http_request_duration_seconds_sum{labels} {latency_sum:.6f}")
+        lines.append(f"internavi_http_request_duration_seconds_count{labels} {requests}")
+
+    counters = [
+        ("internavi_http_server_errors_total", "Requests answered with a 5xx status", 6),
+        ("internavi_db_statements_total", "SQL statements executed by route", 7),
+        ("internavi_db_seconds_total", "Time spent executing SQL by route", 8),
+        ("internavi_db_rows_total", "Rows reported by the driver by route", 9),
+    ]
+    for name, help_text, column in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for route in routes:
+            lines.append(f"{name}{route[0]} {route[column]}")
+
+    lines.append("# HELP internavi_db_slow_queries_total Statements slower than SLOW_QUERY_MS")
+    lines.append("# TYPE internavi_db_slow_queries_total counter")
+    lines.append(f"internavi_db_slow_queries_total {slow_query_count}")
+
+    lines += _stats_lines("internavi_cache", "cache", extra_stats or {}, CACHE_COUNTER_FIELDS)
+    lines += _stats_lines("internavi_limiter", "endpoint", limiter_stats or {}, LIMITER_COUNTER_FIELDS)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,152 @@
+"""
+Schema migrations for existing databases
+
+SQLModel.metadata.create_all only creates missing tables, so changes to tables that
+already exist (new indexes, new columns) are applied here, in order, exactly once.
+Applied migration ids are recorded in the schema_migration table. On an empty database
+the migrations create every table, so this is also the one-time schema step of a
+deploy: with DB_INIT_ON_STARTUP off (the default on Vercel) the API never does it.
+
+Usage: python migrations.py
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+from sqlmodel import Field, Session, SQLModel, select
+
+from database import get_engine
+from models import SORTABLE_FIELDS, DatasetVersion, IngestRun, Program, School, SchoolNeighbor, SchoolProgram
+from search import ACRONYM_FUNCTION_SQL, NORMALIZE_FUNCTION_SQL
+
+
+class SchemaMigration(SQLModel, table=True):
+    """Record of an applied migration"""
+    
+    __tablename__ = "schema_migration"
+    
+    id: str = Field(primary_key=True)
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+# Indexes created by 0001, frozen: later migrations create the indexes they add themselves,
+# after the columns those indexes cover exist
+SCHOOL_EXPLORER_INDEXES = (
+    *(f"ix_school_{field}_id" for field in SORTABLE_FIELDS),
+    "ix_school_state_name_id",
+    "ix_school_state_tuition_in_state_id",
+    "ix_school_locale_school_type",
+    "ix_school_school_type_name_id",
+    "ix_school_school_type_tuition_in_state_id",
+)
+
+
+def _create_school_indexes(connection, names: tuple):
+    """Create the named School indexes that the database does not have yet"""
+    existing = {index["name"] for index in inspect(connection).get_indexes(School.__tablename__)}
+    declared = {index.name: index for index in School.__table__.indexes}
+    for name in names:
+        if name not in existing:
+            print(f"Creating index {name}...")
+            declared[name].create(connection)
+
+
+def _create_school_explorer_indexes(connection):
+    """Create the sort and filter indexes used by the School Explorer"""
+    _create_school_indexes(connection, SCHOOL_EXPLORER_INDEXES)
+
+
+def _create_dataset_version(connection):
+    """Create the single-row dataset_version table used to invalidate API caches"""
+    DatasetVersion.__table__.create(connection, checkfirst=True)
+
+
+def _create_name_search_indexes(connection):
+    """PostgreSQL only: pg_trgm index on the normalized name for fuzzy search and the acronym expression index"""
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    connection.execute(text(NORMALIZE_FUNCTION_SQL))
+    connection.execute(text(ACRONYM_FUNCTION_SQL))
+    print("Creating index ix_school_name_normalized_trgm...")
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_school_name_normalized_trgm "
+        "ON school USING gin (school_name_normalized(name) gin_trgm_ops)"
+    ))
+    print("Creating index ix_school_name_acronym...")
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_school_name_acronym ON school (school_name_acronym(name))"
+    ))
+
+
+def _add_school_columns(connection, names: tuple):
+    """Add School columns the table does not have yet (as nullable columns)"""
+    existing = {column["name"] for column in inspect(connection).get_columns(School.__tablename__)}
+    for name in names:
+        if name not in existing:
+            column = School.__table__.c[name]
+            column_type = column.type.compile(dialect=connection.dialect)
+            print(f"Adding column school.{name}...")
+            connection.execute(text(f"ALTER TABLE school ADD COLUMN {name} {column_type}"))
+
+
+def _add_school_coordinates(connection):
+    """Add the latitude/longitude columns and their bounding-box index"""
+    _add_school_columns(connection, ("latitude", "longitude"))
+    _create_school_indexes(connection, ("ix_school_latitude_longitude",))
+
+
+def _create_program_tables(connection):
+    """Create the program catalog and the school_program link table"""
+    Program.__table__.create(connection, checkfirst=True)
+    SchoolProgram.__table__.create(connection, checkfirst=True)
+
+
+def _create_neighbor_table(connection):
+    """Create the school_neighbor table of precomputed similar schools"""
+    SchoolNeighbor.__table__.create(connection, checkfirst=True)
+
+
+def _add_ingest_checkpoints(connection):
+    """Add school.content_hash and the ingest_run checkpoint table"""
+    _add_school_columns(connection, ("content_hash",))
+    IngestRun.__table__.create(connection, checkfirst=True)
+
+
+# Ordered list of (migration id, function taking a Connection)
+MIGRATIONS = [
+    ("0001_school_explorer_indexes", _create_school_explorer_indexes),
+    ("0002_dataset_version", _create_dataset_version),
+    ("0003_name_search", _create_name_search_indexes),
+    ("0004_school_coordinates", _add_school_coordinates),
+    ("0005_school_programs", _create_program_tables),
+    ("0006_school_neighbors", _create_neighbor_table),
+    ("0007_ingest_checkpoints", _add_ingest_checkpoints),
+]
+
+
+def run_migrations(bind=None) -> list:
+    """Apply pending migrations, each in its own transaction. Returns the applied ids."""
+    bind = bind or get_engine()
+    SQLModel.metadata.create_all(bind, tables=[SchemaMigration.__table__, School.__table__])
+    
+    with Session(bind) as session:
+        applied = set(session.exec(select(SchemaMigration.id)).all())
+    
+    newly_applied = []
+    for migration_id, migrate in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        with bind.begin() as connection:
+            migrate(connection)
+            connection.execute(SchemaMigration.__table__.insert().values(
+                id=migration_id, applied_at=datetime.now(timezone.utc)
+            ))
+        print(f"Applied migration {migration_id}")
+        newly_applied.append(migration_id)
+    return newly_applied
+
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    if not applied:
+        print("Database schema is up to date")
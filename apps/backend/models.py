@@ -1,11 +1,57 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, text
 from typing import Optional
 from datetime import datetime, timezone
 
 
+# Columns /api/schools may sort on; each one has a (column, id) index for keyset pagination
+SORTABLE_FIELDS = (
+    "name",
+    "tuition_in_state",
+    "admission_rate",
+    "student_size",
+    "completion_rate",
+    "earnings_after_10yrs",
+)
+
+# Columns /api/schools returns by default: what the Explorer's school cards show
+LIST_FIELDS = (
+    "id",
+    "name",
+    "city",
+    "state",
+    "website",
+    "school_type",
+    "locale",
+    "admission_rate",
+    "tuition_in_state",
+    "student_size",
+    "completion_rate",
+)
+
+
 class School(SQLModel, table=True):
     """School model representing institutions from College Scorecard API"""
     
+    __table_args__ = (
+        # Sort paths: (sort column, id) matches ORDER BY column, id in both directions
+        *(Index(f"ix_school_{field}_id", field, "id") for field in SORTABLE_FIELDS),
+        # Filter + sort paths used by the School Explorer
+        Index("ix_school_state_name_id", "state", "name", "id"),
+        Index("ix_school_state_tuition_in_state_id", "state", "tuition_in_state", "id"),
+        Index("ix_school_locale_school_type", "locale", "school_type"),
+        Index("ix_school_school_type_name_id", "school_type", "name", "id"),
+        # Bounding-box range scans for near=/radius= queries
+        Index("ix_school_latitude_longitude", "latitude", "longitude"),
+        # Tuition range filters never match unknown tuition, so skip those rows
+        Index(
+            "ix_school_school_type_tuition_in_state_id",
+            "school_type", "tuition_in_state", "id",
+            postgresql_where=text("tuition_in_state IS NOT NULL"),
+            sqlite_where=text("tuition_in_state IS NOT NULL"),
+        ),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     
     # Basic Information
@@ -13,6 +59,8 @@ class School(SQLModel, table=True):
     city: Optional[str] = None
     state: Optional[str] = Field(default=None, index=True)
     zip: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     website: Optional[str] = None
     
     # School Type and Characteristics
@@ -37,14 +85,70 @@ class School(SQLModel, table=True):
     completion_rate: Optional[float] = None
     earnings_after_10yrs: Optional[float] = None
     
-    # Programs and Fields of Study (stored as JSON string or comma-separated)
+    # Programs and Fields of Study: comma-separated 4-digit CIP codes, also stored as SchoolProgram rows
     programs_offered: Optional[str] = None
     
     # API Metadata
     unit_id: Optional[str] = Field(default=None, unique=True, index=True)  # College Scorecard unit_id
     ope_id: Optional[str] = None  # OPE ID for federal student aid
+    content_hash: Optional[str] = None  # Digest of the mapped API values (scorecard.content_hash)
     
     # Timestamps
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+
+class Program(SQLModel, table=True):
+    """Field of study from the CIP taxonomy, e.g. 11.07 Computer Science"""
+    
+    cip_code: str = Field(primary_key=True)  # 4-digit CIP code, "11.07"
+    title: str
+
+
+class SchoolProgram(SQLModel, table=True):
+    """A program offered by a school"""
+    
+    __tablename__ = "school_program"
+    __table_args__ = (
+        # program= filters look up schools by code
+        Index("ix_school_program_cip_code_school_id", "cip_code", "school_id"),
+    )
+    
+    school_id: int = Field(foreign_key="school.id", primary_key=True)
+    cip_code: str = Field(foreign_key="program.cip_code", primary_key=True)
+
+
+class SchoolNeighbor(SQLModel, table=True):
+    """One of a school's most similar schools, precomputed after each ingestion run (neighbors.py)"""
+    
+    __tablename__ = "school_neighbor"
+    
+    school_id: int = Field(foreign_key="school.id", primary_key=True)
+    rank: int = Field(primary_key=True)  # 1 = most similar
+    neighbor_id: int = Field(foreign_key="school.id")
+    distance: float
+
+
+class IngestRun(SQLModel, table=True):
+    """Progress of one ingest_data.py run, committed with every page so a failed run can resume"""
+    
+    __tablename__ = "ingest_run"
+    
+    id: str = Field(primary_key=True)
+    per_page: int
+    page_count: Optional[int] = None
+    completed_pages: str = ""  # Page ranges written so far, e.g. "0-41,43,45-50"
+    changed_schools: int = 0  # Schools inserted or updated by the run
+    started_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None  # Set once every page has been written
+
+
+class DatasetVersion(SQLModel, table=True):
+    """Version of the school dataset, bumped by every ingestion commit"""
+    
+    __tablename__ = "dataset_version"
+    
+    id: int = Field(default=1, primary_key=True)  # Single row
+    version: int = 0
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,223 @@
+"""
+Precomputed "similar schools"
+
+Each school is described by a feature vector: standardized tuition, admission rate,
+SAT, ACT, log size, completion rate and earnings (a missing value becomes the mean
+plus a missing-indicator feature), and one-hot locale and school type. After every
+ingestion run the NEIGHBOR_COUNT nearest schools of each school by Euclidean distance
+are computed exactly with blocked, vectorized distance matrices and stored in
+school_neighbor. /api/schools/{id}/similar then reads one school's precomputed list by
+primary key and never computes a distance (in snapshot mode, from the lists copied
+into the snapshot file by columnar.py).
+
+Usage: python neighbors.py  (rebuild the table, e.g. after seeding a database by hand)
+"""
+import os
+import time
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select
+
+from columnar import get_mapped_dataset
+from dataset import SNAPSHOT_MODE
+from models import School, SchoolNeighbor
+
+# Similar schools stored per school (the most /similar can return)
+NEIGHBOR_COUNT = int(os.getenv("NEIGHBOR_COUNT", "20"))
+# Rows per distance block: the block is NEIGHBOR_BLOCK_SIZE x candidates float32 values
+NEIGHBOR_BLOCK_SIZE = int(os.getenv("NEIGHBOR_BLOCK_SIZE", "256"))
+# float32 rounding allowance (squared distance) when skipping groups
+DISTANCE_SLACK = 1e-3
+# school_neighbor rows per INSERT batch
+WRITE_BATCH_SIZE = 10_000
+
+# (column, compare on a log scale)
+NUMERIC_FEATURES = (
+    ("tuition_in_state", False),
+    ("admission_rate", False),
+    ("sat_avg", False),
+    ("act_avg", False),
+    ("student_size", True),
+    ("completion_rate", False),
+    ("earnings_after_10yrs", False),
+)
+CATEGORICAL_FEATURES = ("locale", "school_type")
+
+
+def _numeric_columns(values) -> list:
+    """Standardized values (missing -> 0, the mean) and the missing indicator"""
+    values = np.array(values, dtype=np.float64)
+    missing = np.isnan(values)
+    known = values[~missing]
+    if not len(known):
+        return [np.zeros(len(values)), missing.astype(np.float64)]
+    std = known.std() or 1.0
+    standardized = np.where(missing, 0.0, (values - known.mean()) / std)
+    return [standardized, missing.astype(np.float64)]
+
+
+def _one_hot_columns(values) -> list:
+    """One column per distinct non-empty label; missing labels are all zeros"""
+    labels = sorted({value for value in values if value})
+    return [np.array([value == label for value in values], dtype=np.float64) for label in labels]
+
+
+def feature_matrix(rows: list) -> tuple:
+    """
+    float32 feature vectors for rows of (id, *NUMERIC_FEATURES, *CATEGORICAL_FEATURES),
+    and the mask of their discrete (0/1) columns
+    """
+    columns = list(zip(*rows))
+    features, discrete = [], []
+    for index, (_, log_scale) in enumerate(NUMERIC_FEATURES, start=1):
+        values = np.array(columns[index], dtype=np.float64)
+        if log_scale:
+            values = np.log1p(np.maximum(values, 0))
+        standardized, missing = _numeric_columns(values)
+        features += [standardized, missing]
+        discrete += [False, True]
+    for index in range(len(NUMERIC_FEATURES) + 1, len(columns)):
+        one_hot = _one_hot_columns(columns[index])
+        features += one_hot
+        discrete += [True] * len(one_hot)
+    return np.column_stack(features).astype(np.float32), np.array(discrete, dtype=bool)
+
+
+def _top_k(features, squared_norms, queries: np.ndarray, candidates: np.ndarray, k: int) -> tuple:
+    """(positions, squared distances) of the k nearest candidates of each query, itself excluded"""
+    block = (
+        squared_norms[queries, None] + squared_norms[None, candidates]
+        - 2 * (features[queries] @ features[candidates].T)
+    )
+    block[queries[:, None] == candidates[None, :]] = np.inf  # A school is not its own neighbor
+    nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+    nearest_distances = np.take_along_axis(block, nearest, axis=1)
+    positions = candidates[nearest]
+    order = np.lexsort((positions, nearest_distances), axis=1)
+    return np.take_along_axis(positions, order, axis=1), np.take_along_axis(nearest_distances, order, axis=1)
+
+
+def _merge(positions, distances, more, more_distances, k: int) -> tuple:
+    """The k nearest of two sorted neighbor lists per row"""
+    positions = np.concatenate([positions, more], axis=1)
+    distances = np.concatenate([distances, more_distances], axis=1)
+    order = np.lexsort((positions, distances), axis=1)[:, :k]
+    return np.take_along_axis(positions, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+
+def nearest_neighbors(features: np.ndarray, discrete: np.ndarray, k: int, block_size: int = NEIGHBOR_BLOCK_SIZE) -> tuple:
+    """
+    (positions, distances) of the k nearest other rows of every row, nearest first
+    discrete marks the 0/1 columns (indicators, one-hot). Rows sharing their values form
+    a group, and the distance between two groups' discrete values is a lower bound for
+    any pair of their rows. Each block of rows is compared with its own group first, then
+    ring by ring with farther groups, only for the rows whose k-th neighbor the ring can
+    still beat. The result is exact. Equal distances are ordered by position.
+    """
+    n = len(features)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int32), np.empty((n, 0), dtype=np.float32)
+    squared_norms = np.einsum("ij,ij->i", features, features)
+    signatures, labels = np.unique(features[:, discrete], axis=0, return_inverse=True)
+    labels = labels.ravel()
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(len(signatures) + 1))
+    members = [order[bounds[group]:bounds[group + 1]] for group in range(len(signatures))]
+    sizes = np.diff(bounds)
+
+    positions = np.empty((n, k), dtype=np.int32)
+    distances = np.empty((n, k), dtype=np.float32)
+    for group, rows in enumerate(members):
+        # Squared distance every row of each group is at least from every row of this one
+        gaps = ((signatures - signatures[group]) ** 2).sum(axis=1)
+        by_gap = np.argsort(gaps, kind="stable")
+        # The closest groups holding at least k other rows
+        nearest_groups = by_gap[:np.searchsorted(np.cumsum(sizes[by_gap]), k + 1) + 1]
+        candidates = np.concatenate([members[other] for other in nearest_groups])
+        # The remaining groups in rings of equal distance, nearest ring first
+        farther = by_gap[len(nearest_groups):]
+        ring_gaps, ring_starts = np.unique(gaps[farther], return_index=True)
+        rings = np.split(farther, ring_starts[1:]) if len(farther) else []
+        for start in range(0, len(rows), block_size):
+            queries = rows[start:start + block_size]
+            found, found_distances = _top_k(features, squared_norms, queries, candidates, k)
+            for ring_gap, ring in zip(ring_gaps, rings):
+                # Only rows whose k-th neighbor is at least as far as the ring can gain from it
+                unsettled = np.flatnonzero(found_distances[:, -1] >= ring_gap - DISTANCE_SLACK)
+                if not len(unsettled):
+                    break
+                ring_rows = np.concatenate([members[other] for other in ring])
+                more, more_distances = _top_k(
+                    features, squared_norms, queries[unsettled], ring_rows, min(k, len(ring_rows))
+                )
+                found[unsettled], found_distances[unsettled] = _merge(
+                    found[unsettled], found_distances[unsettled], more, more_distances, k
+                )
+            positions[queries] = found
+            distances[queries] = found_distances
+    # Rounding can leave tiny negative squared distances
+    return positions, np.sqrt(np.maximum(distances, 0))
+
+
+def rebuild_neighbors(session: Session, k: int = NEIGHBOR_COUNT) -> int:
+    """Recompute school_neighbor for every school; returns the rows written (the caller commits)"""
+    rows = session.exec(
+        select(
+            School.id,
+            *(getattr(School, column) for column, _ in NUMERIC_FEATURES),
+            *(getattr(School, column) for column in CATEGORICAL_FEATURES),
+        ).order_by(School.id)
+    ).all()
+    session.exec(delete(SchoolNeighbor))
+    if not rows:
+        return 0
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    positions, distances = nearest_neighbors(*feature_matrix(rows), k)
+
+    count = positions.shape[1]
+    school_ids = np.repeat(ids, count).tolist()
+    ranks = np.tile(np.arange(1, count + 1), len(ids)).tolist()
+    neighbor_ids = ids[positions.ravel()].tolist()
+    neighbor_distances = np.round(distances.ravel().astype(np.float64), 4).tolist()
+    for start in range(0, len(school_ids), WRITE_BATCH_SIZE):
+        stop = start + WRITE_BATCH_SIZE
+        session.execute(insert(SchoolNeighbor), [
+            {"school_id": school_id, "rank": rank, "neighbor_id": neighbor_id, "distance": distance}
+            for school_id, rank, neighbor_id, distance in zip(
+                school_ids[start:stop], ranks[start:stop], neighbor_ids[start:stop], neighbor_distances[start:stop]
+            )
+        ])
+    return len(school_ids)
+
+
+def similar_schools(session: Session, school_id: int, limit: int) -> Optional[list]:
+    """
+    (neighbor id, distance) pairs of a school, most similar first
+    None if the school does not exist; empty if its neighbors have not been computed yet
+    """
+    if SNAPSHOT_MODE:
+        return get_mapped_dataset().similar(school_id, limit)
+    neighbors = session.exec(
+        select(SchoolNeighbor.neighbor_id, SchoolNeighbor.distance)
+        .where(SchoolNeighbor.school_id == school_id)
+        .order_by(SchoolNeighbor.rank)
+        .limit(limit)
+    ).all()
+    if not neighbors and session.exec(select(School.id).where(School.id == school_id)).first() is None:
+        return None
+    return [tuple(row) for row in neighbors]
+
+
+if __name__ == "__main__":
+    from database import engine
+    from dataset import bump_dataset_version
+
+    started = time.monotonic()
+    with Session(engine) as session:
+        written = rebuild_neighbors(session)
+        bump_dataset_version(session)
+        session.commit()
+    print(f"Wrote {written} similar-school rows in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,74 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints
+
+A cursor is an opaque, URL-safe token holding the sort column, the sort direction
+and the (sort value, id) pair of the last row of the previous page.
+Ordering is always (sort value, id) with NULLs last when ascending and first when
+descending, which is PostgreSQL's native B-tree order for both scan directions.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, tuple_
+
+
+def encode_cursor(sort_by: str, descending: bool, value: Any, row_id: int) -> str:
+    """Build the opaque cursor pointing just after the given row"""
+    if isinstance(value, datetime):
+        value = {"$dt": value.isoformat()}
+    payload = {"s": sort_by, "d": descending, "v": value, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, descending: bool) -> tuple:
+    """
+    Decode a cursor into (value, id)
+    Raises a 400 error if the cursor is malformed or was issued for another sort
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value, row_id = payload["v"], int(payload["id"])
+        cursor_sort, cursor_descending = payload["s"], payload["d"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["$dt"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if cursor_sort != sort_by or cursor_descending != descending:
+        raise HTTPException(
+            status_code=400,
+            detail="Cursor does not match the requested sort_by/sort_order"
+        )
+    return value, row_id
+
+
+def order_clauses(sort_field, id_field, descending: bool) -> list:
+    """ORDER BY clauses giving a total, index-friendly order"""
+    if descending:
+        return [sort_field.desc().nulls_first(), id_field.desc()]
+    return [sort_field.asc().nulls_last(), id_field.asc()]
+
+
+def keyset_segments(sort_field, id_field, descending: bool, value: Optional[Any], row_id: int) -> list:
+    """
+    WHERE clauses selecting the rows after (value, row_id), as consecutive segments
+    The non-NULL and NULL parts of the order are separate segments so each one is a
+    single index range scan; query them in order until the page is full.
+    """
+    non_null = sort_field.is_not(None)
+    if descending:
+        # NULLs come first: the rest of the NULLs, then every non-NULL row
+        if value is None:
+            return [and_(sort_field.is_(None), id_field < row_id), non_null]
+        return [and_(non_null, tuple_(sort_field, id_field) < tuple_(value, row_id))]
+
+    # NULLs come last: larger non-NULL values, then every NULL row
+    if value is None:
+        return [and_(sort_field.is_(None), id_field > row_id)]
+    return [and_(non_null, tuple_(sort_field, id_field) > tuple_(value, row_id)), sort_field.is_(None)]
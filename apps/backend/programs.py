@@ -0,0 +1,189 @@
+"""
+Fields of study: the CIP program catalog, school <-> program links and their index
+
+Ingestion stores each school's 4-digit CIP codes twice: as school_program rows (for
+SQL filters) and as the comma-separated School.programs_offered column. The in-memory
+ProgramIndex is built from that column when the school snapshot loads (or mapped from
+the posting lists in a snapshot file): one posting list of snapshot row positions per
+CIP code, so "which schools offer nursing?" is a union of a few sorted arrays instead
+of a scan.
+
+A program interest ("Computer Science", "nursing", "11.07") resolves to the catalog
+codes whose title contains every word of it (as a word prefix), or to the codes
+starting with it when it is a CIP code.
+"""
+import re
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, insert, tuple_
+from sqlmodel import Session, select
+
+from models import Program, School, SchoolProgram
+
+# Words ignored when matching an interest against program titles
+INTEREST_STOPWORDS = {"and", "of", "the", "in", "for", "a"}
+# Resolved interests kept per index
+MATCH_CACHE_SIZE = 256
+
+CIP_CODE_PATTERN = re.compile(r"^\d{2}(\.?\d{1,2})?$")
+
+
+def format_cip_code(code) -> Optional[str]:
+    """Canonical 4-digit CIP code: "1107" or 1107 -> "11.07" (None if malformed)"""
+    digits = re.sub(r"\D", "", str(code or ""))
+    if not digits or len(digits) > 4:
+        return None
+    digits = digits.zfill(4)
+    return f"{digits[:2]}.{digits[2:]}"
+
+
+def _words(text: str) -> list:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+class ProgramMatch:
+    """The catalog codes matching one program interest, and the snapshot rows offering them"""
+
+    def __init__(self, codes: list, titles: dict, postings: dict, size: int):
+        self.codes = codes
+        self.titles = titles
+        lists = [postings[code] for code in codes if code in postings]
+        self.positions = np.unique(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int32)
+        self.size = size
+
+    def mask(self) -> np.ndarray:
+        """Boolean mask over the snapshot rows offering a matching program"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.positions] = True
+        return mask
+
+    def offered_title(self, programs_offered: Optional[str]) -> Optional[str]:
+        """Title of the first matching program in a School.programs_offered value, if any"""
+        if not programs_offered or not self.codes:
+            return None
+        offered = set(programs_offered.split(","))
+        for code in self.codes:
+            if code in offered:
+                return self.titles[code]
+        return None
+
+
+class ProgramIndex:
+    """Inverted index CIP code -> sorted snapshot row positions, plus the program catalog"""
+
+    def __init__(self, size: int, postings: dict, catalog: dict):
+        self.size = size
+        self.catalog = catalog
+        self.postings = postings
+        self.title_words = {code: _words(title) for code, title in catalog.items()}
+        self._matches = OrderedDict()
+
+    @classmethod
+    def build(cls, programs_offered: list, catalog: dict) -> "ProgramIndex":
+        """Index a column of School.programs_offered values (one per snapshot row)"""
+        postings = {}
+        for position, offered in enumerate(programs_offered):
+            if offered:
+                for code in offered.split(","):
+                    postings.setdefault(code, []).append(position)
+        # Positions are appended in order, so every posting list is already sorted
+        return cls(
+            len(programs_offered),
+            {code: np.array(positions, dtype=np.int32) for code, positions in postings.items()},
+            catalog,
+        )
+
+    @staticmethod
+    def parse(interest: str):
+        """
+        What an interest is matched on: the CIP code prefix ("11.07", "11") when it is a
+        code, otherwise the tuple of its non-stopword words
+        """
+        text = (interest or "").strip()
+        if CIP_CODE_PATTERN.match(text):
+            return text if "." in text or len(text) <= 2 else f"{text[:2]}.{text[2:]}"
+        return tuple(word for word in _words(text) if word not in INTEREST_STOPWORDS)
+
+    def resolve(self, interest: str) -> list:
+        """Sorted catalog codes matching a program interest"""
+        return self._resolve_parsed(self.parse(interest))
+
+    def _resolve_parsed(self, parsed) -> list:
+        if isinstance(parsed, str):
+            return sorted(code for code in self.catalog if code.startswith(parsed))
+        if not parsed:
+            return []
+        return sorted(
+            code for code, title_words in self.title_words.items()
+            if all(any(title_word.startswith(word) for title_word in title_words) for word in parsed)
+        )
+
+    def match(self, interest: str) -> ProgramMatch:
+        """ProgramMatch for an interest, cached per parsed interest ("11.07" and "11 07" differ)"""
+        key = self.parse(interest)
+        match = self._matches.get(key)
+        if match is None:
+            match = ProgramMatch(self._resolve_parsed(key), self.catalog, self.postings, self.size)
+            self._matches[key] = match
+            while len(self._matches) > MATCH_CACHE_SIZE:
+                self._matches.popitem(last=False)
+        return match
+
+
+def match_programs(session: Session, interest: Optional[str]) -> Optional[ProgramMatch]:
+    """ProgramMatch for an interest against the current dataset; None for "any" or no interest"""
+    if not interest or interest.strip().lower() == "any":
+        return None
+    from snapshot import get_school_snapshot
+    return get_school_snapshot(session).programs.match(interest)
+
+
+def load_catalog(session: Session) -> dict:
+    """CIP code -> program title"""
+    return dict(session.exec(select(Program.cip_code, Program.title)).all())
+
+
+def write_school_programs(session: Session, programs_by_unit_id: dict) -> int:
+    """
+    Make the school_program links of these schools match the given (code, title) lists
+    New codes are added to the program catalog. Returns the number of links added or
+    removed; the caller commits.
+    """
+    if not programs_by_unit_id:
+        return 0
+    school_ids = dict(session.exec(
+        select(School.unit_id, School.id).where(School.unit_id.in_(list(programs_by_unit_id)))
+    ).all())
+
+    titles = {}
+    wanted = set()
+    for unit_id, programs in programs_by_unit_id.items():
+        if unit_id not in school_ids:
+            continue
+        for code, title in programs:
+            titles.setdefault(code, title)
+            wanted.add((school_ids[unit_id], code))
+
+    if titles:
+        known = set(session.exec(select(Program.cip_code).where(Program.cip_code.in_(list(titles)))).all())
+        new_programs = [{"cip_code": code, "title": title} for code, title in titles.items() if code not in known]
+        if new_programs:
+            session.execute(insert(Program), new_programs)
+
+    existing = set(session.exec(
+        select(SchoolProgram.school_id, SchoolProgram.cip_code)
+        .where(SchoolProgram.school_id.in_(list(school_ids.values())))
+    ).all())
+    removed = existing - wanted
+    added = wanted - existing
+    if removed:
+        session.execute(delete(SchoolProgram).where(
+            tuple_(SchoolProgram.school_id, SchoolProgram.cip_code).in_(list(removed))
+        ))
+    if added:
+        session.execute(insert(SchoolProgram), [
+            {"school_id": school_id, "cip_code": code} for school_id, code in sorted(added)
+        ])
+    return len(added) + len(removed)
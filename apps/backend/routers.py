@@ -1,15 +1,35 @@
 """
 API routers for Internavi backend
 """
-from fastapi import APIRouter, Query, HTTPException, Depends
+from functools import partial
+from fastapi import APIRouter, Body, Query, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func, or_
 from typing import Optional, List
 from pydantic import BaseModel
-from database import get_session
+from cache import cache_stats, cached_json_response, count_cache
+from columnar import get_mapped_dataset
+from concurrency import get_limiter
+from database import DatabaseSession, get_session, open_session
+from dataset import SNAPSHOT_MODE, get_dataset_version
+from export import EXPORT_FIELDS, EXPORT_MEDIA_TYPES, accepts_gzip, export_lines, gzip_chunks
+from facets import compute_facets_async
+from filters import SchoolFilters, resolve_fields, resolve_sort_field
 from models import School
+from neighbors import NEIGHBOR_COUNT, similar_schools
+from programs import ProgramMatch
+from pagination import decode_cursor, encode_cursor, keyset_segments, order_clauses
+from scoring import fetch_schools, rank_batch_async, rank_schools_async, resolve_answers, score_school
+from search import search_school_ids_async
+from serialization import dumps
+from snapshot import get_school_snapshot_async
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# Maximum number of answer sets accepted by /api/quiz-match/batch
+MAX_BATCH_PROFILES = 1000
+
 
 class QuizMatchRequest(BaseModel):
     """Request model for quiz matching"""
@@ -18,198 +38,113 @@ class QuizMatchRequest(BaseModel):
     budget_range: str
     program_interest: str
     admission_preference: str
+    zip_code: Optional[str] = None  # Home ZIP code; schools nearby score higher
 
 
-@router.get("/schools", response_model=dict)
-async def get_schools(
-    state: Optional[str] = Query(None, description="Filter by state (e.g., 'CA', 'NY')"),
-    school_type: Optional[str] = Query(None, description="Filter by school type (Public, Private)"),
-    locale: Optional[str] = Query(None, description="Filter by locale (City, Suburban, Rural, Town)"),
-    min_tuition: Optional[float] = Query(None, description="Minimum tuition (in-state)"),
-    max_tuition: Optional[float] = Query(None, description="Maximum tuition (in-state)"),
-    sort_by: Optional[str] = Query("name", description="Sort by field (name, tuition_in_state, admission_rate, etc.)"),
-    sort_order: Optional[str] = Query("asc", description="Sort order (asc, desc)"),
-    page: int = Query(1, ge=1, description="Page number"),
-    page_size: int = Query(50, ge=1, le=100, description="Items per page"),
-    session: Session = Depends(get_session)
-):
-    """
-    Get list of schools with filtering and sorting support
-    """
-    # Build query
-    query = select(School)
-    
-    # Apply filters
-    if state:
-        query = query.where(School.state == state.upper())
-    if school_type:
-        query = query.where(School.school_type == school_type)
-    if locale:
-        query = query.where(School.locale == locale)
-    if min_tuition is not None:
-        query = query.where(School.tuition_in_state >= min_tuition)
-    if max_tuition is not None:
-        query = query.where(School.tuition_in_state <= max_tuition)
-    
-    # Get total count
-    count_query = select(func.count()).select_from(School)
-    if state:
-        count_query = count_query.where(School.state == state.upper())
-    if school_type:
-        count_query = count_query.where(School.school_type == school_type)
-    if locale:
-        count_query = count_query.where(School.locale == locale)
-    if min_tuition is not None:
-        count_query = count_query.where(School.tuition_in_state >= min_tuition)
-    if max_tuition is not None:
-        count_query = count_query.where(School.tuition_in_state <= max_tuition)
-    
-    total = session.exec(count_query).one()
-    
-    # Apply sorting
-    sort_field = getattr(School, sort_by, None)
-    if sort_field is None:
-        sort_field = School.name
-    
-    if sort_order.lower() == "desc":
-        query = query.order_by(sort_field.desc())
-    else:
-        query = query.order_by(sort_field.asc())
-    
-    # Apply pagination
-    offset = (page - 1) * page_size
-    query = query.offset(offset).limit(page_size)
+def list_schools(
+    session: Session,
+    filters: SchoolFilters,
+    sort_by: str,
+    sort_order: str,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    include_total: bool,
+    fields: tuple
+) -> dict:
+    """Build one page of the school list, selecting and returning only the given fields"""
+    resolve_sort_field(sort_by)
+    descending = sort_order.lower() == "desc"
+    filters.resolve(session)
     
-    # Execute query
-    schools = session.exec(query).all()
+    # Select the requested columns plus the sort column, needed for the cursor, from the
+    # database or the mapped snapshot; one extra row tells whether another page exists
+    selected = tuple(dict.fromkeys([*fields, sort_by]))
+    page_rows = get_mapped_dataset().page_rows if SNAPSHOT_MODE else partial(query_page_rows, session)
+    total, schools = page_rows(filters, sort_by, descending, page, page_size, cursor, include_total, selected)
+    next_cursor = None
+    if len(schools) > page_size:
+        schools = schools[:page_size]
+        last = schools[-1]
+        next_cursor = encode_cursor(sort_by, descending, last[selected.index(sort_by)], last[0])
     
+    # Serialize straight from the row tuples; the sort column is dropped if it was not requested
     return {
-        "schools": schools,
+        "schools": [dict(zip(fields, row)) for row in schools],
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
+        "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+        "next_cursor": next_cursor
     }
 
 
-@router.post("/quiz-match", response_model=dict)
-async def quiz_match(
-    request: QuizMatchRequest,
-    session: Session = Depends(get_session)
-):
-    """
-    Match schools based on quiz inputs using simplified conditional scoring logic
-    Returns top 3-5 schools ranked by match score
-    """
-    # Extract request parameters
-    study_level = request.study_level
-    preferred_location = request.preferred_location
-    budget_range = request.budget_range
-    program_interest = request.program_interest
-    admission_preference = request.admission_preference
+def query_page_rows(
+    session: Session,
+    filters: SchoolFilters,
+    sort_by: str,
+    descending: bool,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    include_total: bool,
+    selected: tuple
+) -> tuple:
+    """(total, rows) of one page from the database: up to page_size + 1 rows of the selected fields"""
+    sort_field = getattr(School, sort_by)
+    query = filters.apply(select(*(getattr(School, name) for name in selected)))
+    
+    # Get total count (cached per dataset version and filters, skipped on request)
+    total = None
+    if include_total:
+        count_key = (get_dataset_version(session), filters.signature())
+        total = count_cache.get(count_key)
+        if total is None:
+            total = session.exec(filters.apply(select(func.count()).select_from(School))).one()
+            count_cache.set(count_key, total)
     
-    # Get all schools
-    query = select(School)
-    all_schools = session.exec(query).all()
+    # Apply sorting (id breaks ties so every row has a stable position)
+    query = query.order_by(*order_clauses(sort_field, School.id, descending))
     
-    if not all_schools:
+    # Apply pagination: keyset when a cursor is given, offset otherwise
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, descending)
+        schools = []
+        for segment in keyset_segments(sort_field, School.id, descending, value, last_id):
+            schools += session.exec(query.where(segment).limit(page_size + 1 - len(schools))).all()
+            if len(schools) > page_size:
+                break
+    else:
+        schools = session.exec(query.offset((page - 1) * page_size).limit(page_size + 1)).all()
+    return total, schools
+
+
+async def match_schools(session: DatabaseSession, request: QuizMatchRequest) -> dict:
+    """Rank schools for one set of quiz answers"""
+    # A ZIP code with no schools around it just adds no distance points
+    snapshot = await get_school_snapshot_async(session)
+    answers, origin, programs = await run_in_threadpool(resolve_answers, snapshot, request)
+    ranked = await rank_schools_async(session, answers, origin=origin, programs=programs)
+    return format_matches(ranked, answers, origin, programs)
+
+
+def format_matches(
+    ranked: list, request: QuizMatchRequest, origin: Optional[tuple], programs: Optional[ProgramMatch]
+) -> dict:
+    """Quiz-match response body for ranked (school, score) pairs"""
+    if not ranked:
         raise HTTPException(status_code=404, detail="No schools found in database")
     
-    # Score each school
-    scored_schools = []
-    
-    for school in all_schools:
-        score = 0
-        reasons = []
-        
-        # 1. Study Level Matching (simplified - check degree type)
-        if study_level.lower() in ["undergraduate", "undergrad"]:
-            if school.degree_type and "4" in str(school.degree_type):
-                score += 20
-                reasons.append("4-year program available")
-        elif study_level.lower() == "graduate":
-            if school.degree_type and "4" in str(school.degree_type):
-                score += 20
-                reasons.append("Graduate programs available")
-        elif study_level.lower() == "high school":
-            score += 10  # All schools are potential options
-        
-        # 2. Location Matching
-        if preferred_location.lower() != "any":
-            if school.state and preferred_location.upper() in school.state.upper():
-                score += 25
-                reasons.append(f"Located in {school.state}")
-            elif school.locale:
-                location_map = {
-                    "urban": ["City"],
-                    "suburban": ["Suburban"],
-                    "rural": ["Rural", "Town"]
-                }
-                preferred_locale = location_map.get(preferred_location.lower(), [])
-                if school.locale in preferred_locale:
-                    score += 15
-                    reasons.append(f"{school.locale} setting")
-        
-        # 3. Budget Matching
-        if budget_range and school.tuition_in_state is not None:
-            budget_ranges = {
-                "low": (0, 15000),
-                "medium": (15000, 35000),
-                "high": (35000, float('inf'))
-            }
-            min_budget, max_budget = budget_ranges.get(budget_range.lower(), (0, float('inf')))
-            if min_budget <= school.tuition_in_state <= max_budget:
-                score += 25
-                reasons.append(f"Tuition: ${school.tuition_in_state:,.0f}")
-            elif school.tuition_in_state < min_budget:
-                score += 15  # Below budget is still good
-                reasons.append(f"Below budget: ${school.tuition_in_state:,.0f}")
-        
-        # 4. Program Interest (simplified - check if school has programs)
-        if program_interest.lower() != "any":
-            # For MVP, we'll give points if school has program data
-            # In a full implementation, we'd check specific programs
-            if school.programs_offered:
-                score += 15
-                reasons.append("Programs available")
-            else:
-                score += 5  # Still a potential match
-        
-        # 5. Admission Preference
-        if admission_preference and school.admission_rate is not None:
-            if admission_preference.lower() == "selective":
-                if school.admission_rate < 0.5:  # Less than 50% acceptance
-                    score += 15
-                    reasons.append(f"Selective: {school.admission_rate*100:.1f}% acceptance")
-            elif admission_preference.lower() == "moderate":
-                if 0.3 <= school.admission_rate <= 0.7:
-                    score += 15
-                    reasons.append(f"Moderate: {school.admission_rate*100:.1f}% acceptance")
-            elif admission_preference.lower() == "open":
-                if school.admission_rate > 0.7:
-                    score += 15
-                    reasons.append(f"Open: {school.admission_rate*100:.1f}% acceptance")
-            elif admission_preference.lower() == "any":
-                score += 10
-        
-        # Bonus points for schools with good outcomes
-        if school.completion_rate and school.completion_rate > 0.7:
-            score += 5
-        if school.earnings_after_10yrs and school.earnings_after_10yrs > 50000:
-            score += 5
-        
-        scored_schools.append({
+    # Filter out schools with score 0 (no matches)
+    top_schools = [
+        {
             "school": school,
             "score": score,
-            "reasons": reasons
-        })
-    
-    # Sort by score (descending) and take top 5
-    scored_schools.sort(key=lambda x: x["score"], reverse=True)
-    top_schools = scored_schools[:5]
-    
-    # Filter out schools with score 0 (no matches)
-    top_schools = [s for s in top_schools if s["score"] > 0]
+            "reasons": score_school(school, request, origin, programs)[1]
+        }
+        for school, score in ranked
+        if score > 0
+    ]
     
     if not top_schools:
         raise HTTPException(
@@ -230,3 +165,253 @@ async def quiz_match(
         ]
     }
 
+
+def load_schools_by_id(session: Session, ids: list, fields: tuple) -> list:
+    """The given fields of each school in ids, in the order of ids"""
+    if not ids:
+        return []
+    if SNAPSHOT_MODE:
+        dataset = get_mapped_dataset()
+        return [dict(zip(fields, row)) for row in dataset.rows(dataset.positions_of(ids), fields)]
+    rows = session.exec(select(*(getattr(School, name) for name in fields)).where(School.id.in_(ids))).all()
+    if len(fields) == 1:
+        # A single selected column comes back as plain values
+        rows = [(value,) for value in rows]
+    by_id = {row[0]: dict(zip(fields, row)) for row in rows}
+    return [by_id[school_id] for school_id in ids if school_id in by_id]
+
+
+@router.get("/schools", response_model=dict)
+async def get_schools(
+    http_request: Request,
+    filters: SchoolFilters = Depends(),
+    sort_by: Optional[str] = Query("name", description="Sort by field (name, tuition_in_state, admission_rate, student_size, completion_rate, earnings_after_10yrs)"),
+    sort_order: Optional[str] = Query("asc", description="Sort order (asc, desc)"),
+    page: int = Query(1, ge=1, description="Page number (ignored when cursor is set)"),
+    page_size: int = Query(50, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous response's next_cursor"),
+    include_total: bool = Query(True, description="Set to false to skip counting (infinite scroll)"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (default: the compact list fields)"),
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Get list of schools with filtering and sorting support
+    Pass next_cursor back as cursor for keyset pagination; page/offset paging still works
+    near=<zip>&radius=<miles> keeps the schools within radius miles of the ZIP code
+    Returns a compact projection unless fields= is given; full records come from /api/schools/{id}
+    Responses are cached per dataset version and carry an ETag (304 on If-None-Match)
+    Concurrent identical requests share one query; past the endpoint's limits it answers 503
+    """
+    columns = resolve_fields(fields)
+    key = (
+        "schools",
+        await session.run_sync(get_dataset_version),
+        filters.signature(),
+        sort_by,
+        sort_order.lower(),
+        None if cursor else page,
+        page_size,
+        cursor,
+        include_total,
+        columns,
+    )
+    
+    async def load(db: DatabaseSession) -> dict:
+        resolve_sort_field(sort_by)
+        await filters.resolve_async(db)
+        args = (filters, sort_by, sort_order, page, page_size, cursor, include_total, columns)
+        if SNAPSHOT_MODE:
+            # Paging the mapped snapshot is pure CPU work, with no session involved
+            return await run_in_threadpool(list_schools, None, *args)
+        return await db.run_sync(list_schools, *args)
+    
+    return await cached_json_response(http_request, key, load, limiter=get_limiter("schools"))
+
+
+@router.get("/schools/search", response_model=dict)
+async def search_schools(
+    http_request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Name, name prefix, misspelled name or acronym"),
+    filters: SchoolFilters = Depends(),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of results"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (default: the compact list fields)"),
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Search school names for autocomplete, best matches first
+    Tolerates typos and matches prefixes, words inside the name and acronyms ("ucla")
+    Accepts the same state/school_type/locale/tuition filters as /api/schools
+    Responses are cached per dataset version and carry an ETag (304 on If-None-Match)
+    Concurrent identical requests share one query; past the endpoint's limits it answers 503
+    """
+    columns = resolve_fields(fields)
+    
+    async def load(db: DatabaseSession) -> dict:
+        await filters.resolve_async(db)
+        ids = await search_school_ids_async(db, q, filters, limit)
+        return {"query": q, "schools": await db.run_sync(load_schools_by_id, ids, columns)}
+    
+    key = (
+        "search",
+        await session.run_sync(get_dataset_version),
+        q,
+        filters.signature(),
+        limit,
+        columns,
+    )
+    return await cached_json_response(http_request, key, load)
+
+
+@router.get("/schools/export")
+async def export_schools(
+    http_request: Request,
+    format: str = Query("csv", description="File format (csv, ndjson)"),
+    filters: SchoolFilters = Depends(),
+    sort_by: Optional[str] = Query("name", description="Sort by field (same values as /api/schools)"),
+    sort_order: Optional[str] = Query("asc", description="Sort order (asc, desc)"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to export (default: every column)"),
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Download every school matching the filters as CSV or NDJSON, without paging
+    Rows are streamed from a server-side cursor; the body is gzipped when the client accepts it
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format '{format}'. Allowed values: {', '.join(EXPORT_MEDIA_TYPES)}"
+        )
+    sort_field = resolve_sort_field(sort_by)
+    columns = resolve_fields(fields) if fields else EXPORT_FIELDS
+    # Resolve near= and program= now, so bad values fail before the response starts
+    await filters.resolve_async(session)
+    
+    body = export_lines(filters, sort_field, sort_order.lower() == "desc", columns, format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="schools.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(http_request.headers.get("accept-encoding")):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
+
+@router.get("/schools/facets", response_model=dict)
+async def get_school_facets(
+    http_request: Request,
+    filters: SchoolFilters = Depends(),
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Counts per state, school_type, locale, tuition bucket and admission-rate bucket
+    Takes the same filters as /api/schools; each facet ignores its own filter, so its
+    counts are what choosing another value would return
+    Responses are cached per dataset version and carry an ETag (304 on If-None-Match)
+    """
+    key = ("facets", await session.run_sync(get_dataset_version), filters.signature())
+    return await cached_json_response(http_request, key, partial(compute_facets_async, filters=filters))
+
+
+# The int convertor keeps other /schools/... paths from matching this route
+@router.get("/schools/{school_id:int}", response_model=dict)
+async def get_school(
+    http_request: Request,
+    school_id: int,
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Get the full record of one school
+    Responses are cached per dataset version and carry an ETag (304 on If-None-Match)
+    """
+    async def load(db: DatabaseSession) -> School:
+        school = (await db.run_sync(fetch_schools, [school_id])).get(school_id)
+        if school is None:
+            raise HTTPException(status_code=404, detail="School not found")
+        return school
+    
+    key = ("school", await session.run_sync(get_dataset_version), school_id)
+    return await cached_json_response(http_request, key, load)
+
+
+@router.get("/schools/{school_id:int}/similar", response_model=dict)
+async def get_similar_schools(
+    http_request: Request,
+    school_id: int,
+    limit: int = Query(10, ge=1, le=NEIGHBOR_COUNT, description="Maximum number of similar schools"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (default: the compact list fields)"),
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Schools most like this one in cost, selectivity, test scores, size, outcomes, locale and type
+    Read from the lists precomputed after each ingestion run (neighbors.py), most similar first
+    Responses are cached per dataset version and carry an ETag (304 on If-None-Match)
+    Concurrent identical requests share one query; past the endpoint's limits it answers 503
+    """
+    columns = resolve_fields(fields)
+    
+    async def load(db: DatabaseSession) -> dict:
+        neighbors = await db.run_sync(similar_schools, school_id, limit)
+        if neighbors is None:
+            raise HTTPException(status_code=404, detail="School not found")
+        schools = await db.run_sync(load_schools_by_id, [neighbor_id for neighbor_id, _ in neighbors], columns)
+        distances = dict(neighbors)
+        return {
+            "school_id": school_id,
+            "schools": schools,
+            "distances": [distances[school["id"]] for school in schools],
+        }
+    
+    key = ("similar", await session.run_sync(get_dataset_version), school_id, limit, columns)
+    return await cached_json_response(http_request, key, load)
+
+
+@router.post("/quiz-match", response_model=dict)
+async def quiz_match(
+    http_request: Request,
+    request: QuizMatchRequest,
+    session: DatabaseSession = Depends(get_session)
+):
+    """
+    Match schools based on quiz inputs using simplified conditional scoring logic
+    Returns top 3-5 schools ranked by match score
+    Responses are cached per dataset version and carry an ETag (304 on If-None-Match)
+    Concurrent identical requests share one match; past the endpoint's limits it answers 503
+    """
+    # Every rule compares answers stripped and case-insensitively, so normalize them for the key
+    answers = tuple((value or "").strip().lower() for value in request.model_dump().values())
+    key = ("quiz-match", await session.run_sync(get_dataset_version), answers)
+    return await cached_json_response(
+        http_request, key, partial(match_schools, request=request), limiter=get_limiter("quiz-match")
+    )
+
+
+@router.post("/quiz-match/batch")
+async def quiz_match_batch(
+    profiles: List[QuizMatchRequest] = Body(..., min_length=1, max_length=MAX_BATCH_PROFILES)
+):
+    """
+    Match many sets of quiz answers in one call, streamed as NDJSON in request order
+    Each line is {"index", "schools", "matches"} as from /api/quiz-match, or
+    {"index", "error": {"status_code", "detail"}} where /api/quiz-match would fail
+    School data is loaded once and profiles are scored together in chunks
+    """
+    async def lines():
+        # The request's dependencies may be closed while the body streams, so use a session of our own
+        async with open_session() as session:
+            index = 0
+            async for answers, origin, programs, ranked in rank_batch_async(session, profiles):
+                try:
+                    line = {"index": index, **format_matches(ranked, answers, origin, programs)}
+                except HTTPException as e:
+                    line = {"index": index, "error": {"status_code": e.status_code, "detail": e.detail}}
+                yield dumps(line) + b"\n"
+                index += 1
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/cache-stats", response_model=dict)
+async def get_cache_stats(session: DatabaseSession = Depends(get_session)):
+    """Hit/miss counters of the response and count caches"""
+    return {"dataset_version": await session.run_sync(get_dataset_version), **cache_stats()}
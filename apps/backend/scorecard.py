@@ -0,0 +1,221 @@
+"""
+Declarative mapping from College Scorecard API records to School columns
+
+Each column is described once by a FieldSpec (source paths, converter, default).
+The specs are compiled at import time into plain accessor functions, so mapping a
+record costs one dict lookup per path instead of re-splitting and re-joining keys.
+A value is only treated as missing when it is None, so legitimate zeros are kept.
+Every mapped row carries a content_hash of its values, so ingestion can tell an
+unchanged school without comparing columns in the database.
+"""
+import hashlib
+import json
+from typing import Callable, Optional, Sequence
+
+from models import School
+from programs import format_cip_code
+
+
+def safe_float(value):
+    """Safely convert value to float, returning None if conversion fails"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_int(value):
+    """Safely convert value to int, returning None if conversion fails"""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def safe_text(value):
+    """Convert value to str, treating empty strings as missing"""
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+LOCALE_NAMES = {
+    11: "City", 12: "City", 13: "City",
+    21: "Suburban", 22: "Suburban", 23: "Suburban",
+    31: "Rural", 32: "Rural", 33: "Rural",
+    41: "Town", 42: "Town", 43: "Town"
+}
+
+
+def locale_name(code):
+    """Map an NCES locale code (e.g. 21) to its category name"""
+    return LOCALE_NAMES.get(safe_int(code))
+
+
+def program_list(value) -> list:
+    """
+    (CIP code, title) pairs from a latest.programs.cip_4_digit list, sorted by code
+    The API lists a program once per credential level, so codes are de-duplicated.
+    """
+    if not isinstance(value, list):
+        return []
+    programs = {}
+    for program in value:
+        if not isinstance(program, dict):
+            continue
+        code = format_cip_code(program.get("code"))
+        if code and code not in programs:
+            programs[code] = (safe_text(program.get("title")) or code).rstrip(".").strip()
+    return sorted(programs.items())
+
+
+def program_codes(value):
+    """Comma-separated CIP codes for School.programs_offered (None when there are none)"""
+    return ",".join(code for code, _ in program_list(value)) or None
+
+
+class FieldSpec:
+    """Where a School column comes from in an API record and how to convert it"""
+
+    __slots__ = ("column", "paths", "converter", "default")
+
+    def __init__(self, column: str, paths: Sequence[str], converter: Optional[Callable] = None, default=None):
+        self.column = column
+        self.paths = tuple(paths)
+        self.converter = converter
+        self.default = default
+
+    def compile(self) -> Callable[[dict], object]:
+        """Build an accessor returning the converted value of the first path that is present"""
+        getters = [_compile_path(path) for path in self.paths]
+        converter, default = self.converter, self.default
+
+        def extract(record: dict):
+            for get in getters:
+                value = get(record)
+                if value is not None:
+                    if converter is not None:
+                        value = converter(value)
+                    return default if value is None else value
+            return default
+
+        return extract
+
+
+def _compile_path(path: str) -> Callable[[dict], object]:
+    """Accessor for a dotted path, trying the flat key ("school.name") before nested dicts"""
+    keys = path.split(".")
+    if len(keys) == 1:
+        return lambda record: record.get(path)
+    first, rest = keys[0], keys[1:]
+
+    def get(record: dict):
+        value = record.get(path)
+        if value is not None:
+            return value
+        current = record.get(first)
+        for key in rest:
+            if not isinstance(current, dict):
+                return None
+            current = current.get(key)
+        return current
+
+    return get
+
+
+SCHOOL_FIELDS = [
+    # Basic information
+    FieldSpec("name", ["school.name"], safe_text, default="Unknown"),
+    FieldSpec("city", ["school.city"], safe_text),
+    FieldSpec("state", ["school.state"], safe_text),
+    FieldSpec("zip", ["school.zip"], safe_text),
+    FieldSpec("latitude", ["location.lat"], safe_float),
+    FieldSpec("longitude", ["location.lon"], safe_float),
+    FieldSpec("website", ["school.school_url"], safe_text),
+
+    # School characteristics
+    FieldSpec("school_type", ["school.ownership"], safe_text),
+    FieldSpec("degree_type", ["school.degrees_awarded.predominant"], safe_text),
+    FieldSpec("locale", ["school.locale"], locale_name),
+
+    # Admissions
+    FieldSpec("admission_rate", ["latest.admissions.admission_rate.overall"], safe_float),
+    FieldSpec("sat_avg", ["latest.admissions.sat_scores.average.overall"], safe_int),
+    FieldSpec("act_avg", ["latest.admissions.act_scores.midpoint.cumulative"], safe_int),
+
+    # Cost
+    FieldSpec("tuition_in_state", ["latest.cost.tuition.in_state"], safe_float),
+    FieldSpec("tuition_out_of_state", ["latest.cost.tuition.out_of_state"], safe_float),
+
+    # Student body
+    FieldSpec("student_size", ["latest.student.size"], safe_int),
+    FieldSpec("undergrad_size", ["latest.student.enrollment.undergrad_12_month"], safe_int),
+
+    # Outcomes (the earnings field name differs between API versions)
+    FieldSpec("completion_rate", ["latest.completion.completion_rate_4yr_150nt"], safe_float),
+    FieldSpec("earnings_after_10yrs", [
+        "latest.earnings.10_yrs_after_entry.median",
+        "latest.earnings._10_yrs_after_entry.median",
+    ], safe_float),
+
+    # Programs (4-digit CIP codes; titles go to the program catalog, see map_page_programs)
+    FieldSpec("programs_offered", ["latest.programs.cip_4_digit"], program_codes),
+
+    # Metadata
+    FieldSpec("unit_id", ["id"], safe_text),
+    FieldSpec("ope_id", ["school.ope6_id"], safe_text),
+]
+
+_EXTRACTORS = [(spec.column, spec.compile()) for spec in SCHOOL_FIELDS]
+_HASHED_COLUMNS = [spec.column for spec in SCHOOL_FIELDS]
+_UNIT_ID = dict(_EXTRACTORS)["unit_id"]
+_PROGRAMS = FieldSpec("programs", ["latest.programs.cip_4_digit"], program_list, default=[]).compile()
+
+
+def content_hash(row: dict) -> str:
+    """Stable digest of a mapped row's values (every mapped column, in SCHOOL_FIELDS order)"""
+    values = json.dumps([row[column] for column in _HASHED_COLUMNS], separators=(",", ":"))
+    return hashlib.blake2b(values.encode(), digest_size=16).hexdigest()
+
+
+def map_record(api_data: dict) -> dict:
+    """Map one API record to a dict of School column values"""
+    row = {column: extract(api_data) for column, extract in _EXTRACTORS}
+    row["content_hash"] = content_hash(row)
+    return row
+
+
+def map_page(results: list) -> list:
+    """Map a page of API records to insert-ready dicts, without building School instances"""
+    extractors = _EXTRACTORS
+    rows = [{column: extract(record) for column, extract in extractors} for record in results]
+    for row in rows:
+        row["content_hash"] = content_hash(row)
+    return rows
+
+
+def map_page_columns(results: list) -> dict:
+    """Map a page of API records to one list of values per School column"""
+    return {column: [extract(record) for record in results] for column, extract in _EXTRACTORS}
+
+
+def map_page_programs(results: list) -> dict:
+    """unit_id -> (CIP code, title) pairs for a page of API records"""
+    programs = {}
+    for record in results:
+        unit_id = _UNIT_ID(record)
+        if unit_id:
+            programs[unit_id] = _PROGRAMS(record)
+    return programs
+
+
+def map_college_scorecard_to_school(api_data: dict) -> School:
+    """
+    Map College Scorecard API response to School model
+    Handles both flat keys (like "school.name") and nested structures
+    """
+    return School(**map_record(api_data))
@@ -0,0 +1,601 @@
+"""
+Quiz matching rules and scoring engines
+
+Three interchangeable engines rank schools for a set of quiz answers:
+- "numpy": vectorized scoring over the in-memory SchoolSnapshot (default)
+- "sql": the rules compiled into one CASE expression, ranked by the database
+- "python": the reference loop over every School row
+All of them break ties on the lowest school id and build match reasons with score_school.
+When the answers include a ZIP code, every engine takes its resolved origin
+(geo.locate_zip) and adds points for schools close to it. The program interest is
+resolved against the CIP catalog (programs.match_programs): the numpy engine reads the
+snapshot's program index, the sql engine the school_program table, and score_school
+the school's programs_offered codes.
+In snapshot mode (dataset.SNAPSHOT_MODE) the numpy engine is always used, and the
+winners come from the mapped snapshot file rather than the database.
+"""
+import os
+from functools import reduce
+
+import numpy as np
+from sqlalchemy import and_, case, func, literal
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from columnar import get_mapped_dataset
+from dataset import SNAPSHOT_MODE
+from geo import distance_miles, get_geo_index, within_radius_condition
+from models import School, SchoolProgram
+from programs import ProgramMatch
+from snapshot import SchoolSnapshot, get_school_snapshot, get_school_snapshot_async
+
+# Number of schools returned by quiz matching
+TOP_K = 5
+
+# Engine used by rank_schools (numpy, sql or python)
+QUIZ_MATCH_ENGINE = os.getenv("QUIZ_MATCH_ENGINE", "numpy")
+
+# Profiles scored together by rank_batch_async; bounds the score matrix (profiles x schools)
+BATCH_CHUNK_SIZE = 32
+
+LOCATION_LOCALES = {
+    "urban": ["City"],
+    "suburban": ["Suburban"],
+    "rural": ["Rural", "Town"]
+}
+
+BUDGET_RANGES = {
+    "low": (0, 15000),
+    "medium": (15000, 35000),
+    "high": (35000, float('inf'))
+}
+
+# (max distance in miles, points) from the quiz ZIP code, nearest band first
+DISTANCE_POINTS = [
+    (25, 20),
+    (50, 15),
+    (100, 10),
+    (250, 5),
+]
+MAX_SCORED_DISTANCE = DISTANCE_POINTS[-1][0]
+
+
+def distance_points(distance):
+    """Points for a distance in miles (a float or an array of floats)"""
+    points = np.zeros(np.shape(distance), dtype=np.int32)
+    for max_distance, value in reversed(DISTANCE_POINTS):
+        points[np.asarray(distance) <= max_distance] = value
+    return points if np.ndim(distance) else int(points)
+
+
+def score_school(school, request, origin: tuple = None, programs: ProgramMatch = None) -> tuple:
+    """
+    Score a single school against quiz answers using simplified conditional scoring logic
+    origin is the (latitude, longitude) of the quiz ZIP code, if any, and programs the
+    resolved program interest (programs.match_programs)
+    Returns (score, reasons). This is the reference implementation every engine must match.
+    """
+    study_level = request.study_level
+    preferred_location = request.preferred_location
+    budget_range = request.budget_range
+    program_interest = request.program_interest
+    admission_preference = request.admission_preference
+
+    score = 0
+    reasons = []
+
+    # 1. Study Level Matching (simplified - check degree type)
+    if study_level.lower() in ["undergraduate", "undergrad"]:
+        if school.degree_type and "4" in str(school.degree_type):
+            score += 20
+            reasons.append("4-year program available")
+    elif study_level.lower() == "graduate":
+        if school.degree_type and "4" in str(school.degree_type):
+            score += 20
+            reasons.append("Graduate programs available")
+    elif study_level.lower() == "high school":
+        score += 10  # All schools are potential options
+
+    # 2. Location Matching
+    if preferred_location.lower() != "any":
+        if school.state and preferred_location.upper() in school.state.upper():
+            score += 25
+            reasons.append(f"Located in {school.state}")
+        elif school.locale:
+            preferred_locale = LOCATION_LOCALES.get(preferred_location.lower(), [])
+            if school.locale in preferred_locale:
+                score += 15
+                reasons.append(f"{school.locale} setting")
+
+    # 2b. Distance from the quiz ZIP code
+    if origin and school.latitude is not None and school.longitude is not None:
+        distance = distance_miles(origin, school.latitude, school.longitude)
+        points = distance_points(distance)
+        if points:
+            score += points
+            reasons.append(f"{distance:.0f} miles from {request.zip_code}")
+
+    # 3. Budget Matching
+    if budget_range and school.tuition_in_state is not None:
+        min_budget, max_budget = BUDGET_RANGES.get(budget_range.lower(), (0, float('inf')))
+        if min_budget <= school.tuition_in_state <= max_budget:
+            score += 25
+            reasons.append(f"Tuition: ${school.tuition_in_state:,.0f}")
+        elif school.tuition_in_state < min_budget:
+            score += 15  # Below budget is still good
+            reasons.append(f"Below budget: ${school.tuition_in_state:,.0f}")
+
+    # 4. Program Interest: does the school offer a program matching the interest?
+    if program_interest.lower() != "any":
+        title = programs.offered_title(school.programs_offered) if programs else None
+        if title:
+            score += 15
+            reasons.append(f"Offers {title}")
+        else:
+            score += 5  # Still a potential match
+
+    # 5. Admission Preference
+    if admission_preference and school.admission_rate is not None:
+        if admission_preference.lower() == "selective":
+            if school.admission_rate < 0.5:  # Less than 50% acceptance
+                score += 15
+                reasons.append(f"Selective: {school.admission_rate*100:.1f}% acceptance")
+        elif admission_preference.lower() == "moderate":
+            if 0.3 <= school.admission_rate <= 0.7:
+                score += 15
+                reasons.append(f"Moderate: {school.admission_rate*100:.1f}% acceptance")
+        elif admission_preference.lower() == "open":
+            if school.admission_rate > 0.7:
+                score += 15
+                reasons.append(f"Open: {school.admission_rate*100:.1f}% acceptance")
+        elif admission_preference.lower() == "any":
+            score += 10
+
+    # Bonus points for schools with good outcomes
+    if school.completion_rate and school.completion_rate > 0.7:
+        score += 5
+    if school.earnings_after_10yrs and school.earnings_after_10yrs > 50000:
+        score += 5
+
+    return score, reasons
+
+
+def _study_level_points(snapshot: SchoolSnapshot, study_level: str):
+    study_level = study_level.lower()
+    if study_level in ["undergraduate", "undergrad", "graduate"]:
+        return 20 * snapshot.four_year
+    if study_level == "high school":
+        return 10
+    return 0
+
+
+def _location_points(snapshot: SchoolSnapshot, preferred_location: str):
+    # State first, locale only for schools outside the state
+    if preferred_location.lower() == "any":
+        return 0
+    wanted_state = preferred_location.upper()
+    in_state = snapshot.state_mask(lambda state: bool(state) and wanted_state in state.upper())
+    preferred_locale = LOCATION_LOCALES.get(preferred_location.lower(), [])
+    in_locale = snapshot.locale_mask(lambda locale: bool(locale) and locale in preferred_locale)
+    return 25 * in_state + 15 * (in_locale & ~in_state)
+
+
+def _budget_points(snapshot: SchoolSnapshot, budget_range: str):
+    # NaN tuition never matches
+    if not budget_range:
+        return 0
+    min_budget, max_budget = BUDGET_RANGES.get(budget_range.lower(), (0, float('inf')))
+    tuition = snapshot.tuition_in_state
+    within = (tuition >= min_budget) & (tuition <= max_budget)
+    return 25 * within + 15 * ((tuition < min_budget) & ~within)
+
+
+def _program_points(snapshot: SchoolSnapshot, program_interest: str):
+    if program_interest.lower() == "any":
+        return 0
+    # Scatter over the posting lists of the matching codes instead of testing every row
+    points = np.full(len(snapshot), 5, dtype=np.int32)
+    points[snapshot.programs.match(program_interest).positions] = 15
+    return points
+
+
+def _admission_points(snapshot: SchoolSnapshot, admission_preference: str):
+    if not admission_preference:
+        return 0
+    rate = snapshot.admission_rate
+    preference = admission_preference.lower()
+    if preference == "selective":
+        return 15 * (rate < 0.5)
+    if preference == "moderate":
+        return 15 * ((rate >= 0.3) & (rate <= 0.7))
+    if preference == "open":
+        return 15 * (rate > 0.7)
+    if preference == "any":
+        return 10 * ~np.isnan(rate)
+    return 0
+
+
+def _outcome_points(snapshot: SchoolSnapshot) -> np.ndarray:
+    # Bonus points for schools with good outcomes, the same for every set of answers
+    return (5 * (snapshot.completion_rate > 0.7) + 5 * (snapshot.earnings_after_10yrs > 50000)).astype(np.int32)
+
+
+# Vectorized rules that each depend on a single answer: (answer field, points function)
+# A points function returns an array aligned with the snapshot rows, or a constant
+SNAPSHOT_RULES = [
+    ("study_level", _study_level_points),
+    ("preferred_location", _location_points),
+    ("budget_range", _budget_points),
+    ("program_interest", _program_points),
+    ("admission_preference", _admission_points),
+]
+
+
+def score_snapshot(snapshot: SchoolSnapshot, request, origin: tuple = None) -> np.ndarray:
+    """
+    Vectorized equivalent of score_school over every row of the snapshot
+    Returns an int32 array of scores aligned with snapshot.ids
+    """
+    scores = _outcome_points(snapshot)
+    for field, points in SNAPSHOT_RULES:
+        scores += points(snapshot, getattr(request, field))
+
+    # Distance (only the grid cells near the origin are measured)
+    if origin:
+        positions, distances = get_geo_index(snapshot).within(origin, MAX_SCORED_DISTANCE)
+        scores[positions] += distance_points(distances)
+
+    return scores
+
+
+def top_k_positions(scores: np.ndarray, k: int = TOP_K) -> np.ndarray:
+    """Positions of the k highest scores, best first, ties broken by lowest position"""
+    return top_k_rows(scores[np.newaxis], k)[0]
+
+
+def top_k_rows(scores: np.ndarray, k: int = TOP_K) -> np.ndarray:
+    """
+    top_k_positions for every row of a (profiles x schools) score matrix
+    A partial sort finds each row's k-th best score; only the scores above it and
+    the earliest ties at it are ever sorted, so ties still go to the lowest position.
+    """
+    rows, n = scores.shape
+    k = min(k, n)
+    if k == 0:
+        return np.empty((rows, 0), dtype=np.intp)
+    # The last k columns of the partition hold every score above the k-th best, plus some ties
+    candidates = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    cutoff = candidate_scores[:, :1]
+    above_rows, above_columns = np.nonzero(candidate_scores > cutoff)
+    above_positions = candidates[above_rows, above_columns]
+    needed = k - np.bincount(above_rows, minlength=rows)
+    # Fill up with the earliest ties at the cutoff, one per step (argmax stops at the first True)
+    ties = scores == cutoff
+    row_index = np.arange(rows)
+    winner_rows, winner_positions = [above_rows], [above_positions]
+    for step in range(int(needed.max())):
+        first = ties.argmax(axis=1)
+        wanted = needed > step
+        winner_rows.append(row_index[wanted])
+        winner_positions.append(first[wanted])
+        ties[row_index, first] = False
+    winner_rows = np.concatenate(winner_rows)
+    winner_positions = np.concatenate(winner_positions)
+    order = np.lexsort((winner_positions, -scores[winner_rows, winner_positions], winner_rows))
+    return winner_positions[order].reshape(rows, k)
+
+
+class BatchScorer:
+    """
+    score_snapshot for many sets of answers, as a (profiles x schools) matrix
+    Each rule is evaluated once per distinct answer across the batch; a profile's
+    scores are then the sum of the rows it selects. Profiles are scored in chunks
+    so the matrix stays bounded for large batches.
+    """
+
+    def __init__(self, snapshot: SchoolSnapshot, requests: list, origins: list):
+        self.snapshot = snapshot
+        # (positions, points) of the distance rule, once per distinct origin
+        self.nearby = {}
+        for origin in origins:
+            if origin and origin not in self.nearby:
+                positions, distances = get_geo_index(snapshot).within(origin, MAX_SCORED_DISTANCE)
+                self.nearby[origin] = (positions, distance_points(distances).astype(np.int16))
+        self.origins = origins
+        # Scores stay far below 2**15, and the narrower matrix halves the memory traffic
+        self.outcomes = _outcome_points(snapshot).astype(np.int16)
+        self.rules = []
+        for field, points in SNAPSHOT_RULES:
+            distinct = {}
+            codes = np.array(
+                [distinct.setdefault(getattr(request, field), len(distinct)) for request in requests],
+                dtype=np.intp
+            )
+            terms = np.empty((len(distinct), len(snapshot)), dtype=np.int16)
+            for answer, code in distinct.items():
+                terms[code] = points(snapshot, answer)
+            self.rules.append((terms, codes))
+
+    def scores(self, start: int, stop: int) -> np.ndarray:
+        """Score matrix of the profiles in [start, stop)"""
+        scores = np.repeat(self.outcomes[np.newaxis], stop - start, axis=0)
+        for terms, codes in self.rules:
+            # Row by row: faster than materializing terms[codes] as a second matrix
+            for row, code in enumerate(codes[start:stop]):
+                scores[row] += terms[code]
+        for row, origin in enumerate(self.origins[start:stop]):
+            if origin:
+                positions, points = self.nearby[origin]
+                scores[row, positions] += points
+        return scores
+
+    def winners(self, start: int, stop: int, k: int = TOP_K) -> list:
+        """(school id, score) of the k best rows for each profile in [start, stop)"""
+        scores = self.scores(start, stop)
+        positions = top_k_rows(scores, k)
+        ids = self.snapshot.ids
+        return [
+            [(int(ids[p]), int(row_scores[p])) for p in row_positions]
+            for row_scores, row_positions in zip(scores, positions)
+        ]
+
+
+def score_expression(request, origin: tuple = None, programs: ProgramMatch = None):
+    """Compile the scoring rules for one set of quiz answers into a single SQL expression"""
+    terms = []
+
+    # 1. Study Level Matching
+    study_level = request.study_level.lower()
+    if study_level in ["undergraduate", "undergrad", "graduate"]:
+        terms.append(case((School.degree_type.contains("4", autoescape=True), 20), else_=0))
+    elif study_level == "high school":
+        terms.append(literal(10))
+
+    # 2. Location Matching (a NULL state falls through to the locale branch)
+    preferred_location = request.preferred_location
+    if preferred_location.lower() != "any":
+        in_state = and_(
+            School.state != "",
+            func.upper(School.state).contains(preferred_location.upper(), autoescape=True)
+        )
+        branches = [(in_state, 25)]
+        preferred_locale = LOCATION_LOCALES.get(preferred_location.lower(), [])
+        if preferred_locale:
+            branches.append((School.locale.in_(preferred_locale), 15))
+        terms.append(case(*branches, else_=0))
+
+    # 2b. Distance (NULL coordinates match no band)
+    if origin:
+        terms.append(case(
+            *((within_radius_condition(origin, max_distance), value) for max_distance, value in DISTANCE_POINTS),
+            else_=0
+        ))
+
+    # 3. Budget Matching
+    if request.budget_range:
+        min_budget, max_budget = BUDGET_RANGES.get(request.budget_range.lower(), (0, float('inf')))
+        within = School.tuition_in_state >= min_budget
+        if max_budget != float('inf'):
+            within = and_(within, School.tuition_in_state <= max_budget)
+        terms.append(case((within, 25), (School.tuition_in_state < min_budget, 15), else_=0))
+
+    # 4. Program Interest
+    if request.program_interest.lower() != "any":
+        if programs and programs.codes:
+            offers = School.id.in_(
+                select(SchoolProgram.school_id).where(SchoolProgram.cip_code.in_(programs.codes))
+            )
+            terms.append(case((offers, 15), else_=5))
+        else:
+            terms.append(literal(5))
+
+    # 5. Admission Preference
+    if request.admission_preference:
+        rate = School.admission_rate
+        preference = request.admission_preference.lower()
+        if preference == "selective":
+            terms.append(case((rate < 0.5, 15), else_=0))
+        elif preference == "moderate":
+            terms.append(case((and_(rate >= 0.3, rate <= 0.7), 15), else_=0))
+        elif preference == "open":
+            terms.append(case((rate > 0.7, 15), else_=0))
+        elif preference == "any":
+            terms.append(case((rate.is_not(None), 10), else_=0))
+
+    # Bonus points for schools with good outcomes
+    terms.append(case((School.completion_rate > 0.7, 5), else_=0))
+    terms.append(case((School.earnings_after_10yrs > 50000, 5), else_=0))
+
+    return reduce(lambda total, term: total + term, terms).label("score")
+
+
+def _snapshot_winners(snapshot: SchoolSnapshot, request, k: int, origin: tuple = None) -> list:
+    """CPU-bound part of the numpy engine: (school id, score) of the k best rows"""
+    scores = score_snapshot(snapshot, request, origin)
+    return [(int(snapshot.ids[p]), int(scores[p])) for p in top_k_positions(scores, k)]
+
+
+def fetch_schools(session: Session, school_ids) -> dict:
+    """School rows by id; ids that no longer exist are missing from the result"""
+    if not school_ids:
+        return {}
+    if SNAPSHOT_MODE:
+        dataset = get_mapped_dataset()
+        return {school.id: school for school in dataset.schools(dataset.positions_of(school_ids))}
+    return {
+        school.id: school
+        for school in session.exec(select(School).where(School.id.in_(list(school_ids)))).all()
+    }
+
+
+def _hydrate_winners(session: Session, winners: list) -> list:
+    """Load the ORM rows for (school id, score) pairs, keeping their order"""
+    if not winners:
+        return []
+    schools_by_id = fetch_schools(session, [school_id for school_id, _ in winners])
+    # Schools deleted since the snapshot was taken are dropped
+    return [
+        (schools_by_id[school_id], score)
+        for school_id, score in winners
+        if school_id in schools_by_id
+    ]
+
+
+def rank_with_numpy(
+    session: Session, request, k: int = TOP_K, origin: tuple = None, programs: ProgramMatch = None
+) -> list:
+    """Score the cached snapshot in memory and hydrate only the k winners (programs come from the snapshot)"""
+    snapshot = get_school_snapshot(session)
+    return _hydrate_winners(session, _snapshot_winners(snapshot, request, k, origin))
+
+
+def rank_with_sql(
+    session: Session, request, k: int = TOP_K, origin: tuple = None, programs: ProgramMatch = None
+) -> list:
+    """Let the database compute the score, sort and return only the k best rows"""
+    score = score_expression(request, origin, programs)
+    query = select(School, score).order_by(score.desc(), School.id).limit(k)
+    return [(school, int(value)) for school, value in session.exec(query).all()]
+
+
+def _load_all_schools(session: Session) -> list:
+    return session.exec(select(School).order_by(School.id)).all()
+
+
+def _load_all_school_rows(session: Session) -> list:
+    """Every school as a plain row of all its columns (no ORM objects), ordered by id"""
+    return session.exec(select(*School.__table__.columns).order_by(School.id)).all()
+
+
+def _rank_rows(rows: list, request, k: int, origin: tuple = None, programs: ProgramMatch = None) -> list:
+    """_rank_loaded over plain rows, building detached School objects from them"""
+    columns = School.__table__.columns.keys()
+    return _rank_loaded([School(**dict(zip(columns, row))) for row in rows], request, k, origin, programs)
+
+
+def _rank_loaded(schools: list, request, k: int, origin: tuple = None, programs: ProgramMatch = None) -> list:
+    scored = [(school, score_school(school, request, origin, programs)[0]) for school in schools]
+    # Stable sort keeps the id order for equal scores
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:k]
+
+
+def rank_with_python(
+    session: Session, request, k: int = TOP_K, origin: tuple = None, programs: ProgramMatch = None
+) -> list:
+    """Reference engine: load every school and score it with score_school"""
+    return _rank_loaded(_load_all_schools(session), request, k, origin, programs)
+
+
+ENGINES = {
+    "numpy": rank_with_numpy,
+    "sql": rank_with_sql,
+    "python": rank_with_python,
+}
+
+
+def rank_schools(
+    session: Session,
+    request,
+    k: int = TOP_K,
+    engine: str = None,
+    origin: tuple = None,
+    programs: ProgramMatch = None
+) -> list:
+    """
+    Return the k best (school, score) pairs, best first, including zero scores
+    An empty list means there are no schools at all
+    origin and programs are the resolved ZIP code and program interest (geo.locate_zip,
+    programs.match_programs)
+    """
+    engine = engine or ("numpy" if SNAPSHOT_MODE else QUIZ_MATCH_ENGINE)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown quiz match engine '{engine}', expected one of {sorted(ENGINES)}")
+    return ENGINES[engine](session, request, k, origin, programs)
+
+
+async def rank_schools_async(
+    db,
+    request,
+    k: int = TOP_K,
+    engine: str = None,
+    origin: tuple = None,
+    programs: ProgramMatch = None
+) -> list:
+    """
+    rank_schools for the API routes, given a database.DatabaseSession
+    Only queries go through the session; building the snapshot, creating School objects
+    and scoring run in the threadpool so a large scan never blocks the event loop.
+    """
+    engine = engine or ("numpy" if SNAPSHOT_MODE else QUIZ_MATCH_ENGINE)
+    if engine == "numpy":
+        snapshot = await get_school_snapshot_async(db)
+        winners = await run_in_threadpool(_snapshot_winners, snapshot, request, k, origin)
+        return await db.run_sync(_hydrate_winners, winners)
+    if engine == "python":
+        rows = await db.run_sync(_load_all_school_rows)
+        return await run_in_threadpool(_rank_rows, rows, request, k, origin, programs)
+    return await db.run_sync(rank_schools, request, k, engine, origin, programs)
+
+
+def normalize_answers(request):
+    """
+    Copy of a set of quiz answers with the text answers stripped of surrounding whitespace
+    Every engine and score_school compare the answers as given, so they all get this copy.
+    """
+    return request.model_copy(update={
+        field: value.strip() for field, value in request.model_dump().items() if isinstance(value, str)
+    })
+
+
+def _match_interest(snapshot: SchoolSnapshot, interest: str):
+    """programs.match_programs against a snapshot, for a normalized answer"""
+    if not interest or interest.lower() == "any":
+        return None
+    return snapshot.programs.match(interest)
+
+
+def resolve_answers(snapshot: SchoolSnapshot, request) -> tuple:
+    """
+    (answers, origin, programs) of one set of answers against a snapshot: the normalized
+    answers (normalize_answers), to rank with, and what geo.locate_zip and
+    programs.match_programs return for their ZIP code and program interest
+    """
+    answers = normalize_answers(request)
+    origin = get_geo_index(snapshot).locate(answers.zip_code) if answers.zip_code else None
+    return answers, origin, _match_interest(snapshot, answers.program_interest)
+
+
+def _locate_all(snapshot: SchoolSnapshot, zip_codes: list) -> list:
+    """Origins of many ZIP codes (None where missing or unknown)"""
+    if not any(zip_codes):
+        return [None] * len(zip_codes)
+    index = get_geo_index(snapshot)
+    return [index.locate(zip_code) if zip_code else None for zip_code in zip_codes]
+
+
+async def rank_batch_async(db, requests: list, k: int = TOP_K, chunk_size: int = BATCH_CHUNK_SIZE):
+    """
+    Rank many sets of answers against one snapshot, given a database.DatabaseSession
+    Async generator of (answers, origin, programs, ranked) per request, in order, where
+    answers are the normalized answers (normalize_answers) and ranked is what rank_schools
+    returns. Scores the way the numpy engine does whatever QUIZ_MATCH_ENGINE is;
+    each chunk is scored in the threadpool and its winners are loaded in one query.
+    """
+    requests = [normalize_answers(request) for request in requests]
+    snapshot = await get_school_snapshot_async(db)
+    origins = await run_in_threadpool(_locate_all, snapshot, [getattr(r, "zip_code", None) for r in requests])
+    scorer = await run_in_threadpool(BatchScorer, snapshot, requests, origins)
+    for start in range(0, len(requests), chunk_size):
+        stop = min(start + chunk_size, len(requests))
+        winners = await run_in_threadpool(scorer.winners, start, stop, k)
+        schools_by_id = await db.run_sync(
+            fetch_schools, {school_id for ranked in winners for school_id, _ in ranked}
+        )
+        for request, origin, ranked in zip(requests[start:stop], origins[start:stop], winners):
+            yield request, origin, _match_interest(snapshot, request.program_interest), [
+                (schools_by_id[school_id], score)
+                for school_id, score in ranked
+                if school_id in schools_by_id
+            ]
@@ -0,0 +1,269 @@
+"""
+School name search: ranked, typo-tolerant matching of prefixes, substrings and acronyms
+
+Two engines rank the same way:
+- memory: an in-process trigram / prefix / acronym index built from the cached
+  SchoolSnapshot (default)
+- sql: PostgreSQL pg_trgm over school_name_normalized(name), the SQL twin of
+  normalize(), with a GIN trigram index on it and an expression index on
+  school_name_acronym(name) (both migration 0003); opt in with SEARCH_ENGINE=sql
+
+A query matches a name when most of its trigrams occur in the name (typos cost a
+few trigrams), when the name or one of its words starts with it, or when it is the
+name's acronym ("ucla", "mit"). Better and shorter matches rank first.
+"""
+import os
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import case, false, func, literal, or_
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from dataset import SNAPSHOT_MODE
+from models import School
+from snapshot import SchoolSnapshot, get_school_snapshot, get_school_snapshot_async
+
+# "memory" (in-process index) or "sql" (pg_trgm, PostgreSQL only); always memory in snapshot mode
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "memory")
+
+# Minimum share of the query's trigrams a name must contain ("stanfrod" keeps 5 of 9)
+MIN_CONTAINMENT = 0.5
+# pg_trgm's word_similarity divides by the union of trigrams, so its threshold is lower
+MIN_WORD_SIMILARITY = 0.3
+# Words skipped when building acronyms: "University of California-Los Angeles" -> "ucla"
+ACRONYM_STOPWORDS = ("of", "the", "at", "and", "in", "for")
+
+# Ranking bonuses on top of the trigram score
+EXACT_BONUS = 1.0
+ACRONYM_BONUS = 2.0  # Short queries like "mit" are usually acronyms
+NAME_PREFIX_BONUS = 0.6
+WORD_PREFIX_BONUS = 0.3
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words separated by single spaces ("Saint Mary's" -> "saint mary s")"""
+    folded = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return " ".join(re.split(r"[^a-z0-9]+", folded.lower())).strip()
+
+
+def acronym(normalized: str) -> str:
+    """Initials of the non-stopword words; matches the school_name_acronym() SQL function"""
+    return "".join(word[0] for word in normalized.split() if word not in ACRONYM_STOPWORDS)
+
+
+# PostgreSQL twin of acronym(), used by the ix_school_name_acronym expression index
+ACRONYM_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION school_name_acronym(name text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(left(word, 1), '' ORDER BY position), '')
+    FROM regexp_split_to_table(lower(name), '[^a-z0-9]+') WITH ORDINALITY AS words(word, position)
+    WHERE word <> '' AND word NOT IN ({", ".join(f"'{word}'" for word in ACRONYM_STOPWORDS)})
+$$
+"""
+
+
+# PostgreSQL twin of normalize(): fold accents (NFKD, drop non-ASCII), lowercase and turn
+# every run of other characters into one space. Requires a UTF8 database (PostgreSQL 13+).
+NORMALIZE_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION school_name_normalized(name text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT btrim(regexp_replace(
+        lower(regexp_replace(normalize(coalesce(name, ''), NFKD), '[^\\x01-\\x7f]+', '', 'g')),
+        '[^a-z0-9]+', ' ', 'g'
+    ))
+$$
+"""
+
+
+def trigrams(normalized: str) -> set:
+    """pg_trgm-style trigrams: each word padded with two leading spaces and one trailing"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Inverted indexes over the snapshot's names, aligned with its row positions
+    trigram -> positions, sorted (word, position) pairs for word prefixes,
+    sorted (name, position) pairs for name prefixes, and acronym -> positions.
+    """
+
+    def __init__(self, names: list):
+        self.size = len(names)
+        normalized = [normalize(name) for name in names]
+        # Names repeat ("Springfield Beauty Academy"), so tokenize each distinct name once
+        positions_by_name = {}
+        for position, name in enumerate(normalized):
+            positions_by_name.setdefault(name, []).append(position)
+
+        postings = {}
+        acronyms = {}
+        words = []
+        self.trigram_counts = np.zeros(self.size, dtype=np.float32)
+        for name, positions in positions_by_name.items():
+            grams = trigrams(name)
+            self.trigram_counts[positions] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).extend(positions)
+            initials = acronym(name)
+            if len(initials) >= 2:
+                acronyms.setdefault(initials, []).extend(positions)
+            words.extend((word, position) for word in set(name.split()) for position in positions)
+
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+        self.acronyms = {key: np.array(positions, dtype=np.int32) for key, positions in acronyms.items()}
+        words.sort()
+        self.words = [word for word, _ in words]
+        self.word_positions = np.array([position for _, position in words], dtype=np.int32)
+        name_order = sorted(range(self.size), key=normalized.__getitem__)
+        self.sorted_names = [normalized[position] for position in name_order]
+        self.name_positions = np.array(name_order, dtype=np.int32)
+
+    @staticmethod
+    def _prefix_range(sorted_values: list, prefix: str) -> tuple:
+        start = bisect_left(sorted_values, prefix)
+        stop = bisect_left(sorted_values, prefix + "\x7f", start)
+        return start, stop
+
+    def scores(self, query: str) -> np.ndarray:
+        """Relevance of every row for a normalized query (0 for no match)"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        if not query or not self.size:
+            return scores
+
+        # Trigram containment, blended with similarity so closer (shorter) names rank higher
+        grams = [self.postings[gram] for gram in trigrams(query) if gram in self.postings]
+        query_count = len(trigrams(query))
+        if grams:
+            shared = np.bincount(np.concatenate(grams), minlength=self.size).astype(np.float32)
+            containment = shared / query_count
+            similarity = shared / (query_count + self.trigram_counts - shared)
+            scores = np.where(containment >= MIN_CONTAINMENT, containment + similarity, 0).astype(np.float32)
+
+        # Names starting with the query; exact matches sort first within that range
+        start, stop = self._prefix_range(self.sorted_names, query)
+        scores[self.name_positions[start:stop]] += NAME_PREFIX_BONUS
+        scores[self.name_positions[start:bisect_right(self.sorted_names, query, start, stop)]] += EXACT_BONUS
+
+        # Autocomplete on the last word typed, e.g. "stanford univ"
+        start, stop = self._prefix_range(self.words, query.split()[-1])
+        if stop > start:
+            completes = np.zeros(self.size, dtype=bool)
+            completes[self.word_positions[start:stop]] = True
+            if " " in query:
+                # Only completes rows the rest of the query already matched
+                completes &= scores > 0
+            scores[completes] += WORD_PREFIX_BONUS
+
+        compact = query.replace(" ", "")
+        if compact in self.acronyms:
+            scores[self.acronyms[compact]] += ACRONYM_BONUS
+        return scores
+
+
+_index: Optional[SearchIndex] = None
+_index_snapshot: Optional[SchoolSnapshot] = None
+
+
+def get_search_index(snapshot: SchoolSnapshot) -> SearchIndex:
+    """Return the index for this snapshot, rebuilding it when the snapshot is replaced"""
+    global _index, _index_snapshot
+    if _index is None or _index_snapshot is not snapshot:
+        _index = SearchIndex(snapshot.names)
+        _index_snapshot = snapshot
+    return _index
+
+
+def _rank_snapshot(snapshot: SchoolSnapshot, query: str, filters, limit: int) -> list:
+    """CPU-bound part of the memory engine: ids of the best rows of the snapshot"""
+    scores = get_search_index(snapshot).scores(query)
+    scores[~filters.mask(snapshot)] = 0
+    candidates = np.flatnonzero(scores)
+    if not len(candidates):
+        return []
+    if len(candidates) > limit:
+        # Keep only rows scoring at least the limit-th best score (ties included) before sorting
+        cutoff = np.partition(scores[candidates], len(candidates) - limit)[len(candidates) - limit]
+        candidates = candidates[scores[candidates] >= cutoff]
+    # Best score first, then the lowest id (snapshot rows are ordered by id)
+    order = np.lexsort((candidates, -scores[candidates]))[:limit]
+    return [int(snapshot.ids[position]) for position in candidates[order]]
+
+
+def search_with_memory(session: Session, query: str, filters, limit: int) -> list:
+    """Rank snapshot rows with the in-process index; returns school ids, best first"""
+    return _rank_snapshot(get_school_snapshot(session), query, filters, limit)
+
+
+def search_with_sql(session: Session, query: str, filters, limit: int) -> list:
+    """Rank with pg_trgm in PostgreSQL; returns school ids, best first"""
+    # Compared in normalize() form, so punctuated names ("California-Los Angeles") get the bonuses
+    name = func.school_name_normalized(School.name)
+    initials = func.school_name_acronym(School.name)
+    compact = query.replace(" ", "")
+    is_acronym = initials == compact if len(compact) >= 2 else false()
+    last_word = query.split()[-1]
+    score = (
+        func.word_similarity(query, name)
+        + func.similarity(name, query)
+        + case((name == query, EXACT_BONUS), else_=0)
+        + case((name.startswith(query, autoescape=True), NAME_PREFIX_BONUS), else_=0)
+        + case((or_(
+            name.startswith(last_word, autoescape=True),
+            name.contains(f" {last_word}", autoescape=True),
+        ), WORD_PREFIX_BONUS), else_=0)
+        + case((is_acronym, ACRONYM_BONUS), else_=0)
+    ).label("score")
+    # Every alternative can use the GIN trigram index or the acronym index
+    matches = or_(
+        literal(query).op("<%")(name),
+        name.startswith(query, autoescape=True),
+        is_acronym,
+    )
+    # Threshold of the <% operator, for this transaction only
+    session.exec(select(func.set_config("pg_trgm.word_similarity_threshold", str(MIN_WORD_SIMILARITY), True)))
+    statement = filters.apply(
+        select(School.id, score).where(matches)
+    ).order_by(score.desc(), School.id).limit(limit)
+    return [school_id for school_id, _ in session.exec(statement).all()]
+
+
+def _engine_for(session: Session, engine: Optional[str]) -> str:
+    engine = "memory" if SNAPSHOT_MODE else engine or SEARCH_ENGINE
+    if engine not in ("sql", "memory"):
+        raise ValueError(f"Unknown search engine '{engine}', expected 'sql' or 'memory'")
+    if engine == "sql" and session.get_bind().dialect.name != "postgresql":
+        raise ValueError("The sql search engine needs PostgreSQL (pg_trgm)")
+    return engine
+
+
+def search_school_ids(session: Session, text: str, filters, limit: int, engine: str = None) -> list:
+    """Ids of the best matches for a search string, honoring the list filters"""
+    query = normalize(text)
+    if not query:
+        return []
+    if _engine_for(session, engine) == "sql":
+        return search_with_sql(session, query, filters, limit)
+    return search_with_memory(session, query, filters, limit)
+
+
+async def search_school_ids_async(db, text: str, filters, limit: int, engine: str = None) -> list:
+    """
+    search_school_ids for the API routes, given a database.DatabaseSession
+    The memory engine scores in the threadpool so building or scanning the index never
+    blocks the event loop.
+    """
+    query = normalize(text)
+    if not query:
+        return []
+    if await db.run_sync(_engine_for, engine) == "sql":
+        return await db.run_sync(search_with_sql, query, filters, limit)
+    snapshot = await get_school_snapshot_async(db)
+    return await run_in_threadpool(_rank_snapshot, snapshot, query, filters, limit)
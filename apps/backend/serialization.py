@@ -0,0 +1,46 @@
+"""
+JSON encoding of API response bodies
+
+With orjson installed, bodies are encoded in one pass: school rows, datetimes and
+numpy scalars are written natively, and SQLModel objects are read column by column,
+instead of FastAPI's generic jsonable_encoder rebuilding every value first. Without
+it, the jsonable_encoder path produces the same compact UTF-8 JSON.
+"""
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Non-finite floats become null, where json.dumps(allow_nan=False) would refuse the body
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+
+def _model_value(value: Any) -> Any:
+    # Pydantic writes UTC datetimes of model fields with a Z suffix
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return value
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        # The fields jsonable_encoder gives a SQLModel row, formatted the same way
+        return {name: _model_value(getattr(value, name)) for name in type(value).model_fields}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON for a response body (the encoding of FastAPI's JSONResponse)"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode()
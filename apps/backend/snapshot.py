@@ -0,0 +1,154 @@
+"""
+Columnar, NumPy-backed snapshot of the School fields used for quiz matching, search,
+geo queries and the program index
+"""
+from typing import Optional
+
+import numpy as np
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from dataset import SNAPSHOT_MODE, get_dataset_version
+from models import School
+from programs import ProgramIndex, load_catalog
+
+
+def factorize(values) -> tuple:
+    """Encode a column of labels as integer codes plus the list of distinct labels"""
+    labels = {}
+    codes = np.fromiter(
+        (labels.setdefault(value, len(labels)) for value in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, list(labels)
+
+
+def four_year_mask(degree_types) -> np.ndarray:
+    """degree_type is stored as text, "4" marks predominantly bachelor's institutions"""
+    return np.array([bool(d) and "4" in str(d) for d in degree_types], dtype=bool)
+
+
+class SchoolSnapshot:
+    """
+    Read-only columnar copy of the scoring fields of every school.
+    Rows are ordered by School.id so ties always resolve to the lowest id.
+    """
+
+    def __init__(self, rows: list, catalog: Optional[dict] = None):
+        columns = list(zip(*rows)) if rows else [()] * 14
+        (ids, names, school_types, degree_types, states, locales, tuition, admission,
+         completion, earnings, programs, zips, latitude, longitude) = columns
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.names = list(names)
+        self.school_type_codes, self.school_type_labels = factorize(school_types)
+        self.four_year = four_year_mask(degree_types)
+        self.state_codes, self.state_labels = factorize(states)
+        self.locale_codes, self.locale_labels = factorize(locales)
+        # None becomes NaN, so every comparison on a missing value is False
+        self.tuition_in_state = np.array(tuition, dtype=np.float64)
+        self.admission_rate = np.array(admission, dtype=np.float64)
+        self.completion_rate = np.array(completion, dtype=np.float64)
+        self.earnings_after_10yrs = np.array(earnings, dtype=np.float64)
+        self.programs = ProgramIndex.build(list(programs), catalog or {})
+        self.zips = list(zips)
+        self.latitude = np.array(latitude, dtype=np.float64)
+        self.longitude = np.array(longitude, dtype=np.float64)
+
+    @classmethod
+    def from_columns(cls, **columns) -> "SchoolSnapshot":
+        """
+        Snapshot over ready-made columns, taken as they are (no copy), e.g. the arrays
+        mapped from a snapshot file; names and zips may be any indexable sequence
+        """
+        snapshot = cls.__new__(cls)
+        snapshot.__dict__.update(columns)
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def state_mask(self, predicate) -> np.ndarray:
+        """Evaluate predicate once per distinct state and broadcast it to every row"""
+        hits = np.array([predicate(label) for label in self.state_labels], dtype=bool)
+        return hits[self.state_codes] if len(self) else hits[:0]
+
+    def locale_mask(self, predicate) -> np.ndarray:
+        """Evaluate predicate once per distinct locale and broadcast it to every row"""
+        hits = np.array([predicate(label) for label in self.locale_labels], dtype=bool)
+        return hits[self.locale_codes] if len(self) else hits[:0]
+
+    def school_type_mask(self, predicate) -> np.ndarray:
+        """Evaluate predicate once per distinct school type and broadcast it to every row"""
+        hits = np.array([predicate(label) for label in self.school_type_labels], dtype=bool)
+        return hits[self.school_type_codes] if len(self) else hits[:0]
+
+
+def _snapshot_rows(session: Session) -> tuple:
+    """(rows, catalog) a snapshot is built from, read with a column-only query (no ORM objects)"""
+    query = select(
+        School.id,
+        School.name,
+        School.school_type,
+        School.degree_type,
+        School.state,
+        School.locale,
+        School.tuition_in_state,
+        School.admission_rate,
+        School.completion_rate,
+        School.earnings_after_10yrs,
+        School.programs_offered,
+        School.zip,
+        School.latitude,
+        School.longitude,
+    ).order_by(School.id)
+    return session.exec(query).all(), load_catalog(session)
+
+
+def load_snapshot(session: Session) -> SchoolSnapshot:
+    """Build a snapshot from the current rows of the database"""
+    return SchoolSnapshot(*_snapshot_rows(session))
+
+
+_snapshot: Optional[SchoolSnapshot] = None
+_snapshot_version: Optional[int] = None
+
+
+def get_school_snapshot(session: Session) -> SchoolSnapshot:
+    """
+    Return the cached snapshot, rebuilding it when the dataset version changes
+    In snapshot mode it is the one mapped from the current snapshot file instead
+    """
+    global _snapshot, _snapshot_version
+    if SNAPSHOT_MODE:
+        from columnar import get_mapped_dataset
+        return get_mapped_dataset().snapshot
+    version = get_dataset_version(session)
+    if _snapshot is None or _snapshot_version != version:
+        _snapshot = load_snapshot(session)
+        _snapshot_version = version
+    return _snapshot
+
+
+async def get_school_snapshot_async(db) -> SchoolSnapshot:
+    """
+    get_school_snapshot for the API routes, given a database.DatabaseSession
+    Only the queries go through the session (on the event loop with an async session);
+    building the arrays and the program index of a new snapshot runs in the threadpool.
+    """
+    global _snapshot, _snapshot_version
+    if SNAPSHOT_MODE:
+        return await run_in_threadpool(get_school_snapshot, None)
+    version = await db.run_sync(get_dataset_version)
+    if _snapshot is None or _snapshot_version != version:
+        rows, catalog = await db.run_sync(_snapshot_rows)
+        _snapshot = await run_in_threadpool(SchoolSnapshot, rows, catalog)
+        _snapshot_version = version
+    return _snapshot
+
+
+def clear_snapshot():
+    """Drop the cached snapshot so the next request reloads it"""
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules (python main.py, python migrations.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache  # noqa: E402
+import database  # noqa: E402
+import dataset  # noqa: E402
+import snapshot  # noqa: E402
+from benchmarks.generator import seed_database  # noqa: E402
+from filters import SchoolFilters  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+# Synthetic schools seeded into the shared test database
+SEEDED_SCHOOLS = 2000
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "postgres: needs a PostgreSQL database with pg_trgm (set TEST_POSTGRES_URL)"
+    )
+
+
+def reset_dataset_caches():
+    """Forget the cached dataset version, snapshot and responses, which belong to another database"""
+    dataset._version = None
+    snapshot.clear_snapshot()
+    for lru in (cache.count_cache, cache.response_cache, cache.compressed_cache):
+        lru.clear()
+
+
+@pytest.fixture(scope="session")
+def seeded_database_url(tmp_path_factory):
+    """SQLite file holding the synthetic benchmark dataset"""
+    url = f"sqlite:///{tmp_path_factory.mktemp('seeded') / 'schools.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    seed_database(engine, SEEDED_SCHOOLS)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture(scope="session")
+def seeded_engine(seeded_database_url):
+    return create_engine(seeded_database_url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture
+def session(seeded_engine):
+    reset_dataset_caches()
+    with Session(seeded_engine) as session:
+        yield session
+    reset_dataset_caches()
+
+
+@pytest.fixture
+def use_database(monkeypatch):
+    """Point the API's engines (database.py) at a database URL for the rest of the test"""
+    def use(url: str):
+        monkeypatch.setattr(database, "database_url", url)
+        monkeypatch.setattr(database, "_engines", {})
+        reset_dataset_caches()
+    yield use
+    reset_dataset_caches()
+
+
+@pytest.fixture
+def client(seeded_database_url, use_database):
+    """TestClient for the API, serving the seeded database"""
+    from fastapi.testclient import TestClient
+    from main import app
+    use_database(seeded_database_url)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def make_filters():
+    """SchoolFilters from keyword values, with every other filter off (as FastAPI would build it)"""
+    def make(**values) -> SchoolFilters:
+        return SchoolFilters(**{
+            "state": None, "school_type": None, "locale": None,
+            "min_tuition": None, "max_tuition": None, "near": None, "radius": None, "program": None,
+            **values,
+        })
+    return make
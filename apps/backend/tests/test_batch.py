@@ -0,0 +1,34 @@
+import json
+
+from routers import MAX_BATCH_PROFILES
+from scoring import BATCH_CHUNK_SIZE
+from test_scoring import random_requests
+
+
+def batch_lines(response) -> list:
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_lines_match_single_quiz_matches(client, session):
+    # More than one scoring chunk, with ZIP codes, padded and mixed-case answers
+    profiles = [request.model_dump() for request in random_requests(session, BATCH_CHUNK_SIZE + 8, seed=16)]
+    profiles[0]["program_interest"] = "  NURSING "
+
+    lines = batch_lines(client.post("/api/quiz-match/batch", json=profiles))
+
+    assert [line["index"] for line in lines] == list(range(len(profiles)))
+    for profile, line in zip(profiles, lines):
+        single = client.post("/api/quiz-match", json=profile).json()
+        assert {key: value for key, value in line.items() if key != "index"} == single
+
+
+def test_batch_size_is_bounded(client):
+    profile = {
+        "study_level": "undergraduate", "preferred_location": "any", "budget_range": "medium",
+        "program_interest": "any", "admission_preference": "any",
+    }
+
+    assert client.post("/api/quiz-match/batch", json=[]).status_code == 422
+    assert client.post("/api/quiz-match/batch", json=[profile] * (MAX_BATCH_PROFILES + 1)).status_code == 422
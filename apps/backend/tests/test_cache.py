@@ -0,0 +1,55 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from starlette.requests import Request
+
+import cache
+from cache import cached_json_response
+
+
+def make_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+def test_coalesced_build_outlives_a_cancelled_leader(monkeypatch):
+    opened, closed = [], []
+    
+    @asynccontextmanager
+    async def open_session():
+        session = object()
+        opened.append(session)
+        try:
+            yield session
+        finally:
+            closed.append(session)
+    
+    monkeypatch.setattr(cache, "open_session", open_session)
+    key = ("test", "coalesced-build")
+    
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+        
+        async def build(db) -> dict:
+            started.set()
+            await release.wait()
+            return {"session": opened.index(db), "open": db not in closed}
+        
+        leader = asyncio.create_task(cached_json_response(make_request(), key, build))
+        await started.wait()
+        follower = asyncio.create_task(cached_json_response(make_request(), key, build))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return leader, await follower
+    
+    try:
+        leader, response = asyncio.run(main())
+    finally:
+        cache.response_cache.clear()
+    
+    assert leader.cancelled()
+    assert json.loads(response.body) == {"session": 0, "open": True}
+    assert opened == closed
+    assert cache.response_flights.coalesced >= 1
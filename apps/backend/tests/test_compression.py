@@ -0,0 +1,77 @@
+import gzip
+
+import pytest
+
+from cache import compressed_cache
+from compression import ENCODINGS, negotiate_encoding
+
+PARAMS = {"page_size": 100, "sort_by": "student_size"}
+
+
+@pytest.mark.parametrize("accept_encoding,expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=oops", None),
+    ("*", ENCODINGS[0]),
+    ("*, gzip;q=0", "br" if "br" in ENCODINGS else None),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_brotli_is_preferred_on_a_tie():
+    pytest.importorskip("brotli")
+
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.9") == "gzip"
+
+
+def raw_get(client, accept_encoding: str, **params):
+    """GET /api/schools without decoding the body, so the compressed bytes can be checked"""
+    headers = {"Accept-Encoding": accept_encoding}
+    with client.stream("GET", "/api/schools", params={**PARAMS, **params}, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_gzip_body_decodes_to_the_plain_body(client):
+    plain, plain_body = raw_get(client, "identity")
+    compressed, body = raw_get(client, "gzip")
+
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert int(compressed.headers["content-length"]) == len(body) < len(plain_body)
+    assert gzip.decompress(body) == plain_body
+    assert compressed.headers["etag"] == f"W/{plain.headers['etag']}"
+
+
+def test_brotli_body_decodes_to_the_plain_body(client):
+    brotli = pytest.importorskip("brotli")
+    _, plain_body = raw_get(client, "identity")
+
+    compressed, body = raw_get(client, "br")
+
+    assert compressed.headers["content-encoding"] == "br"
+    assert brotli.decompress(body) == plain_body
+
+
+def test_compressed_bodies_are_cached(client):
+    raw_get(client, "gzip", state="MI")
+    hits = compressed_cache.stats()["hits"]
+
+    _, body = raw_get(client, "gzip", state="MI")
+
+    assert compressed_cache.stats()["hits"] == hits + 1
+    assert gzip.decompress(body)
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"status": "healthy"}
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import concurrency
+from concurrency import ConcurrencyLimiter, SingleFlight
+
+
+def test_full_queue_is_shed_with_retry_after():
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=1, retry_after=3)
+
+    async def main():
+        order = []
+        release = asyncio.Event()
+
+        async def hold(name: str):
+            async with limiter.slot():
+                order.append(name)
+                await release.wait()
+
+        holder = asyncio.create_task(hold("first"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold("second"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as shed:
+            async with limiter.slot():
+                pass
+        stats = limiter.stats()
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return order, stats, shed.value
+
+    order, stats, error = asyncio.run(main())
+
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "3"}
+    assert (stats["active"], stats["queued"], stats["shed"]) == (1, 1, 1)
+    # The queued request got the slot when it was released
+    assert order == ["first", "second"]
+    assert limiter.stats()["active"] == 0
+    assert limiter.stats()["admitted"] == 2
+
+
+def test_waiting_past_the_queue_timeout_is_shed():
+    limiter = ConcurrencyLimiter("test", max_concurrency=1, max_queue=4, queue_timeout=0.01)
+
+    async def main():
+        async with limiter.slot():
+            with pytest.raises(HTTPException) as timed_out:
+                async with limiter.slot():
+                    pass
+        async with limiter.slot():
+            pass
+        return timed_out.value
+
+    error = asyncio.run(main())
+
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
+    assert limiter.stats()["timed_out"] == 1
+    assert (limiter.stats()["active"], limiter.stats()["queued"]) == (0, 0)
+
+
+def test_single_flight_runs_identical_calls_once():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.coalesced == 4
+    assert len(flights) == 0
+
+
+def test_saturated_endpoint_answers_503(client, monkeypatch):
+    cached = client.get("/api/schools", params={"state": "OH"})
+    monkeypatch.setitem(concurrency._limiters, "schools", ConcurrencyLimiter("schools", max_concurrency=0, max_queue=0))
+
+    response = client.get("/api/schools", params={"state": "OR"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(concurrency.RETRY_AFTER_SECONDS)
+    assert response.json()["detail"] == "Too many concurrent schools requests, retry shortly"
+    # Cached responses need no slot
+    assert client.get("/api/schools", params={"state": "OH"}).content == cached.content
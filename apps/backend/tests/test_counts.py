@@ -0,0 +1,44 @@
+from sqlalchemy import func
+from sqlmodel import select
+
+from cache import count_cache
+from models import School
+
+
+def count_stats() -> tuple:
+    stats = count_cache.stats()
+    return stats["hits"], stats["misses"]
+
+
+def test_total_matches_the_filtered_row_count(client, session):
+    body = client.get("/api/schools", params={"state": "CA", "max_tuition": 20000}).json()
+
+    expected = session.exec(
+        select(func.count()).select_from(School).where(School.state == "CA", School.tuition_in_state <= 20000)
+    ).one()
+    assert body["total"] == expected
+    assert body["total_pages"] == -(-expected // body["page_size"])
+
+
+def test_total_is_counted_once_per_filters(client):
+    hits, misses = count_stats()
+
+    totals = {
+        client.get("/api/schools", params={"state": "TX", **params}).json()["total"]
+        for params in ({"page": 1}, {"page": 2}, {"sort_by": "tuition_in_state", "sort_order": "desc"})
+    }
+
+    # Paging and sorting reuse the total; only the first request counts
+    assert len(totals) == 1
+    assert count_stats() == (hits + 2, misses + 1)
+
+
+def test_include_total_false_skips_the_count(client):
+    before = count_stats()
+
+    body = client.get("/api/schools", params={"state": "FL", "include_total": "false"}).json()
+
+    assert body["total"] is None
+    assert body["total_pages"] is None
+    assert body["schools"]
+    assert count_stats() == before
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import facets
+import scoring
+import snapshot
+from benchmarks.generator import seed_database
+from conftest import reset_dataset_caches
+from database import DatabaseSession
+from facets import compute_facets_async
+from routers import QuizMatchRequest, match_schools
+from scoring import rank_schools_async
+
+REQUEST = QuizMatchRequest(
+    study_level="undergraduate",
+    preferred_location="CA",
+    budget_range="medium",
+    program_interest="nursing",
+    admission_preference="moderate",
+)
+
+
+@pytest.fixture(scope="module")
+def database_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("db") / "schools.db"
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    seed_database(engine, 300)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def cpu_threads(monkeypatch):
+    """Thread ids that ran snapshot construction, facet counting and score_school"""
+    threads = set()
+    
+    def recorded(fn):
+        def wrapper(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return fn(*args, **kwargs)
+        return wrapper
+    
+    monkeypatch.setattr(snapshot, "SchoolSnapshot", recorded(snapshot.SchoolSnapshot))
+    monkeypatch.setattr(facets, "compute_facets", recorded(facets.compute_facets))
+    monkeypatch.setattr(scoring, "score_school", recorded(scoring.score_school))
+    reset_dataset_caches()
+    yield threads
+    reset_dataset_caches()
+
+
+def run_with_async_session(database_path, work) -> int:
+    """Run work(DatabaseSession) on a fresh event loop; returns the loop's thread id"""
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                await work(DatabaseSession(session))
+        finally:
+            await engine.dispose()
+        return threading.get_ident()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("engine", ["numpy", "python"])
+def test_quiz_matching_scores_off_the_event_loop(database_path, cpu_threads, engine):
+    async def work(db):
+        assert await rank_schools_async(db, REQUEST, engine=engine)
+    
+    loop_thread = run_with_async_session(database_path, work)
+    
+    assert cpu_threads and loop_thread not in cpu_threads
+
+
+def test_match_schools_resolves_answers_off_the_event_loop(database_path, cpu_threads):
+    async def work(db):
+        assert (await match_schools(db, REQUEST))["matches"]
+    
+    loop_thread = run_with_async_session(database_path, work)
+    
+    assert cpu_threads and loop_thread not in cpu_threads
+
+
+def test_facets_count_off_the_event_loop(database_path, cpu_threads, make_filters):
+    async def work(db):
+        assert (await compute_facets_async(db, make_filters(program="nursing")))["total"]
+    
+    loop_thread = run_with_async_session(database_path, work)
+    
+    assert cpu_threads and loop_thread not in cpu_threads
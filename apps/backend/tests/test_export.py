@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import export
+from export import EXPORT_FIELDS, _encode_ndjson
+from serialization import dumps
+
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def ndjson_rows(response) -> list:
+    assert response.text.endswith("\n")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_values_match_the_school_list(client):
+    params = {"state": "CA", "sort_by": "tuition_in_state", "sort_order": "desc", "fields": "name,tuition_in_state,created_at"}
+    listed = client.get("/api/schools", params={**params, "page_size": 100}).json()
+    
+    exported = ndjson_rows(client.get("/api/schools/export", params={**params, "format": "ndjson"}))
+    
+    assert exported[:len(listed["schools"])] == listed["schools"]
+    assert len(exported) == listed["total"]
+
+
+def test_ndjson_encodes_like_response_bodies():
+    fields = ("id", "admission_rate", "created_at")
+    rows = [(np.int64(7), float("nan"), datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc))]
+    
+    encoded = _encode_ndjson(fields, rows)
+    
+    assert encoded == dumps(dict(zip(fields, rows[0]))) + b"\n"
+    assert json.loads(encoded) == {"id": 7, "admission_rate": None, "created_at": "2024-05-01T12:30:00+00:00"}
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    """Export in batches of 7 rows, so every body spans many batch boundaries"""
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 7)
+
+
+def listed_ids(client, params: dict) -> list:
+    ids, cursor = [], None
+    while True:
+        page_params = {**params, "page_size": 100, "include_total": "false"}
+        if cursor:
+            page_params["cursor"] = cursor
+        body = client.get("/api/schools", params=page_params).json()
+        ids += [school["id"] for school in body["schools"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_csv_has_one_header_and_one_line_per_school(client, small_batches):
+    params = {"state": "TX", "sort_by": "admission_rate", "sort_order": "desc"}
+
+    response = client.get("/api/schools/export", params={**params, "format": "csv"}, headers=IDENTITY)
+
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"] == 'attachment; filename="schools.csv"'
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert tuple(rows[0]) == EXPORT_FIELDS
+    assert [int(row[0]) for row in rows[1:]] == listed_ids(client, params)
+    assert all(len(row) == len(EXPORT_FIELDS) for row in rows)
+
+
+def test_ndjson_has_one_object_per_line(client, small_batches):
+    params = {"locale": "Rural", "fields": "name,state"}
+
+    response = client.get("/api/schools/export", params={**params, "format": "ndjson"}, headers=IDENTITY)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = ndjson_rows(response)
+    assert all(list(row) == ["id", "name", "state"] for row in rows)
+    assert [row["id"] for row in rows] == listed_ids(client, params)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_gzip_export_decodes_to_the_plain_body(client, small_batches, fmt):
+    params = {"state": "CA", "format": fmt}
+    plain = client.get("/api/schools/export", params=params, headers=IDENTITY)
+
+    compressed = client.get("/api/schools/export", params=params, headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert compressed.content == plain.content
+
+
+def test_unknown_export_format_is_rejected(client):
+    response = client.get("/api/schools/export", params={"format": "xlsx"})
+
+    assert response.status_code == 400
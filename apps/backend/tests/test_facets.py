@@ -0,0 +1,59 @@
+from sqlalchemy import func
+from sqlmodel import select
+
+from facets import TUITION_BUCKET_EDGES
+from models import School
+
+
+def facets(client, **params) -> dict:
+    response = client.get("/api/schools/facets", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def grouped_counts(session, column, *conditions) -> dict:
+    rows = session.exec(
+        select(column, func.count()).where(column.is_not(None), column != "", *conditions).group_by(column)
+    ).all()
+    return dict(rows)
+
+
+def test_total_matches_the_school_list(client):
+    params = {"state": "CA", "school_type": "1", "max_tuition": 30000}
+
+    body = facets(client, **params)
+
+    assert body["total"] == client.get("/api/schools", params=params).json()["total"]
+
+
+def test_label_facets_ignore_their_own_filter(client, session):
+    body = facets(client, state="CA", school_type="1")
+
+    states = {item["value"]: item["count"] for item in body["facets"]["state"]}
+    types = {item["value"]: item["count"] for item in body["facets"]["school_type"]}
+    assert states == grouped_counts(session, School.state, School.school_type == "1")
+    assert types == grouped_counts(session, School.school_type, School.state == "CA")
+    counts = [item["count"] for item in body["facets"]["state"]]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_picking_a_facet_value_gives_its_count(client):
+    body = facets(client, locale="City")
+
+    for item in body["facets"]["state"][:5]:
+        listed = client.get("/api/schools", params={"locale": "City", "state": item["value"]}).json()
+        assert listed["total"] == item["count"]
+
+
+def test_tuition_buckets_count_known_values(client, session):
+    body = facets(client, state="TX", min_tuition=10000)
+
+    buckets = body["facets"]["tuition_in_state"]
+    assert [bucket["min"] for bucket in buckets] == list(TUITION_BUCKET_EDGES)
+    assert buckets[-1]["max"] is None
+    for bucket in buckets:
+        conditions = [School.state == "TX", School.tuition_in_state >= bucket["min"]]
+        if bucket["max"] is not None:
+            conditions.append(School.tuition_in_state < bucket["max"])
+        expected = session.exec(select(func.count()).select_from(School).where(*conditions)).one()
+        assert bucket["count"] == expected
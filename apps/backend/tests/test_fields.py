@@ -0,0 +1,26 @@
+from models import LIST_FIELDS
+
+
+def test_default_projection_is_the_list_fields(client):
+    schools = client.get("/api/schools", params={"page_size": 10}).json()["schools"]
+
+    assert all(list(school) == list(LIST_FIELDS) for school in schools)
+
+
+def test_fields_select_only_the_requested_columns(client):
+    params = {"fields": "name, tuition_in_state", "sort_by": "completion_rate", "sort_order": "desc", "page_size": 10}
+
+    schools = client.get("/api/schools", params=params).json()["schools"]
+
+    # id always comes first; the sort column is not returned unless requested
+    assert all(list(school) == ["id", "name", "tuition_in_state"] for school in schools)
+    for school in schools:
+        full = client.get(f"/api/schools/{school['id']}").json()
+        assert {name: full[name] for name in school} == school
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get("/api/schools", params={"fields": "name,password_hash,tuition"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Unknown fields: password_hash, tuition.")
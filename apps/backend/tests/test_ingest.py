@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+import database
+from benchmarks.generator import api_records
+from models import IngestRun, School
+
+TOTAL = 250
+PER_PAGE = 50
+
+
+@pytest.fixture
+def ingest_engine(tmp_path, use_database, monkeypatch):
+    """Empty database for ingest_data.py, which writes through its own `engine` import"""
+    use_database(f"sqlite:///{tmp_path / 'ingest.db'}")
+    engine = database.get_engine()
+    import ingest_data  # Binds database.engine on first import
+    monkeypatch.setattr(ingest_data, "engine", engine)
+    monkeypatch.setattr(ingest_data, "write_snapshot_files", lambda: None)
+    return engine
+
+
+@pytest.fixture
+def fake_api(ingest_engine, monkeypatch):
+    """Serves the synthetic dataset in place of the API; pages in `failing` raise once"""
+    import ingest_data
+
+    class FakeAPI:
+        fetched = []
+        failing = set()
+
+    async def fetch(client, api_key, page=0, per_page=100, max_retries=3):
+        FakeAPI.fetched.append(page)
+        if page in FakeAPI.failing:
+            FakeAPI.failing.discard(page)
+            raise RuntimeError(f"page {page} timed out")
+        start = page * per_page
+        return {"metadata": {"total": TOTAL}, "results": api_records(start, min(start + per_page, TOTAL))}
+
+    monkeypatch.setattr(ingest_data, "fetch_schools_from_api", fetch)
+    return FakeAPI
+
+
+def ingest():
+    import ingest_data
+    asyncio.run(ingest_data.ingest_schools("key", per_page=PER_PAGE, concurrency=2, rate_limit=1000))
+
+
+def school_count(engine) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(School)).one()
+
+
+def latest_run(engine) -> IngestRun:
+    with Session(engine) as session:
+        return session.exec(select(IngestRun).order_by(IngestRun.started_at.desc())).first()
+
+
+def test_resume_fetches_only_the_failed_page(ingest_engine, fake_api):
+    fake_api.failing = {2}
+    ingest()
+
+    run = latest_run(ingest_engine)
+    assert run.finished_at is None
+    assert run.completed_pages == "0-1,3-4"
+    assert school_count(ingest_engine) == TOTAL - PER_PAGE
+
+    fake_api.fetched = []
+    ingest()
+
+    # Page 0 is fetched again for the page count; the other written pages are not
+    assert sorted(fake_api.fetched) == [0, 2]
+    resumed = latest_run(ingest_engine)
+    assert resumed.id == run.id
+    assert resumed.finished_at is not None
+    assert resumed.completed_pages == "0-4"
+    assert school_count(ingest_engine) == TOTAL
+
+
+def test_first_page_failure_leaves_the_run_open(ingest_engine, fake_api, capsys):
+    fake_api.failing = {0}
+    ingest()
+
+    output = capsys.readouterr().out
+    assert "Error fetching the first page (page 0): page 0 timed out" in output
+    assert "Failed pages: [0]" in output
+    assert latest_run(ingest_engine).finished_at is None
+    assert school_count(ingest_engine) == 0
@@ -0,0 +1,64 @@
+import re
+
+SAMPLE = re.compile(r"^(\w+)(\{.*\})? (\S+)$")
+
+
+def scrape(client) -> dict:
+    """Samples of /metrics as {(name, labels): value}"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    samples = {}
+    for line in response.text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels or "")] = float(value)
+    return samples
+
+
+def route_sample(samples: dict, name: str, route: str, method: str = "GET") -> float:
+    return samples.get((name, f'{{method="{method}",route="{route}"}}'), 0.0)
+
+
+def test_requests_are_counted_per_route_template(client):
+    route = "/api/schools/{school_id:int}"
+    before = scrape(client)
+
+    for school_id in (1, 2, 3):
+        assert client.get(f"/api/schools/{school_id}").status_code == 200
+    after = scrape(client)
+
+    count = "internavi_http_request_duration_seconds_count"
+    assert route_sample(after, count, route) == route_sample(before, count, route) + 3
+    assert not any('route="/api/schools/1"' in labels for _, labels in after)
+
+
+def test_histogram_buckets_are_cumulative(client):
+    client.get("/api/schools", params={"page_size": 5})
+    samples = scrape(client)
+
+    buckets = [
+        value for (name, labels), value in samples.items()
+        if name == "internavi_http_request_duration_seconds_bucket" and 'route="/api/schools"' in labels
+    ]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == route_sample(samples, "internavi_http_request_duration_seconds_count", "/api/schools")
+
+
+def test_sql_statements_are_attributed_to_the_route(client):
+    before = scrape(client)
+
+    response = client.get("/api/schools", params={"state": "WA", "sort_by": "student_size"})
+    after = scrape(client)
+
+    statements = "internavi_db_statements_total"
+    assert route_sample(after, statements, "/api/schools") > route_sample(before, statements, "/api/schools")
+    assert re.fullmatch(r'db;dur=[\d.]+;desc="\d+ queries"', response.headers["Server-Timing"])
+
+
+def test_cache_and_limiter_stats_are_exported(client):
+    samples = scrape(client)
+
+    assert ("internavi_cache_hits_total", '{cache="responses"}') in samples
+    assert ("internavi_cache_entries", '{cache="counts"}') in samples
+    assert any(name == "internavi_limiter_shed_total" for name, _ in samples)
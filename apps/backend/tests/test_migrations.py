@@ -0,0 +1,73 @@
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import MIGRATIONS, run_migrations
+
+# school table as created by the original create_all, before any migration existed
+BASELINE_SCHOOL_SQL = (
+    """
+    CREATE TABLE school (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        city VARCHAR,
+        state VARCHAR,
+        zip VARCHAR,
+        website VARCHAR,
+        school_type VARCHAR,
+        degree_type VARCHAR,
+        locale VARCHAR,
+        admission_rate FLOAT,
+        sat_avg INTEGER,
+        act_avg INTEGER,
+        tuition_in_state FLOAT,
+        tuition_out_of_state FLOAT,
+        student_size INTEGER,
+        undergrad_size INTEGER,
+        completion_rate FLOAT,
+        earnings_after_10yrs FLOAT,
+        programs_offered VARCHAR,
+        unit_id VARCHAR,
+        ope_id VARCHAR,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL
+    )
+    """,
+    "CREATE INDEX ix_school_name ON school (name)",
+    "CREATE INDEX ix_school_state ON school (state)",
+    "CREATE UNIQUE INDEX ix_school_unit_id ON school (unit_id)",
+)
+
+
+def test_run_migrations_upgrades_baseline_schema():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHOOL_SQL:
+            connection.execute(text(statement))
+        connection.execute(text(
+            "INSERT INTO school (id, name, state, created_at, updated_at) "
+            "VALUES (1, 'Baseline College', 'CA', '2024-01-01', '2024-01-01')"
+        ))
+    
+    applied = run_migrations(engine)
+    
+    assert applied == [migration_id for migration_id, _ in MIGRATIONS]
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("school")}
+    assert {"latitude", "longitude", "content_hash"} <= columns
+    indexes = {index["name"] for index in inspector.get_indexes("school")}
+    assert {"ix_school_name_id", "ix_school_latitude_longitude"} <= indexes
+    assert {"program", "school_program", "school_neighbor", "ingest_run", "dataset_version"} <= set(
+        inspector.get_table_names()
+    )
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT name FROM school")).scalar_one() == "Baseline College"
+    
+    assert run_migrations(engine) == []
+
+
+def test_run_migrations_on_empty_database():
+    engine = create_engine("sqlite://")
+    
+    run_migrations(engine)
+    
+    indexes = {index["name"] for index in inspect(engine).get_indexes("school")}
+    assert "ix_school_latitude_longitude" in indexes
@@ -0,0 +1,59 @@
+import pytest
+
+from pagination import encode_cursor
+
+PAGE_SIZE = 50
+
+
+def offset_ids(client, params: dict) -> list:
+    ids, page = [], 1
+    while True:
+        body = client.get("/api/schools", params={**params, "page": page, "page_size": PAGE_SIZE}).json()
+        ids += [school["id"] for school in body["schools"]]
+        if page >= body["total_pages"]:
+            return ids
+        page += 1
+
+
+def cursor_ids(client, params: dict) -> list:
+    ids, cursor = [], None
+    while True:
+        page_params = {**params, "page_size": PAGE_SIZE, "include_total": "false"}
+        if cursor:
+            page_params["cursor"] = cursor
+        body = client.get("/api/schools", params=page_params).json()
+        ids += [school["id"] for school in body["schools"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("params", [
+    {"sort_by": "name", "sort_order": "asc"},
+    {"state": "CA", "sort_by": "tuition_in_state", "sort_order": "desc"},
+    {"school_type": "1", "sort_by": "admission_rate", "sort_order": "asc"},
+    {"state": "NY", "max_tuition": 15000, "sort_by": "earnings_after_10yrs", "sort_order": "desc"},
+])
+def test_cursor_pages_match_offset_pages(client, params):
+    expected = offset_ids(client, params)
+
+    ids = cursor_ids(client, params)
+
+    # NULL sort values come last ascending and first descending, on both paths
+    assert ids == expected
+    assert len(set(ids)) == len(ids)
+
+
+def test_malformed_cursor_is_rejected(client):
+    response = client.get("/api/schools", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_cursor_for_another_sort_is_rejected(client):
+    cursor = encode_cursor("name", False, "M", 10)
+
+    response = client.get("/api/schools", params={"cursor": cursor, "sort_by": "name", "sort_order": "desc"})
+
+    assert response.status_code == 400
@@ -0,0 +1,33 @@
+from programs import ProgramIndex
+
+CATALOG = {
+    "11.07": "Computer Science.",
+    "51.38": "Registered Nursing, Nursing Administration, Nursing Research and Clinical Nursing.",
+    "52.02": "Business Administration, Management and Operations.",
+}
+PROGRAMS_OFFERED = ["11.07,52.02", "51.38", None, "11.07"]
+
+
+def make_index() -> ProgramIndex:
+    return ProgramIndex.build(PROGRAMS_OFFERED, CATALOG)
+
+
+def test_match_by_title_words_and_code():
+    index = make_index()
+    
+    assert index.match("computer science").codes == ["11.07"]
+    assert index.match("Nursing").positions.tolist() == [1]
+    assert index.match("the business of administration").codes == ["52.02"]
+    assert index.match("1107").codes == ["11.07"]
+    assert index.match("11").positions.tolist() == [0, 3]
+
+
+def test_match_cache_is_keyed_on_the_parsed_interest():
+    index = make_index()
+    
+    # Words "11" and "07" appear in no title; the CIP code 11.07 does exist
+    assert index.match("11 07").codes == []
+    assert index.match("11.07").codes == ["11.07"]
+    assert index.match("11 07").codes == []
+    assert index.match("1107") is index.match("11.07")
+    assert index.match("Computer  Science") is index.match("computer science")
@@ -0,0 +1,139 @@
+import itertools
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, SQLModel, select
+
+from benchmarks.generator import seed_database
+from benchmarks.scenarios import LIST_FILTERS
+from filters import resolve_sort_field
+from models import LIST_FIELDS, School, SORTABLE_FIELDS
+from pagination import keyset_segments, order_clauses
+
+PAGE_SIZE = 20
+# Rows seeded for the PostgreSQL plans; on a small table the planner rightly prefers Seq Scan
+POSTGRES_SCHOOLS = 100_000
+
+LIST_COMBINATIONS = [
+    pytest.param(filter_values, sort_by, descending, id=f"{filter_values}-{sort_by}-{'desc' if descending else 'asc'}")
+    for filter_values, sort_by, descending in itertools.product(LIST_FILTERS, SORTABLE_FIELDS, (False, True))
+]
+
+
+def query_plan(session, query) -> list:
+    """SQLite EXPLAIN QUERY PLAN steps of a select(), as text"""
+    sql = str(query.compile(session.get_bind(), compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in session.exec(text(f"EXPLAIN QUERY PLAN {sql}")).all()]
+
+
+def list_queries(session, filters, sort_by: str, descending: bool) -> list:
+    """
+    The page queries /api/schools runs for a filter/sort (routers.query_page_rows): the first
+    page and a keyset page from the middle, selecting LIST_FIELDS plus the sort column
+    """
+    filters.resolve(session)
+    sort_field = resolve_sort_field(sort_by)
+    selected = tuple(dict.fromkeys([*LIST_FIELDS, sort_by]))
+    query = filters.apply(select(*(getattr(School, name) for name in selected)))
+    query = query.order_by(*order_clauses(sort_field, School.id, descending))
+    queries = [query.limit(PAGE_SIZE + 1)]
+    middle = session.exec(query.offset(PAGE_SIZE * 5).limit(1)).first()
+    if middle is not None:
+        value, middle_id = middle[selected.index(sort_by)], middle[0]
+        for segment in keyset_segments(sort_field, School.id, descending, value, middle_id):
+            queries.append(query.where(segment).limit(PAGE_SIZE + 1))
+    return queries
+
+
+def count_query(filters):
+    """The total count /api/schools runs for resolved filters"""
+    return filters.apply(select(func.count()).select_from(School))
+
+
+def uses_index_well(plan: list) -> bool:
+    """Every step on school SEARCHes an index, or SCANs one in order so no temporary sort is needed"""
+    school_steps = [step for step in plan if step.split()[1:2] == ["school"]]
+    ordered_scan = not any("TEMP B-TREE" in step for step in plan)
+    return bool(school_steps) and all(
+        step.startswith("SEARCH") or (step.startswith("SCAN") and "USING" in step and ordered_scan)
+        for step in school_steps
+    )
+
+
+@pytest.mark.parametrize("filter_values,sort_by,descending", LIST_COMBINATIONS)
+def test_list_queries_never_scan_the_school_table(session, make_filters, filter_values, sort_by, descending):
+    filters = make_filters(**filter_values)
+    for query in [*list_queries(session, filters, sort_by, descending), count_query(filters)]:
+        plan = query_plan(session, query)
+        
+        assert uses_index_well(plan), plan
+
+
+@pytest.mark.parametrize("sort_by", SORTABLE_FIELDS)
+@pytest.mark.parametrize("descending", [False, True])
+def test_sorting_reads_the_sort_index_in_order(session, make_filters, sort_by, descending):
+    for query in list_queries(session, make_filters(), sort_by, descending):
+        plan = query_plan(session, query)
+        
+        # ix_school_name (the plain name index) serves ORDER BY name, id as well as ix_school_name_id
+        assert any(f"USING INDEX ix_school_{sort_by}" in step for step in plan), plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+@pytest.mark.parametrize("filter_values,index", [
+    ({"state": "CA"}, "ix_school_state"),
+    ({"school_type": "2", "locale": "Suburban"}, "ix_school_locale_school_type"),
+    ({"min_tuition": 5000, "max_tuition": 20000}, "ix_school_tuition_in_state"),
+    ({"state": "NY", "max_tuition": 15000}, "ix_school_state_tuition_in_state_id"),
+    ({"program": "nursing"}, "ix_school_program_cip_code_school_id"),
+])
+def test_filters_search_an_index(session, make_filters, filter_values, index):
+    # Sorted on a column no filter index covers, so the filter alone decides the access path
+    query = list_queries(session, make_filters(**filter_values), "completion_rate", False)[0]
+    
+    plan = query_plan(session, query)
+    
+    assert any(step.startswith("SEARCH") and f"USING INDEX {index}" in step for step in plan) or any(
+        f"COVERING INDEX {index}" in step for step in plan
+    ), plan
+
+
+def postgres_plan_nodes(session, query) -> list:
+    """Every node of the PostgreSQL EXPLAIN (FORMAT JSON) plan of a select()"""
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    nodes = [session.exec(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()[0]["Plan"]]
+    for node in nodes:
+        nodes.extend(node.get("Plans", []))
+    return nodes
+
+
+@pytest.fixture(scope="module")
+def postgres_session():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    from migrations import run_migrations
+    engine = create_engine(url)
+    SQLModel.metadata.drop_all(engine)
+    run_migrations(engine)
+    seed_database(engine, POSTGRES_SCHOOLS)
+    # VACUUM sets the visibility map too, so counts can be answered from an index alone
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+    with Session(engine) as session:
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.mark.postgres
+@pytest.mark.parametrize("filter_values,sort_by,descending", LIST_COMBINATIONS)
+def test_postgres_list_queries_never_scan_the_school_table(postgres_session, make_filters, filter_values, sort_by, descending):
+    filters = make_filters(**filter_values)
+    for query in [*list_queries(postgres_session, filters, sort_by, descending), count_query(filters)]:
+        nodes = postgres_plan_nodes(postgres_session, query)
+        
+        assert not any(
+            node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "school" for node in nodes
+        ), nodes
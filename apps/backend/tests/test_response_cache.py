@@ -0,0 +1,46 @@
+import pytest
+
+import dataset
+from cache import response_cache
+from dataset import bump_dataset_version
+
+PARAMS = {"state": "CA", "sort_by": "tuition_in_state"}
+# Uncompressed, so the ETag is the cache's strong one (compressed bodies get W/"...")
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"stale", {etag}', "*"])
+def test_matching_etag_gets_304(client, if_none_match):
+    etag = client.get("/api/schools", params=PARAMS, headers=IDENTITY).headers["ETag"]
+
+    response = client.get(
+        "/api/schools", params=PARAMS, headers={**IDENTITY, "If-None-Match": if_none_match.format(etag=etag)}
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_repeated_request_is_served_from_the_cache(client):
+    first = client.get("/api/schools", params=PARAMS)
+    hits = response_cache.stats()["hits"]
+
+    second = client.get("/api/schools", params=PARAMS)
+
+    assert response_cache.stats()["hits"] == hits + 1
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_new_dataset_version_invalidates_responses(client, session, monkeypatch):
+    monkeypatch.setattr(dataset, "DATASET_VERSION_TTL_SECONDS", 0)
+    etag = client.get("/api/schools", params=PARAMS, headers=IDENTITY).headers["ETag"]
+
+    bump_dataset_version(session)
+    session.commit()
+    response = client.get("/api/schools", params=PARAMS, headers={**IDENTITY, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["schools"]
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from sqlmodel import select
+
+from geo import locate_zip
+from models import School
+from programs import match_programs
+from routers import QuizMatchRequest
+from scoring import ENGINES, rank_schools, resolve_answers, score_school
+from snapshot import get_school_snapshot
+
+# Ranking depth compared per engine, deeper than TOP_K so ties further down are covered too
+K = 25
+
+ANSWERS = {
+    "study_level": ["undergraduate", "undergrad", "graduate", "high school", "other"],
+    "preferred_location": ["any", "CA", "NY", "TX", "urban", "suburban", "rural"],
+    "budget_range": ["low", "medium", "high", ""],
+    "program_interest": ["any", "Computer Science", "nursing", "business", "11.07", "51", "5208", "basket weaving"],
+    "admission_preference": ["selective", "moderate", "open", "any", ""],
+}
+
+
+def random_requests(session, count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    zips = sorted(z for z in session.exec(select(School.zip).where(School.zip.is_not(None))).all())
+    requests = []
+    for _ in range(count):
+        answers = {field: rng.choice(values) for field, values in ANSWERS.items()}
+        answers["zip_code"] = rng.choice([None, None, "00000", rng.choice(zips), rng.choice(zips)[:5]])
+        requests.append(QuizMatchRequest(**answers))
+    return requests
+
+
+def reference_ranking(schools: list, request, origin, programs) -> list:
+    scored = [(school.id, score_school(school, request, origin, programs)[0]) for school in schools]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:K]
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engines_match_score_school(session, engine):
+    schools = session.exec(select(School).order_by(School.id)).all()
+    for request in random_requests(session, 60):
+        origin = locate_zip(session, request.zip_code)
+        programs = match_programs(session, request.program_interest)
+        
+        ranked = rank_schools(session, request, K, engine, origin, programs)
+        
+        assert [(school.id, score) for school, score in ranked] == reference_ranking(
+            schools, request, origin, programs
+        ), request
+
+
+def test_score_school_reasons_cover_zip_and_programs(session):
+    school = session.exec(
+        select(School).where(School.programs_offered.is_not(None), School.zip.is_not(None)).limit(1)
+    ).one()
+    code = school.programs_offered.split(",")[0]
+    request = QuizMatchRequest(
+        study_level="undergraduate",
+        preferred_location="any",
+        budget_range="",
+        program_interest=code,
+        admission_preference="",
+        zip_code=school.zip,
+    )
+    origin = locate_zip(session, request.zip_code)
+    programs = match_programs(session, request.program_interest)
+    
+    _, reasons = score_school(school, request, origin, programs)
+    
+    assert origin is not None
+    assert any(reason.startswith("Offers ") for reason in reasons)
+    assert any(reason.endswith(f"miles from {school.zip}") for reason in reasons)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("interest", [" any ", " Nursing ", "\t11.07 "])
+def test_padded_answers_rank_like_stripped_ones(session, engine, interest):
+    padded = QuizMatchRequest(
+        study_level=" undergraduate ",
+        preferred_location=" CA",
+        budget_range="medium ",
+        program_interest=interest,
+        admission_preference=" moderate ",
+    )
+    stripped = QuizMatchRequest(**{field: value.strip() for field, value in padded.model_dump(exclude_none=True).items()})
+    snapshot = get_school_snapshot(session)
+    
+    answers, origin, programs = resolve_answers(snapshot, padded)
+    ranked = rank_schools(session, answers, K, engine, origin, programs)
+    
+    assert answers == stripped
+    assert (programs is None) == (interest.strip() == "any")
+    assert [(school.id, score) for school, score in ranked] == reference_ranking(
+        session.exec(select(School).order_by(School.id)).all(), stripped, origin,
+        match_programs(session, stripped.program_interest)
+    )
@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, insert, inspect
+from sqlmodel import Session, SQLModel, select
+
+from conftest import reset_dataset_caches
+from models import School
+from search import normalize, search_school_ids
+
+NAMES = [
+    "University of California-Berkeley",
+    "University of California-Los Angeles",
+    "University of California-Los Angeles Extension",
+    "Saint Mary's College",
+    "Massachusetts Institute of Technology",
+    "Université Laval",
+]
+
+# Queries whose best match both engines must agree on: (query, expected name)
+RANKED_QUERIES = [
+    ("university of california los angeles", "University of California-Los Angeles"),
+    ("University of California-Los Angeles", "University of California-Los Angeles"),
+    ("ucla", "University of California-Los Angeles"),
+    ("saint mary's college", "Saint Mary's College"),
+    ("saint marys", "Saint Mary's College"),
+    ("mit", "Massachusetts Institute of Technology"),
+    ("universite laval", "Université Laval"),
+    ("berkely", "University of California-Berkeley"),
+]
+
+
+def seed_names(engine):
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        session.execute(insert(School), [
+            {"name": name, "unit_id": str(position), "created_at": now, "updated_at": now}
+            for position, name in enumerate(NAMES)
+        ])
+        session.commit()
+
+
+def best_match(session, query: str, filters, engine: str) -> str:
+    ids = search_school_ids(session, query, filters, 5, engine)
+    return session.get(School, ids[0]).name if ids else None
+
+
+@pytest.fixture
+def names_session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    seed_names(engine)
+    reset_dataset_caches()
+    with Session(engine) as session:
+        yield session
+    reset_dataset_caches()
+
+
+def test_normalize_drops_punctuation_and_accents():
+    assert normalize("University of California-Los Angeles") == "university of california los angeles"
+    assert normalize("  Saint Mary's ") == "saint mary s"
+    assert normalize("Université Laval") == "universite laval"
+
+
+@pytest.mark.parametrize("query,expected", RANKED_QUERIES)
+def test_memory_engine_ranking(names_session, make_filters, query, expected):
+    assert best_match(names_session, query, make_filters(), "memory") == expected
+
+
+def test_sql_engine_needs_postgresql(names_session, make_filters):
+    with pytest.raises(ValueError):
+        search_school_ids(names_session, "ucla", make_filters(), 5, "sql")
+
+
+@pytest.fixture(scope="module")
+def postgres_engine():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    from migrations import run_migrations
+    engine = create_engine(url)
+    SQLModel.metadata.drop_all(engine)
+    run_migrations(engine)
+    seed_names(engine)
+    yield engine
+    SQLModel.metadata.drop_all(engine)
+
+
+@pytest.mark.postgres
+def test_sql_normalization_matches_normalize(postgres_engine):
+    with Session(postgres_engine) as session:
+        for name in NAMES:
+            assert session.exec(select(func.school_name_normalized(name))).one() == normalize(name)
+
+
+@pytest.mark.postgres
+@pytest.mark.parametrize("query,expected", RANKED_QUERIES)
+def test_sql_engine_ranks_like_memory_engine(postgres_engine, make_filters, query, expected):
+    reset_dataset_caches()
+    with Session(postgres_engine) as session:
+        assert best_match(session, query, make_filters(), "sql") == expected
+        assert best_match(session, query, make_filters(), "memory") == expected
+
+
+@pytest.mark.postgres
+def test_name_search_indexes(postgres_engine):
+    indexes = {index["name"] for index in inspect(postgres_engine).get_indexes("school")}
+    assert {"ix_school_name_normalized_trgm", "ix_school_name_acronym"} <= indexes
+    assert "ix_school_name_trgm" not in indexes
@@ -0,0 +1,45 @@
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import select
+
+import serialization
+from models import School
+from serialization import dumps
+
+
+def generic_dumps(content) -> bytes:
+    """FastAPI's JSONResponse encoding"""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+@pytest.fixture(params=["orjson", "fallback"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(serialization, "orjson", None)
+    return request.param
+
+
+def test_school_rows_encode_like_fastapi(session, encoder):
+    schools = session.exec(select(School).order_by(School.id).limit(50)).all()
+    body = {"schools": schools, "total": 50, "matched_at": datetime(2024, 5, 1, tzinfo=timezone.utc)}
+
+    # Same values and formatting; jsonable_encoder's key order for table models is arbitrary
+    assert json.loads(dumps(body)) == json.loads(generic_dumps(body))
+
+
+def test_non_ascii_text_is_written_as_utf8(encoder):
+    assert dumps({"name": "Université Laval"}) == '{"name":"Université Laval"}'.encode()
+
+
+def test_numpy_scalars_and_nan():
+    pytest.importorskip("orjson")
+
+    encoded = dumps({"id": np.int64(3), "score": np.float64(1.5), "rate": float("nan")})
+
+    assert json.loads(encoded) == {"id": 3, "score": 1.5, "rate": None}
@@ -0,0 +1,53 @@
+import numpy as np
+from sqlmodel import select
+
+from models import LIST_FIELDS, School
+from neighbors import CATEGORICAL_FEATURES, NEIGHBOR_COUNT, NUMERIC_FEATURES, feature_matrix, nearest_neighbors
+
+
+def test_nearest_neighbors_are_exact(session):
+    rows = session.exec(
+        select(
+            School.id,
+            *(getattr(School, column) for column, _ in NUMERIC_FEATURES),
+            *(getattr(School, column) for column in CATEGORICAL_FEATURES),
+        ).order_by(School.id)
+    ).all()
+    features, discrete = feature_matrix(rows)
+
+    # Small blocks, so most rows are settled across several rings of groups
+    positions, distances = nearest_neighbors(features, discrete, 10, block_size=16)
+
+    exact = features.astype(np.float64)
+    squared_norms = (exact ** 2).sum(axis=1)
+    brute = np.sqrt(np.maximum(squared_norms[:, None] + squared_norms[None, :] - 2 * exact @ exact.T, 0))
+    np.fill_diagonal(brute, np.inf)
+    expected = np.sort(brute, axis=1)[:, :10]
+    np.testing.assert_allclose(distances, expected, atol=1e-3)
+    assert not (positions == np.arange(len(rows))[:, None]).any()
+
+
+def test_similar_schools_are_nearest_first(client):
+    body = client.get("/api/schools/42/similar", params={"limit": 5}).json()
+
+    assert body["school_id"] == 42
+    assert len(body["schools"]) == 5
+    assert all(list(school) == list(LIST_FIELDS) for school in body["schools"])
+    assert 42 not in [school["id"] for school in body["schools"]]
+    assert body["distances"] == sorted(body["distances"])
+
+    longer = client.get("/api/schools/42/similar", params={"limit": NEIGHBOR_COUNT}).json()
+    assert longer["schools"][:5] == body["schools"]
+
+
+def test_unknown_school_is_404(client):
+    response = client.get("/api/schools/999999999/similar")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "School not found"
+
+
+def test_limit_is_bounded_by_the_stored_neighbors(client):
+    response = client.get("/api/schools/42/similar", params={"limit": NEIGHBOR_COUNT + 1})
+
+    assert response.status_code == 422
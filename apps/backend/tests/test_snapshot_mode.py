@@ -0,0 +1,76 @@
+import pytest
+
+import columnar
+import dataset
+import export
+import main
+import neighbors
+import routers
+import scoring
+import search
+import snapshot
+
+# Modules that import dataset.SNAPSHOT_MODE by name
+SNAPSHOT_MODE_MODULES = (dataset, routers, main, search, neighbors, export, scoring, snapshot)
+
+GET_REQUESTS = [
+    ("/api/schools", {}),
+    ("/api/schools", {"state": "CA", "sort_by": "tuition_in_state", "sort_order": "desc", "page": 3}),
+    ("/api/schools", {"school_type": "1", "locale": "City", "sort_by": "admission_rate", "page_size": 100}),
+    ("/api/schools", {"min_tuition": 5000, "max_tuition": 20000, "sort_by": "earnings_after_10yrs", "page": 2}),
+    ("/api/schools", {"program": "nursing", "sort_by": "student_size", "sort_order": "desc"}),
+    ("/api/schools", {"fields": "name,city,completion_rate", "sort_by": "completion_rate", "include_total": "false"}),
+    ("/api/schools/facets", {"state": "NY"}),
+    ("/api/schools/facets", {"program": "business", "max_tuition": 30000}),
+    ("/api/schools/42", {}),
+    ("/api/schools/42/similar", {"limit": 10}),
+    ("/api/schools/search", {"q": "univ"}),
+]
+
+QUIZ_ANSWERS = [
+    {"study_level": "undergraduate", "preferred_location": "CA", "budget_range": "low",
+     "program_interest": "nursing", "admission_preference": "any"},
+    {"study_level": "graduate", "preferred_location": "urban", "budget_range": "high",
+     "program_interest": "Computer Science", "admission_preference": "selective"},
+]
+
+
+@pytest.fixture
+def serve_snapshot(session, use_database, monkeypatch, tmp_path):
+    """Switch the API to snapshot mode, serving a snapshot of the seeded database"""
+    def serve():
+        path = columnar.write_snapshot(session, str(tmp_path), force=True)
+        monkeypatch.setattr(columnar, "current_snapshot_path", lambda directory=None: path)
+        monkeypatch.setattr(columnar, "_dataset", None)
+        for module in SNAPSHOT_MODE_MODULES:
+            monkeypatch.setattr(module, "SNAPSHOT_MODE", True)
+        # Snapshot mode must not read the database, so point it at one that cannot be opened.
+        # This also drops the responses cached from the database, which share the version.
+        use_database(f"sqlite:///{tmp_path / 'missing' / 'schools.db'}")
+    return serve
+
+
+def responses(client) -> list:
+    bodies = []
+    for url, params in GET_REQUESTS:
+        response = client.get(url, params=params)
+        assert response.status_code == 200, (url, params)
+        bodies.append(response.json())
+    for answers in QUIZ_ANSWERS:
+        bodies.append(client.post("/api/quiz-match", json=answers).json())
+    first = client.get("/api/schools", params={"sort_by": "admission_rate", "include_total": "false"}).json()
+    bodies.append(client.get("/api/schools", params={
+        "sort_by": "admission_rate", "include_total": "false", "cursor": first["next_cursor"]
+    }).json())
+    bodies.append(client.get("/api/schools/export", params={"format": "ndjson", "state": "TX"}).text)
+    return bodies
+
+
+def test_snapshot_mode_serves_what_the_database_serves(client, serve_snapshot):
+    expected = responses(client)
+
+    serve_snapshot()
+    served = responses(client)
+
+    for expected_body, body in zip(expected, served):
+        assert body == expected_body
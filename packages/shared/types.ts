@@ -11,6 +11,8 @@ export interface School {
   city?: string | null;
   state?: string | null;
   zip?: string | null;
+  latitude?: number | null;
+  longitude?: number | null;
   website?: string | null;
 
   // School Type and Characteristics
@@ -36,11 +38,12 @@ export interface School {
   earnings_after_10yrs?: number | null;
 
   // Programs and Fields of Study
-  programs_offered?: string | null;
+  programs_offered?: string | null; // Comma-separated 4-digit CIP codes, e.g. "11.07,52.01"
 
   // API Metadata
   unit_id?: string | null;
   ope_id?: string | null;
+  content_hash?: string | null;
 
   // Timestamps
   created_at?: string;
@@ -48,10 +51,49 @@ export interface School {
 }
 
 export interface SchoolListResponse {
+  // Only the list fields (or those requested with fields=); full records come from /api/schools/{id}
   schools: School[];
-  total: number;
+  total: number | null;
   page?: number;
   page_size?: number;
+  total_pages?: number | null;
+  next_cursor?: string | null;
+}
+
+export interface SchoolSearchResponse {
+  query: string;
+  // Best matches first, with the same fields as SchoolListResponse.schools
+  schools: School[];
+}
+
+export interface SimilarSchoolsResponse {
+  school_id: number;
+  // Most similar first, with the same fields as SchoolListResponse.schools
+  schools: School[];
+  distances: number[]; // Feature-space distance of each school, same order
+}
+
+export interface FacetValue {
+  value: string;
+  count: number;
+}
+
+export interface FacetBucket {
+  min: number;
+  max: number | null; // Exclusive; null for the open-ended last bucket
+  count: number;
+}
+
+export interface SchoolFacetsResponse {
+  // Schools matching all filters; each facet ignores its own filter
+  total: number;
+  facets: {
+    state: FacetValue[];
+    school_type: FacetValue[];
+    locale: FacetValue[];
+    tuition_in_state: FacetBucket[];
+    admission_rate: FacetBucket[];
+  };
 }
 
 export interface QuizMatchRequest {
@@ -60,9 +102,18 @@ export interface QuizMatchRequest {
   budget_range: string;
   program_interest: string;
   admission_preference: string;
+  zip_code?: string | null; // Home ZIP code; nearby schools score higher
 }
 
 export interface QuizMatchResponse {
   schools: School[];
   match_score?: number;
 }
+
+// One NDJSON line of POST /api/quiz-match/batch, in request order
+export interface QuizMatchBatchLine {
+  index: number;
+  schools?: School[];
+  matches?: { school_id: number; match_score: number; match_reasons: string[] }[];
+  error?: { status_code: number; detail: string };
+}